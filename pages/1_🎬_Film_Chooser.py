@@ -1,13 +1,25 @@
 #===============
 # Imports
 #===============
+import logging
 import streamlit as st
 from utils.auth import get_authenticator
-import pandas as pd
-import time
+from utils.film_db import get_connection, connection_stats, data_version, snapshot_token
+from utils.sidebar import random_film_sidebar
+from utils.film_engine import get_film_engine
+from utils.facets import get_facet_cube
+from utils.title_index import get_title_index
+from utils.film_features import get_film_features
+from utils.film_neighbors import film_neighbors, has_film_neighbors
+from utils.filter_cache import get_filter_cache, filter_cache_key
+from utils.film_queries import PAGE_SIZE, page_key
+from utils.genres import load_genre_bits
+from utils.archive_db import archive_connection
+from utils.taste import TASTE_SCHEMA, load_taste_profile, add_watch, film_facts
+from utils.watch_stats import STATS_SCHEMA
 from datetime import datetime
-import random
-import sqlite3
+
+logger = logging.getLogger("pages.film_chooser")
 
 #====================
 # Authentication
@@ -39,105 +51,8 @@ import sqlite3
 # Sidebar
 #=============
 
-# Sidebar: Random Film Button
-st.sidebar.title("Random Film Generator")
-
-st.sidebar.write("""Can't decide what to watch? Let our Random Film Generator 
-                 choose for you! Click the button and let faith decide!
-                 Enjoy your movie night! 🍿🎥""")
-
-if st.sidebar.button("Random film!"):
-    def random_film ():
-        conn = sqlite3.connect("data/film_database.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT *
-            FROM film_data
-            ORDER BY RANDOM()
-            LIMIT 1
-        """)
-        random_choice = cursor.fetchone()
-        conn.close()
-        return random_choice
-
-    # Run random_film()
-    random_movie = random_film()
-
-    # List of funny texts
-    funny_texts = [
-        "Reading your aura...",
-        "Taming a monkey...",
-        "Brewing some coffee...",
-        "Counting stars...",
-        "Feeding the unicorns...",
-        "Polishing the pixels...",
-        "Summoning good vibes...",
-        "Tickling the code...",
-        "Charging the flux capacitor...",
-        "Aligning the planets...",
-        "Petting the cat...",
-        "Warming up the servers...",
-        "Finding Waldo...",
-        "Herding cats...",
-        "Sharpening pencils...",
-        "Calibrating the matrix...",
-        "Baking cookies...",
-        "Inflating balloons...",
-        "Painting rainbows...",
-        "Hacking the mainframe...",
-        "Teleporting data...",
-        "Tickling the electrons...",
-        "Spinning up the hamster wheel...",
-        "Inflating the internet...",
-        "Waking up the servers...",
-        "Unleashing the magic...",
-        "Mixing the potions...",
-        "Charging the crystals...",
-        "Consulting the oracle...",
-        "Tuning the algorithms...",
-        "Rebooting the matrix...",
-        "Casting spells...",
-        "Brewing the potion...",
-        "Hunting for Easter eggs...",
-        "Rewiring the circuits...",
-        "Synchronizing the clocks...",
-        "Lubricating the gears...",
-        "Recalibrating the sensors...",
-        "Recharging the batteries...",
-        "Assembling the pixels..."
-    ]
-
-    # Randomly choose a funny text
-    progress_text = random.choice(funny_texts)
-
-    # Create a progress bar
-    my_bar = st.sidebar.progress(0)
-       
-    # Randomly choose a duration between 0.1 and 2 seconds
-    duration = random.uniform(0.1, 1.5)
-
-    # Calculate the sleep time per iteration
-    sleep_time = duration / 100
-
-    for percent_complete in range(100):
-        time.sleep(sleep_time)
-        my_bar.progress(percent_complete + 1, text=progress_text)
-
-    time.sleep(1)
-    my_bar.empty()
-
-    st.sidebar.write(f'''
-                     Maybe you'd like to watch **{random_movie[2]}**?
-                     
-                     **Rating: {random_movie[38]} | 
-                     Duration: {random_movie[4]} min.** |
-                     **Year: {random_movie[3]}**
-                     ''')
-
-    # Define IMDb URL
-    random_url = f'https://www.imdb.com/title/{random_movie[0]}/'
-
-    st.sidebar.link_button('Visit IMDb page!', random_url)
+# Sidebar: Random Film Generator (shared by all pages)
+random_film_sidebar()
 
 #========================
 # Film Chooser intro
@@ -197,8 +112,7 @@ st.markdown("""
 #=======================
 
 # Read .txt file with date
-with open("utils/film_data_update.txt", "r") as file:
-    date_str = file.read().strip()
+date_str = data_version()
 
 # Convert text to datetime object
 date_film_data = datetime.strptime(date_str, "%d %B %Y")
@@ -245,6 +159,86 @@ if 'save_filters2' not in st.session_state:
 save_toggle = st.toggle("Save filters", key="toggle2", value=st.session_state.save_filters2)
 st.session_state.save_filters2 = save_toggle
 
+#=======================================
+# Define slider limits and defaults 
+#=======================================
+
+@st.cache_data
+def dynamic_min_year(snapshot):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT
+        MIN(startYear)
+    FROM film_data
+""")
+    min_year = cursor.fetchone()[0]
+    return min_year
+
+# year
+min_year = dynamic_min_year(snapshot_token())
+max_year = datetime.now().year
+default_min_year = 1985
+default_max_year = max_year
+
+# time 
+min_time = 30
+max_time = 240
+default_min_time = 60
+default_max_time = 120
+
+# ratings
+min_rating = 1.0
+max_rating = 10.0
+default_min_rating = 7.0
+default_max_rating = max_rating
+ratings_step_size = 0.5
+
+# votes
+min_votes = 0
+max_votes = 500000
+default_min_votes = 100000
+votes_step_size = 500
+
+#=====================
+# Live match count
+#=====================
+
+# Slider values saved from an earlier visit (if saving is on), else the defaults
+if save_toggle and "selected_years" in st.session_state:
+    default_years = st.session_state.selected_years
+else:
+    default_years = (default_min_year, default_max_year)
+
+if save_toggle and "selected_time" in st.session_state:
+    default_time = st.session_state.selected_time
+else:
+    default_time = (default_min_time, default_max_time)
+
+if save_toggle and "selected_rating" in st.session_state:
+    default_rating = st.session_state.selected_rating
+else:
+    default_rating = (default_min_rating, default_max_rating)
+
+if save_toggle and "selected_votes" in st.session_state:
+    default_votes = st.session_state.selected_votes
+else:
+    default_votes = default_min_votes
+
+# Films per main genre for the current slider values (read before the sliders
+# are drawn, so the main genre list can show them); from the precomputed facet 
+# cube, so no query runs while the sliders move
+facet_cube = get_facet_cube()
+slider_counts = facet_cube.count(st.session_state.get('years_slider', default_years),
+                                 st.session_state.get('time_slider', default_time),
+                                 st.session_state.get('rating_slider', default_rating),
+                                 st.session_state.get('votes_slider', default_votes))
+
+def genre_label(genre):
+    if genre in slider_counts.by_genre:
+        return f"{genre} ({slider_counts.by_genre[genre]:,})"
+    return genre
+
 #=====================
 # Genre selection
 #=====================
@@ -277,29 +271,20 @@ def AND_OR():
 #================    
 
 @st.cache_data
-def genre_list():
-    conn = sqlite3.connect("data/film_database.db")
-    cursor = conn.cursor()
-
-    # Get all column names from film_data
-    cursor.execute("PRAGMA table_info(film_data)")
-    columns_info = cursor.fetchall()
-
-    # Extract column names
-    column_names = [col[1] for col in columns_info]
+def genre_list(snapshot):
+    conn = get_connection()
 
-    # Get columns 7 to 33
-    genre_columns = column_names[6:33]
+    # Get all genres, in the order of their bit in genre_mask
+    genre_columns = list(load_genre_bits(conn))
 
     # Add custom options at the top
     genre_columns.insert(0, "No preference for a main genre...")
     genre_columns.insert(0, "No preference for any genre...")
 
-    conn.close()
     return genre_columns   
 
-# Run genre list
-all_genres = genre_list()
+# Run genre list (cached until a new database snapshot is swapped in)
+all_genres = genre_list(snapshot_token())
 
 #===============================
 # Main genre
@@ -313,14 +298,17 @@ if save_toggle:
     main_genre = st.selectbox(
         "Main genre:",
         all_genres,
-        index=all_genres.index(default_genre)
+        index=all_genres.index(default_genre),
+        format_func=genre_label,
+        key='main_genre_select'
     )
 
     # Save selected genre into session state manually
     st.session_state.selected_main_genre = main_genre
 
 else:
-    main_genre = st.selectbox("Main genre:", all_genres)
+    main_genre = st.selectbox("Main genre:", all_genres, format_func=genre_label,
+                              key='main_genre_select')
 
 #========================
 # Genre if-statement
@@ -392,63 +380,17 @@ if genre_tag == 1 and len(genre_selection) > 3:
 elif genre_tag == 2 and len(genre_selection) > 2:
             st.error("You can select a maximum of 2 additional genres!")
 
-#=======================================
-# Define slider limits and defaults 
-#=======================================
-
-@st.cache_data
-def dynamic_min_year():
-    conn = sqlite3.connect("data/film_database.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-    SELECT
-        MIN(startYear)
-    FROM film_data
-""")
-    min_year = cursor.fetchone()[0]
-    conn.close()
-    return min_year
-
-# year
-min_year = dynamic_min_year()
-max_year = datetime.now().year
-default_min_year = 1985
-default_max_year = max_year
-
-# time 
-min_time = 30
-max_time = 240
-default_min_time = 60
-default_max_time = 120
-
-# ratings
-min_rating = 1.0
-max_rating = 10.0
-default_min_rating = 7.0
-default_max_rating = max_rating
-ratings_step_size = 0.5
-
-# votes
-min_votes = 0
-max_votes = 500000
-default_min_votes = 100000
-votes_step_size = 500
-
 #====================
 # Filter sliders 
 #====================
 
 # === Year Slider ===
 st.write('**Year:**')
-if save_toggle and "selected_years" in st.session_state:
-    default_years = st.session_state.selected_years
-else:
-    default_years = (default_min_year, default_max_year)
-
 selected_years = st.slider("Range of years in which a film went into premiere:", 
                            min_year, max_year,
                            default_years,
-                           step=1)
+                           step=1,
+                           key='years_slider')
 
 # Save only if toggle is ON
 if save_toggle:
@@ -458,15 +400,11 @@ st.divider()
 
 # === Duration Slider ===
 st.write('**Duration:**')
-if save_toggle and "selected_time" in st.session_state:
-    default_time = st.session_state.selected_time
-else:
-    default_time = (default_min_time, default_max_time)
-
 selected_time = st.slider("Range of film duration in minutes:", 
                           min_time, max_time,
                           default_time,
-                          step=5)
+                          step=5,
+                          key='time_slider')
 
 if save_toggle:
     st.session_state.selected_time = selected_time
@@ -475,17 +413,13 @@ st.divider()
 
 # === Rating Slider ===
 st.write('**Rating:**')
-if save_toggle and "selected_rating" in st.session_state:
-    default_rating = st.session_state.selected_rating
-else:
-    default_rating = (default_min_rating, default_max_rating)
-
 selected_rating = st.slider("Range of film IMDb ratings:", 
                             min_value=min_rating,
                             max_value=max_rating,
                             value=default_rating,
                             step=ratings_step_size,
-                            format="%.1f")
+                            format="%.1f",
+                            key='rating_slider')
 
 if save_toggle:
     st.session_state.selected_rating = selected_rating
@@ -494,19 +428,23 @@ st.divider()
 
 # === Votes Slider ===
 st.write('**Votes:**')
-if save_toggle and "selected_votes" in st.session_state:
-    default_votes = st.session_state.selected_votes
-else:
-    default_votes = default_min_votes
-
 selected_votes = st.slider("Minimum number of votes for the IMDb film rating:", 
                            min_votes, max_votes,
                            default_votes,
-                           step=votes_step_size)
+                           step=votes_step_size,
+                           key='votes_slider')
 
 if save_toggle:
     st.session_state.selected_votes = selected_votes
 
+# Live count of the films within the sliders (and main genre)
+facet_count = facet_cube.count(selected_years, selected_time, selected_rating,
+                               selected_votes, main_genre if genre_tag == 2 else None)
+about = "" if facet_count.low == facet_count.high else "about "
+in_genre = f" in **{main_genre}**" if genre_tag == 2 else ""
+narrowed = " (your genre selection narrows this down further)" if genre_selection else ""
+st.caption(f"🎯 {about}**{facet_count.films:,}** films match{in_genre}{narrowed}")
+
 #==================
 # Reset botton
 #==================
@@ -629,6 +567,30 @@ if save_toggle:
 else:
     sort_ascending = st.toggle('Descending/ascending', value=False)
 
+#=======================
+# Roomie taste ranking
+#=======================
+
+# Logged-in roomie (set by the authenticator), and their taste profile from the 
+# watch history (kept in the session until a film is added)
+roomie = st.session_state.get('name')
+taste_profile = None
+
+if roomie:
+    if st.session_state.get('taste_profile_name') != roomie:
+        with archive_connection(schemas=[TASTE_SCHEMA]) as conn:
+            st.session_state.taste_profile = load_taste_profile(conn, roomie)
+        st.session_state.taste_profile_name = roomie
+
+    if st.session_state.taste_profile.entries:
+        if st.toggle(f"🎯 Rank by {roomie}'s taste", key='taste_toggle', value=True):
+            taste_profile = st.session_state.taste_profile
+            st.caption("🎯 All films within the filters are ranked by your taste (the "
+                       "sort order breaks ties), then cut to the number of suggestions. "
+                       "Films you already watched come last.")
+    else:
+        st.caption("🎯 Tell us which films you watched (below) and the results get ranked by your taste!")
+
 st.divider()
 
 #============================
@@ -645,85 +607,154 @@ def film_data_filter(selected_years,
                      operator, 
                      genre_selection,
                      sort_column,
-                     top_n):
-
-    conn = sqlite3.connect("data/film_database.db")
-    cursor = conn.cursor()
-
-    # Base query
-    query = """
-        SELECT * FROM film_data
-        WHERE 
-            startYear BETWEEN ? AND ?
-            AND runtimeMinutes BETWEEN ? AND ?
-            AND averageRating BETWEEN ? AND ?
-            AND numVotes >= ?
-    """
-    params = [
-        selected_years[0], selected_years[1],
-        selected_time[0], selected_time[1],
-        selected_rating[0], selected_rating[1],
-        selected_votes
-    ]
-
-    # Optional genre filters
-    if genre_tag == 2:
-        query += " AND main_genre = ?"
-        params.append(main_genre)
-
-    if genre_tag != 0 and genre_selection:
-        if operator == 0:  # AND
-            for genre in genre_selection:
-                query += f" AND {genre} = 1"
-        elif operator == 1:  # OR
-            genre_conditions = " OR ".join([f"{genre} = 1" for genre in genre_selection])
-            query += f" AND ({genre_conditions})"
-
-    # Add ORDER BY and LIMIT
-    order = "ASC" if sort_ascending else "DESC"
-    query += f" ORDER BY {sort_column} {order}"
-
-    if top_n is not None:
-        query += " LIMIT ?"
-        params.append(top_n)
-
-    df = pd.read_sql_query(sql=query, con=conn, params=params)
-    conn.close()
+                     top_n,
+                     sort_ascending):
+
+    filters = (selected_years, 
+               selected_time, 
+               selected_rating, 
+               selected_votes,
+               genre_tag, 
+               main_genre, 
+               operator, 
+               genre_selection,
+               sort_column,
+               top_n,
+               sort_ascending)
+
+    # Filter in memory (the engine gives the same rows as the SQLite query); 
+    # results are shared between sessions until the IMDb data version or the 
+    # database snapshot changes
+    engine = get_film_engine()
+    df = get_filter_cache().get_or_compute(filter_cache_key(*filters), 
+                                           (data_version(), snapshot_token()),
+                                           lambda: engine.filter(*filters))
     return df    
 
-filtered_filma_data = film_data_filter(selected_years, 
-                                       selected_time, 
-                                       selected_rating, 
-                                       selected_votes,
-                                       genre_tag, 
-                                       main_genre, 
-                                       operator, 
-                                       genre_selection,
-                                       sort_column,
-                                       top_n)
+#==================================
+# Paginated results ("All")
+#==================================
+
+# "All" shows one page at a time: each page starts right after the (sort value, 
+# tconst) of the last film of the previous page, and the total is counted 
+# separately, so a rerun costs the same however broad the filters are
+def film_data_count(film_filters):
+    engine = get_film_engine()
+    key = ('count', filter_cache_key(*film_filters, None, None))
+    return get_filter_cache().get_or_compute(key, 
+                                             (data_version(), snapshot_token()),
+                                             lambda: engine.count(*film_filters))
+
+def film_data_page(film_filters, sort_column, after, sort_ascending):
+    engine = get_film_engine()
+    key = ('page', filter_cache_key(*film_filters, sort_column, None, sort_ascending), 
+           after, PAGE_SIZE)
+    return get_filter_cache().get_or_compute(key, 
+                                             (data_version(), snapshot_token()),
+                                             lambda: engine.page(*film_filters, 
+                                                                 sort_column, 
+                                                                 PAGE_SIZE, 
+                                                                 after, 
+                                                                 sort_ascending))
+
+# Ranked by taste: the filtered rows (in the sort order, for ties) ordered by the 
+# roomie's taste with the films they watched last, kept until a film is added to 
+# their history
+def film_data_taste_rows(film_filters, sort_column, sort_ascending, profile):
+    engine = get_film_engine()
+    key = ('taste', filter_cache_key(*film_filters, sort_column, None, sort_ascending), 
+           profile.name, profile.entries)
+    rows = lambda: engine.top_rows(engine.matching_rows(*film_filters), 
+                                   sort_column, None, sort_ascending)
+    return get_filter_cache().get_or_compute(key, 
+                                             (data_version(), snapshot_token()),
+                                             lambda: profile.rank_rows(engine, rows()))
+
+# Callbacks of the page buttons (the key before every visited page is kept)
+def next_page(key):
+    st.session_state.results_page_keys.append(key)
+
+def previous_page():
+    st.session_state.results_page_keys.pop()
+
+film_filters = (selected_years, 
+                selected_time, 
+                selected_rating, 
+                selected_votes,
+                genre_tag, 
+                main_genre, 
+                operator, 
+                genre_selection)
+
+if facet_count.high == 0:
+    # Certainly no films within the sliders (the facet cube's upper bound): 
+    # nothing to query
+    page_number = 0
+    filtered_filma_data = get_film_engine().films.iloc[:0]
+    total_films = 0
+elif top_n is None:
+    # Start at the first page whenever the filters, the sorting or the ranking change
+    results_key = (filter_cache_key(*film_filters, sort_column, None, sort_ascending), 
+                   taste_profile is not None)
+    if st.session_state.get('results_key') != results_key:
+        st.session_state.results_key = results_key
+        st.session_state.results_page_keys = [None]
+
+    page_number = len(st.session_state.results_page_keys) - 1
+    if taste_profile is not None:
+        # Ranked by taste: every film is scored (one vectorized pass), only the 
+        # films of the page are taken
+        ranked_rows = film_data_taste_rows(film_filters, sort_column, sort_ascending, 
+                                           taste_profile)
+        total_films = len(ranked_rows)
+        page_rows = ranked_rows[page_number * PAGE_SIZE:(page_number + 1) * PAGE_SIZE]
+        filtered_filma_data = get_film_engine().films.take(page_rows).reset_index(drop=True)
+    else:
+        total_films = film_data_count(film_filters)
+        filtered_filma_data = film_data_page(film_filters, 
+                                             sort_column, 
+                                             st.session_state.results_page_keys[-1], 
+                                             sort_ascending)
+else:
+    page_number = 0
+    if taste_profile is not None:
+        # Ranked by taste: the best top_n of all filtered films, not a re-sort of 
+        # the top_n films of the sort
+        ranked_rows = film_data_taste_rows(film_filters, sort_column, sort_ascending, 
+                                           taste_profile)
+        filtered_filma_data = get_film_engine().films.take(ranked_rows[:top_n]).reset_index(drop=True)
+    else:
+        filtered_filma_data = film_data_filter(*film_filters,
+                                               sort_column,
+                                               top_n,
+                                               sort_ascending)
+    total_films = len(filtered_filma_data)
 
 #=============================
 # Display filtered movies
 #=============================
 
-@st.cache_data
-def display_filtered_df(filtered_filma_data):
-    # Create the DataFrame with selected features and reset the index
-    display_df = filtered_filma_data[['tconst', 'primaryTitle', 'startYear', 'runtimeMinutes', 
-                              'main_genre', 'other_genres', 'averageRating', 
-                              'numVotes']].copy()
-    display_df.columns = ['ID', 'Film', 'Year', 'Duration', 'Main genre', 
-                          'Additional genres', 'IMDb Rating', 'Number of votes']
-    
-    # Reset the index and add 1 to start from 1
-    display_df.reset_index(drop=True, inplace=True)
-    display_df.index = display_df.index + 1
+# Result column -> column name in the results table
+DISPLAY_COLUMNS = {'tconst': 'ID', 
+                   'primaryTitle': 'Film', 
+                   'startYear': 'Year', 
+                   'runtimeMinutes': 'Duration', 
+                   'main_genre': 'Main genre', 
+                   'other_genres': 'Additional genres', 
+                   'averageRating': 'IMDb Rating', 
+                   'numVotes': 'Number of votes'}
+
+def display_filtered_df(filtered_filma_data, first_index=1):
+    # The results only hold the displayed columns: rename them (without copying 
+    # the data) and number the rows from first_index (1 on the first page)
+    display_df = filtered_filma_data.rename(columns=DISPLAY_COLUMNS)
+    display_df.index = range(first_index, first_index + len(display_df))
     display_df.index.name = 'Index'
 
     return display_df
 
 # Run display_filtered_df()
-display_df = display_filtered_df(filtered_filma_data)
+display_df = display_filtered_df(filtered_filma_data, page_number * PAGE_SIZE + 1)
 
 # Show display_df or error message to user
 if (genre_tag == 1 and len(genre_selection) > 3) or (genre_tag == 2 and len(genre_selection) > 2):
@@ -731,8 +762,25 @@ if (genre_tag == 1 and len(genre_selection) > 3) or (genre_tag == 2 and len(genr
 elif display_df.empty:
     st.error('No movies found within the boundaries of the chosen filters!')
 else:
-    st.write(f'Behold! **{len(display_df)}** films that are within your chosen filters:')
-    st.dataframe(display_df.iloc[:, 1:])            
+    st.write(f'Behold! **{total_films}** films that are within your chosen filters:')
+    st.dataframe(display_df.iloc[:, 1:], 
+                 column_config={'IMDb Rating': st.column_config.NumberColumn(format='%.1f')})
+
+    # Page through "All" 
+    if top_n is None and total_films > PAGE_SIZE:
+        page_count = -(-total_films // PAGE_SIZE)
+        previous_column, page_column, next_column = st.columns([1, 2, 1])
+        with previous_column:
+            st.button('⬅️ Previous', on_click=previous_page, disabled=page_number == 0)
+        with page_column:
+            st.caption(f'Page {page_number + 1} of {page_count}')
+        with next_column:
+            # The key of a page ranked by taste is just its number
+            next_key = (page_number + 1 if taste_profile is not None 
+                        else page_key(filtered_filma_data, sort_column))
+            st.button('Next ➡️', on_click=next_page, 
+                      args=(next_key,),
+                      disabled=page_number + 1 >= page_count)
 
 #===============================
 # No genre warning
@@ -760,17 +808,65 @@ After all, every great mystery deserves a closer look... 🧐🔍
 
 """)
 
-# Select a movie
-IMDb_link = st.selectbox("Select film:", display_df['Film'].unique())
-            
-# Get film ID
-ID = display_df[display_df['Film'] == IMDb_link].iloc[0, 0]
+# Title index of the whole catalogue (shared by all sessions, built once per 
+# database snapshot)
+title_index = get_title_index()
 
-# Define IMDb URL
-url = f'https://www.imdb.com/title/{ID}/'
+# Films of the list above, or the completions of a title typed in
+title_prefix = st.text_input("Or look up any film by title:", 
+                             placeholder="Start typing a title...")
+if title_prefix.strip():
+    film_options = title_index.complete(title_prefix)
+else:
+    film_options = display_df['ID'].tolist()
 
-# Link button in first column
-st.link_button("Visit IMDb page!", url)
+if not film_options:
+    st.error('No film to visit!')
+else:
+    # Select a movie (labelled with year and director, so equal titles differ)
+    ID = st.selectbox("Select film:", film_options, format_func=title_index.label)
+
+    # Define IMDb URL
+    url = f'https://www.imdb.com/title/{ID}/'
+
+    # Link button in first column
+    st.link_button("Visit IMDb page!", url)
+
+    # Add the film to the roomie's watch history (updates the taste profile and 
+    # the Movie Stats)
+    def add_to_history(tconst):
+        film = film_facts(get_connection(), tconst)
+        with archive_connection(schemas=[TASTE_SCHEMA, STATS_SCHEMA]) as conn:
+            st.session_state.taste_profile = add_watch(conn, roomie, film, 
+                                                       st.session_state.watch_rating, 
+                                                       snack=st.session_state.watch_snack)
+        st.session_state.taste_profile_name = roomie
+        st.toast(f"✅ Added {title_index.label(tconst)} to your watch history!")
+
+    if roomie:
+        rating_column, snack_column, watched_column = st.columns([2, 2, 1])
+        with rating_column:
+            st.slider("Your rating:", 1, 10, 7, key='watch_rating')
+        with snack_column:
+            st.text_input("Snack of the night:", placeholder="Popcorn?", key='watch_snack')
+        with watched_column:
+            st.button("✅ Watched it!", on_click=add_to_history, args=(ID,))
+
+    # Films like the selected one (genres, directors, years, runtime, rating): 
+    # one lookup in the precomputed neighbour table, or computed from the feature 
+    # vectors for databases built without it
+    with st.expander(f"🍿 More like {title_index.label(ID)}"):
+        if has_film_neighbors(get_connection()):
+            similar = film_neighbors(get_connection(), ID, k=10)
+        else:
+            similar = get_film_features().similar(ID, k=10)
+        similar_df = get_film_engine().lookup([tconst for tconst, _ in similar])
+
+        if similar_df.empty:
+            st.write("No similar films found!")
+        else:
+            st.dataframe(display_filtered_df(similar_df).iloc[:, 1:], 
+                         column_config={'IMDb Rating': st.column_config.NumberColumn(format='%.1f')})
 
 #==================
 # End the pain
@@ -783,7 +879,11 @@ st.write("""Did your movie selection turn out to be just as hopeless as your
          pick a random film within your movie preferences.""")
 
 if st.button('END THE PAIN 💉'):
-    end_pain = display_df.sample(1)
+    if top_n is None:
+        # Pick from all films, not only from the page that is shown
+        end_pain = display_filtered_df(get_film_engine().sample(*film_filters))
+    else:
+        end_pain = display_df.sample(1)
 
     # Extract values from the row
     film_title = end_pain['Film'].values[0]
@@ -791,8 +891,16 @@ if st.button('END THE PAIN 💉'):
     rating = end_pain['IMDb Rating'].values[0]
 
     # Display the film suggestion
-    st.write(f"💊 You must watch **{film_title}** ({film_year}) — IMDb {rating}/10")
+    st.write(f"💊 You must watch **{film_title}** ({film_year}) — IMDb {rating:.1f}/10")
+
+#=================
+# Diagnostics
+#=================
 
+# Counters of the caches shared by all sessions of this process: logged at debug
+# level, as they are for the maintainers, not for every visitor
+logger.debug("Filter result cache: %s", get_filter_cache().stats())
+logger.debug("Film database connections: %s", connection_stats())
 
 # ===========
 # Footer
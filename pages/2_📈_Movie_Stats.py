@@ -2,141 +2,94 @@
 # Imports
 #===============
 import streamlit as st
-from utils.auth import get_authenticator
+from utils.auth import require_login
+from utils.sidebar import random_film_sidebar
+from utils.film_db import get_connection
+from utils.archive_db import archive_connection
+from utils.taste import TASTE_SCHEMA
+from utils.watch_stats import STATS_SCHEMA, needs_rebuild, rebuild_watch_stats, load_watch_stats
 import pandas as pd
-import time
-from datetime import datetime
-import random
-import sqlite3
 
 #====================
 # Authentication
 #====================
-# Create the authenticator
-authenticator = get_authenticator()
-
-# Show the login widget
-try:
-    authenticator.login()
-except Exception as e:
-    st.error(e)
-    st.stop()
+# Show the login widget until logged in (a verified session only checks its 
+# session token), and logout in the sidebar
+require_login()
 
-# Check login status
-auth_status = st.session_state.get('authentication_status')
+#=============
+# Sidebar
+#=============
 
-if auth_status is False:
-    st.error("Username/password is incorrect")
-    st.stop()
-elif auth_status is None:
-    st.warning("Please enter your username and password")
-    st.stop()
+# Sidebar: Random Film Generator (shared by all pages)
+random_film_sidebar()
 
-# If logged in, show logout in sidebar
-authenticator.logout(location="sidebar")
+#=====================
+# Stats introduction
+#=====================
 
-st.write('🏗️ PAGE UNDER CONSTRUCTION 🚧👷')
+st.header("📈 Movie Stats", divider="rainbow")
 
-#=============
-# Sidebar
-#=============
+st.write('''Who watched the most films, which genres and decades are everyone's 
+         favourites, and which snack rules movie night? Every film you mark as 
+         watched in the Film Chooser counts!''')
+
+#==================
+# Summary tables
+#==================
+
+# The stats are kept up to date with every film added to the watch history, so 
+# the page reads a few small summary tables (however many nights were recorded)
+with archive_connection(schemas=[TASTE_SCHEMA, STATS_SCHEMA]) as conn:
+    # History recorded before the summary tables existed is counted once
+    if needs_rebuild(conn):
+        rebuild_watch_stats(conn, get_connection())
+    stats = load_watch_stats(conn)
+
+if stats['roomies'].empty:
+    st.info("No films watched yet! Mark the films you watched in the Film Chooser "
+            "and the stats show up here. 🍿")
+    st.stop()
+
+#====================
+# Roomie overview
+#====================
 
-# Sidebar: Random Film Button
-st.sidebar.title("Random Film Generator")
-
-st.sidebar.write("""Can't decide what to watch? Let our Random Film Generator 
-                 choose for you! Click the button and let faith decide!
-                 Enjoy your movie night! 🍿🎥""")
-
-if st.sidebar.button("Random film!"):
-    def random_film ():
-        conn = sqlite3.connect("data/film_database.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT *
-            FROM film_data
-            ORDER BY RANDOM()
-            LIMIT 1
-        """)
-        random_choice = cursor.fetchone()
-        conn.close()
-        return random_choice
-
-    # Run random_film()
-    random_movie = random_film()
-
-    # List of funny texts
-    funny_texts = [
-        "Reading your aura...",
-        "Taming a monkey...",
-        "Brewing some coffee...",
-        "Counting stars...",
-        "Feeding the unicorns...",
-        "Polishing the pixels...",
-        "Summoning good vibes...",
-        "Tickling the code...",
-        "Charging the flux capacitor...",
-        "Aligning the planets...",
-        "Petting the cat...",
-        "Warming up the servers...",
-        "Finding Waldo...",
-        "Herding cats...",
-        "Sharpening pencils...",
-        "Calibrating the matrix...",
-        "Baking cookies...",
-        "Inflating balloons...",
-        "Painting rainbows...",
-        "Hacking the mainframe...",
-        "Teleporting data...",
-        "Tickling the electrons...",
-        "Spinning up the hamster wheel...",
-        "Inflating the internet...",
-        "Waking up the servers...",
-        "Unleashing the magic...",
-        "Mixing the potions...",
-        "Charging the crystals...",
-        "Consulting the oracle...",
-        "Tuning the algorithms...",
-        "Rebooting the matrix...",
-        "Casting spells...",
-        "Brewing the potion...",
-        "Hunting for Easter eggs...",
-        "Rewiring the circuits...",
-        "Synchronizing the clocks...",
-        "Lubricating the gears...",
-        "Recalibrating the sensors...",
-        "Recharging the batteries...",
-        "Assembling the pixels..."
-    ]
-
-    # Randomly choose a funny text
-    progress_text = random.choice(funny_texts)
-
-    # Create a progress bar
-    my_bar = st.sidebar.progress(0)
-       
-    # Randomly choose a duration between 0.1 and 2 seconds
-    duration = random.uniform(0.1, 1.5)
-
-    # Calculate the sleep time per iteration
-    sleep_time = duration / 100
-
-    for percent_complete in range(100):
-        time.sleep(sleep_time)
-        my_bar.progress(percent_complete + 1, text=progress_text)
-
-    time.sleep(1)
-    my_bar.empty()
-
-    st.sidebar.write(f'''
-                     Maybe you'd like to watch **{random_movie[2]}**?
-                     
-                     **Rating: {random_movie[38]} | 
-                     Duration: {random_movie[4]} min.** |
-                     **Year: {random_movie[3]}**
-                     ''')
-
-    # Define IMDb URL
-    random_url = f'https://www.imdb.com/title/{random_movie[0]}/'
-
-    st.sidebar.link_button('Visit IMDb page!', random_url)
\ No newline at end of file
+st.subheader("🧑‍🤝‍🧑 Roomies")
+
+for column, roomie in zip(st.columns(len(stats['roomies'])), 
+                          stats['roomies'].itertuples()):
+    with column:
+        st.markdown(f"**{roomie.name}**")
+        st.metric("Films watched", roomie.films)
+        st.metric("Average rating", 
+                  "-" if pd.isna(roomie.avg_rating) else f"{roomie.avg_rating:.1f}")
+        st.metric("Hours watched", f"{roomie.hours:.1f}")
+
+# Favourite genre and snack of every roomie
+favourites = stats['favourites'].rename(columns={'name': 'Roomie', 
+                                                 'genre': 'Favourite genre', 
+                                                 'snack': 'Favourite snack'})
+st.dataframe(favourites, hide_index=True)
+
+#==================
+# Trends
+#==================
+
+genre_tab, decade_tab, snack_tab = st.tabs(["🎭 Genres", "📅 Decades", "🍿 Snacks"])
+
+with genre_tab:
+    st.bar_chart(stats['genres'], x='genre', y='films', color='name', 
+                 x_label='Genre', y_label='Films watched')
+
+with decade_tab:
+    decades = stats['decades'].assign(decade=stats['decades']['decade'].astype(str) + 's')
+    st.bar_chart(decades, x='decade', y='films', color='name', 
+                 x_label='Decade', y_label='Films watched')
+
+with snack_tab:
+    if stats['snacks'].empty:
+        st.write("No snacks recorded yet!")
+    else:
+        st.bar_chart(stats['snacks'], x='snack', y='films', color='name', 
+                     x_label='Snack', y_label='Movie nights')
\ No newline at end of file
@@ -3,11 +3,14 @@
 #===============
 import streamlit as st
 from utils.auth import get_authenticator
+from utils.sidebar import random_film_sidebar
+from utils.film_db import get_connection, snapshot_token
+from utils.film_search import search_films, has_film_search
+from utils.film_neighbors import film_neighbors, has_film_neighbors
+from utils.archive_db import archive_connection
+from utils.movie_nights import NIGHTS_SCHEMA, movie_night_dates, archive_films
 import pandas as pd
-import time
 from datetime import datetime
-import random
-import sqlite3
 
 #====================
 # Authentication
@@ -41,105 +44,8 @@ st.write('🏗️ PAGE UNDER CONSTRUCTION 🚧👷')
 # Sidebar
 #=============
 
-# Sidebar: Random Film Button
-st.sidebar.title("Random Film Generator")
-
-st.sidebar.write("""Can't decide what to watch? Let our Random Film Generator 
-                 choose for you! Click the button and let faith decide!
-                 Enjoy your movie night! 🍿🎥""")
-
-if st.sidebar.button("Random film!"):
-    def random_film ():
-        conn = sqlite3.connect("data/film_database.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT *
-            FROM film_data
-            ORDER BY RANDOM()
-            LIMIT 1
-        """)
-        random_choice = cursor.fetchone()
-        conn.close()
-        return random_choice
-
-    # Run random_film()
-    random_movie = random_film()
-
-    # List of funny texts
-    funny_texts = [
-        "Reading your aura...",
-        "Taming a monkey...",
-        "Brewing some coffee...",
-        "Counting stars...",
-        "Feeding the unicorns...",
-        "Polishing the pixels...",
-        "Summoning good vibes...",
-        "Tickling the code...",
-        "Charging the flux capacitor...",
-        "Aligning the planets...",
-        "Petting the cat...",
-        "Warming up the servers...",
-        "Finding Waldo...",
-        "Herding cats...",
-        "Sharpening pencils...",
-        "Calibrating the matrix...",
-        "Baking cookies...",
-        "Inflating balloons...",
-        "Painting rainbows...",
-        "Hacking the mainframe...",
-        "Teleporting data...",
-        "Tickling the electrons...",
-        "Spinning up the hamster wheel...",
-        "Inflating the internet...",
-        "Waking up the servers...",
-        "Unleashing the magic...",
-        "Mixing the potions...",
-        "Charging the crystals...",
-        "Consulting the oracle...",
-        "Tuning the algorithms...",
-        "Rebooting the matrix...",
-        "Casting spells...",
-        "Brewing the potion...",
-        "Hunting for Easter eggs...",
-        "Rewiring the circuits...",
-        "Synchronizing the clocks...",
-        "Lubricating the gears...",
-        "Recalibrating the sensors...",
-        "Recharging the batteries...",
-        "Assembling the pixels..."
-    ]
-
-    # Randomly choose a funny text
-    progress_text = random.choice(funny_texts)
-
-    # Create a progress bar
-    my_bar = st.sidebar.progress(0)
-       
-    # Randomly choose a duration between 0.1 and 2 seconds
-    duration = random.uniform(0.1, 1.5)
-
-    # Calculate the sleep time per iteration
-    sleep_time = duration / 100
-
-    for percent_complete in range(100):
-        time.sleep(sleep_time)
-        my_bar.progress(percent_complete + 1, text=progress_text)
-
-    time.sleep(1)
-    my_bar.empty()
-
-    st.sidebar.write(f'''
-                     Maybe you'd like to watch **{random_movie[2]}**?
-                     
-                     **Rating: {random_movie[38]} | 
-                     Duration: {random_movie[4]} min.** |
-                     **Year: {random_movie[3]}**
-                     ''')
-
-    # Define IMDb URL
-    random_url = f'https://www.imdb.com/title/{random_movie[0]}/'
-
-    st.sidebar.link_button('Visit IMDb page!', random_url)
+# Sidebar: Random Film Generator (shared by all pages)
+random_film_sidebar()
 
 # ===============================
 # region Archive intoduction
@@ -155,4 +61,127 @@ st.write('''The Film Archive is a comprehensive hub where you can revisit all th
          information, providing a quick overview of key details. For added convenience, 
          there’s a dedicated IMDb film page button, so you can instantly visit the 
          official page for any movie. It’s the perfect way to relive past movie nights 
-         and discover new favorites!''')
\ No newline at end of file
+         and discover new favorites!''')
+
+#===================
+# Movie nights
+#===================
+
+st.subheader('Movie nights', divider='violet')
+
+ALL_NIGHTS = 'All movie nights'
+
+# Every suggestion with the IMDb details of its film, joined in one query
+with archive_connection(schemas=[NIGHTS_SCHEMA]) as conn:
+    night_dates = movie_night_dates(conn)
+    if night_dates:
+        # The latest night first, the whole collection on request
+        night = st.selectbox("Movie night:", night_dates + [ALL_NIGHTS])
+        nights = archive_films(conn, night_on=None if night == ALL_NIGHTS else night)
+
+if not night_dates:
+    st.info("No movie nights in the archive yet! Import them with "
+            "`python -m utils.movie_nights nights.csv --roomies <names>` (the roomies "
+            "get the watched films in their history and stats).")
+else:
+    if night != ALL_NIGHTS and nights['snack'].notna().any():
+        st.write(f"🍿 Snack of the night: **{nights['snack'].iloc[0]}**")
+
+    directors = (nights['nmDirector_1'].fillna('') + ', ' 
+                 + nights['nmDirector_2'].fillna('')).str.strip(', ')
+    nights_df = pd.DataFrame({
+        'Night': nights['night_on'],
+        'Room': nights['room'],
+        'Film': nights['primaryTitle'].fillna(nights['tconst']),
+        'Year': nights['startYear'].astype('Int64'),
+        'Director(s)': directors,
+        'Votes': nights['votes'],
+        'Watched': nights['chosen'].astype(bool),
+        'IMDb Rating': nights['averageRating'],
+        'Snack': nights['snack'],
+        'IMDb page': 'https://www.imdb.com/title/' + nights['tconst'] + '/',
+    })
+    if night != ALL_NIGHTS:
+        nights_df = nights_df.drop(columns=['Night', 'Snack'])
+    nights_df.index = range(1, len(nights_df) + 1)
+
+    st.dataframe(nights_df,
+                 column_config={
+                     'Watched': st.column_config.CheckboxColumn(),
+                     'IMDb Rating': st.column_config.NumberColumn(format='%.1f'),
+                     'IMDb page': st.column_config.LinkColumn(display_text='Visit IMDb'),
+                 })
+
+#===================
+# Archive search
+#===================
+
+st.subheader('Search', divider='violet')
+
+st.write("""🔎 Looking for that one film? Type (part of) a title or a director. Accents 
+         don't matter, and a typo or two is forgiven.""")
+
+@st.cache_data(max_entries=1000)
+def film_search(text, snapshot):
+    return search_films(get_connection(), text)
+
+search_text = st.text_input("Search films and directors:", 
+                            placeholder="e.g. kill bill, tarantino, amelie...")
+
+if not has_film_search(get_connection()):
+    st.warning("The search index is missing: rebuild the film database first!")
+elif search_text.strip():
+    results = film_search(search_text.strip(), snapshot_token())
+
+    if results.empty:
+        st.error(f'No films found for "{search_text}"!')
+    else:
+        if results['fuzzy'].any():
+            st.caption("🤏 Some results are close matches, not exact ones.")
+
+        directors = (results['nmDirector_1'].fillna('') + ', ' 
+                     + results['nmDirector_2'].fillna('')).str.strip(', ')
+        display_df = pd.DataFrame({
+            'Film': results['primaryTitle'],
+            'Year': results['startYear'],
+            'Director(s)': directors,
+            'IMDb Rating': results['averageRating'],
+            'Number of votes': results['numVotes'],
+            'IMDb page': 'https://www.imdb.com/title/' + results['tconst'] + '/',
+        })
+        display_df.index = range(1, len(display_df) + 1)
+
+        st.dataframe(display_df,
+                     column_config={
+                         'IMDb Rating': st.column_config.NumberColumn(format='%.1f'),
+                         'IMDb page': st.column_config.LinkColumn(display_text='Visit IMDb'),
+                     })
+
+        #===================
+        # Related films
+        #===================
+
+        if has_film_neighbors(get_connection()):
+            labels = dict(zip(results['tconst'], 
+                              results['primaryTitle'] + ' (' + results['startYear'].astype(str) + ')'))
+            related_to = st.selectbox("Films related to:", list(labels), format_func=labels.get)
+
+            # One lookup in the precomputed neighbour table
+            related = pd.DataFrame(film_neighbors(get_connection(), related_to, k=10), 
+                                   columns=['tconst', 'Similarity'])
+            placeholders = ', '.join('?' * len(related))
+            related_films = pd.read_sql_query(f"""
+                SELECT tconst, primaryTitle AS Film, startYear AS Year, 
+                       averageRating AS "IMDb Rating", numVotes AS "Number of votes"
+                FROM film_data
+                WHERE tconst IN ({placeholders})
+            """, get_connection(), params=related['tconst'].tolist())
+            related = related.merge(related_films, on='tconst')
+            related.index = range(1, len(related) + 1)
+
+            st.dataframe(related.drop(columns='tconst'),
+                         column_config={
+                             'IMDb Rating': st.column_config.NumberColumn(format='%.1f'),
+                             'Similarity': st.column_config.ProgressColumn(min_value=0.0, 
+                                                                           max_value=1.0),
+                         })
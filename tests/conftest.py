@@ -0,0 +1,47 @@
+import sqlite3
+import pytest
+from utils.archive_db import archive_connection
+from utils.imdb_synthetic import write_synthetic_imdb, write_synthetic_film_database
+from utils.movie_nights import NIGHTS_SCHEMA
+from utils.taste import TASTE_SCHEMA
+
+#=========================
+# Synthetic film database
+#=========================
+
+# Small enough to build in a few seconds, large enough for every filter case
+SYNTHETIC_TITLES = 50_000
+
+@pytest.fixture(scope='session')
+def imdb_directory(tmp_path_factory):
+    """Directory with the four synthetic IMDb files"""
+    directory = str(tmp_path_factory.mktemp('imdb'))
+    write_synthetic_imdb(directory, titles=SYNTHETIC_TITLES)
+    return directory
+
+
+@pytest.fixture(scope='session')
+def film_db_path(imdb_directory, tmp_path_factory):
+    """Film database built from the synthetic files by the ingestion pipeline"""
+    db_path = str(tmp_path_factory.mktemp('db') / 'film_database.db')
+    write_synthetic_film_database(imdb_directory, db_path, titles=SYNTHETIC_TITLES)
+    return db_path
+
+
+@pytest.fixture
+def film_conn(film_db_path):
+    """Read-only connection to the synthetic film database"""
+    conn = sqlite3.connect(f"file:{film_db_path}?mode=ro", uri=True)
+    yield conn
+    conn.close()
+
+#=====================
+# Archive database
+#=====================
+
+@pytest.fixture
+def archive_conn(tmp_path):
+    """Connection to an empty archive database (watch history and movie nights)"""
+    with archive_connection(str(tmp_path / 'archive.db'),
+                            schemas=[TASTE_SCHEMA, NIGHTS_SCHEMA]) as conn:
+        yield conn
@@ -0,0 +1,66 @@
+import time
+import jwt
+import pytest
+import streamlit as st
+from utils.auth import SESSION_TOKEN_MINUTES, AuthConfig, session_token, verified_session
+
+AUTH = AuthConfig(config={}, fingerprint='secrets-1', session_key='k' * 64)
+
+
+@pytest.fixture
+def session():
+    """st.session_state of a logged-in user, without a session token yet"""
+    st.session_state.clear()
+    st.session_state.authentication_status = True
+    st.session_state.username = 'anna'
+    yield st.session_state
+    st.session_state.clear()
+
+
+def test_token_verifies_session(session):
+    assert not verified_session(AUTH)
+    session.auth_session_token = session_token(AUTH, 'anna')
+    assert verified_session(AUTH)
+
+
+def test_token_of_other_user_or_secrets(session):
+    session.auth_session_token = session_token(AUTH, 'ben')
+    assert not verified_session(AUTH)
+
+    session.auth_session_token = session_token(AUTH, 'anna')
+    assert not verified_session(AUTH._replace(fingerprint='secrets-2'))
+    assert not verified_session(AUTH._replace(session_key='x' * 64))
+
+
+def test_logged_out_session(session):
+    session.auth_session_token = session_token(AUTH, 'anna')
+    session.authentication_status = None
+    assert not verified_session(AUTH)
+
+
+def test_expired_token(session, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now - SESSION_TOKEN_MINUTES * 60 - 5)
+    session.auth_session_token = session_token(AUTH, 'anna')
+    monkeypatch.undo()
+    assert not verified_session(AUTH)
+
+
+def test_tampered_token(session):
+    token = session_token(AUTH, 'anna')
+    header, payload, signature = token.split('.')
+
+    # Same signature, claims of another user
+    forged = jwt.encode({'username': 'anna', 'secrets': AUTH.fingerprint,
+                         'exp': int(time.time()) + 10 * SESSION_TOKEN_MINUTES * 60},
+                        'w' * 64, algorithm='HS256')
+    session.auth_session_token = '.'.join([header, forged.split('.')[1], signature])
+    assert not verified_session(AUTH)
+
+    # Unsigned token
+    session.auth_session_token = jwt.encode({'username': 'anna', 'secrets': AUTH.fingerprint},
+                                            None, algorithm='none')
+    assert not verified_session(AUTH)
+
+    session.auth_session_token = 'not a token'
+    assert not verified_session(AUTH)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from utils.facets import FacetCube
+from utils.film_queries import film_count_query
+
+
+def exact_count(conn, selected_years, selected_time, selected_rating, selected_votes,
+                main_genre=None):
+    """Count the films of the sliders (and main genre) with SQLite"""
+    query, params = film_count_query(selected_years, selected_time, selected_rating,
+                                     selected_votes, genre_tag=0 if main_genre is None else 2,
+                                     main_genre=main_genre, operator=0, genre_selection=[])
+    return conn.execute(query, params).fetchone()[0]
+
+
+def slider_cases(conn, n=40, seed=7):
+    """Random slider values (mostly between the bucket edges), and the slider defaults"""
+    first_year, last_year = conn.execute("SELECT MIN(startYear), MAX(startYear) "
+                                         "FROM film_data").fetchone()
+    rng = np.random.default_rng(seed)
+    cases = [((1985, last_year), (60, 120), (7.0, 10.0), 100000)]
+    for _ in range(n):
+        years = sorted(rng.integers(first_year, last_year + 1, size=2).tolist())
+        time = sorted(rng.integers(30, 241, size=2).tolist())
+        rating = sorted(np.round(rng.uniform(1.0, 10.0, size=2), 1).tolist())
+        votes = int(rng.choice([0, 100, 1000, 7500, 100000]))
+        cases.append((tuple(years), tuple(time), tuple(rating), votes))
+    return cases
+
+
+@pytest.fixture
+def cube(film_conn):
+    return FacetCube.from_connection(film_conn)
+
+
+def test_counts_within_bounds(film_conn, cube):
+    for sliders in slider_cases(film_conn):
+        count = cube.count(*sliders)
+        exact = exact_count(film_conn, *sliders)
+        assert count.low <= exact <= count.high, sliders
+        assert count.low <= count.films <= count.high, sliders
+
+
+def test_main_genre_counts_within_bounds(film_conn, cube):
+    for sliders in slider_cases(film_conn, n=10):
+        for genre in cube.genres:
+            count = cube.count(*sliders, main_genre=genre)
+            exact = exact_count(film_conn, *sliders, main_genre=genre)
+            assert count.low <= exact <= count.high, (sliders, genre)
+
+
+def test_counts_exact_on_bucket_edges(film_conn, cube):
+    # The slider defaults and the widest sliders sit on bucket edges
+    last_year = int(cube.edges[0][-2]) - 1
+    for sliders in (slider_cases(film_conn, n=0)[0],
+                    ((int(cube.edges[0][0]), last_year), (30, 240), (1.0, 10.0), 0)):
+        count = cube.count(*sliders)
+        assert count.low == count.films == count.high == exact_count(film_conn, *sliders)
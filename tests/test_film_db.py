@@ -0,0 +1,75 @@
+import gc
+import os
+import shutil
+import sqlite3
+import threading
+import pytest
+from utils.film_db import ReadOnlyConnectionPool
+
+
+@pytest.fixture
+def pool(film_db_path, tmp_path):
+    """Pool on a copy of the synthetic database (so a test can swap in a new snapshot)"""
+    db_path = str(tmp_path / 'film_database.db')
+    shutil.copy(film_db_path, db_path)
+    pool = ReadOnlyConnectionPool(db_path)
+    yield pool
+    pool.close_all()
+
+
+def in_thread(function):
+    """Run function in a new thread (which returns its connection when it ends)"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function()))
+    thread.start()
+    thread.join()
+    gc.collect()
+    return result[0]
+
+
+def query(pool):
+    conn = pool.connection()
+    conn.execute("SELECT COUNT(*) FROM film_data").fetchone()
+    return conn
+
+
+def swap_snapshot(pool, film_db_path):
+    """Replace the database file like publish_snapshot does"""
+    snapshot = pool.db_path + '.tmp'
+    shutil.copy(film_db_path, snapshot)
+    os.replace(snapshot, pool.db_path)
+
+
+def test_thread_reuses_its_connection(pool):
+    assert query(pool) is query(pool)
+    stats = pool.stats()
+    assert (stats['connections_opened'], stats['leases'], stats['queries_served']) == (1, 1, 2)
+    assert stats['lease_reuses'] == 0
+
+
+def test_connection_returns_to_the_pool_when_the_thread_ends(pool):
+    first = in_thread(lambda: query(pool))
+    assert in_thread(lambda: query(pool)) is first
+    stats = pool.stats()
+    assert (stats['connections_opened'], stats['leases'], stats['lease_reuses']) == (1, 2, 1)
+    assert stats['uses_per_connection'] == [2]
+
+
+def test_reload_counts_the_new_snapshot_only(pool, film_db_path):
+    for _ in range(3):
+        in_thread(lambda: query(pool))
+    leased = query(pool)
+    assert pool.stats()['lease_reuses'] == 3
+
+    swap_snapshot(pool, film_db_path)
+    conn = query(pool)
+    assert conn is not leased
+    stats = pool.stats()
+    assert stats['snapshot_reloads'] == 1
+    assert (stats['connections_opened'], stats['leases'], stats['lease_reuses']) == (1, 1, 0)
+    assert stats['uses_per_connection'] == [1]
+
+    # The connection to the old snapshot was closed when it came back
+    gc.collect()
+    with pytest.raises(sqlite3.ProgrammingError):
+        leased.execute("SELECT 1")
@@ -0,0 +1,27 @@
+from datetime import datetime
+from utils.film_engine import FilmEngine, check_engine_against_sqlite
+from utils.film_schema import chooser_plan_cases
+
+# The slider defaults only match a few synthetic films: every case is also run
+# with the widest sliders
+LOOSE_SLIDERS = {'selected_years': (1940, datetime.now().year), 'selected_time': (30, 240),
+                 'selected_rating': (1.0, 10.0), 'selected_votes': 0}
+
+def filter_cases(**changes):
+    """The Film Chooser plan cases, as they are and with the widest sliders"""
+    cases = {}
+    for description, case in chooser_plan_cases().items():
+        cases[description] = {**case, **changes}
+        cases[f'{description} (loose)'] = {**case, **LOOSE_SLIDERS, **changes}
+    return cases
+
+
+def test_engine_matches_sqlite(film_conn):
+    engine = FilmEngine.from_connection(film_conn)
+    assert check_engine_against_sqlite(film_conn, engine, filter_cases()) == []
+
+
+def test_engine_matches_sqlite_ascending(film_conn):
+    engine = FilmEngine.from_connection(film_conn)
+    assert check_engine_against_sqlite(film_conn, engine, filter_cases(sort_ascending=True)) == []
+
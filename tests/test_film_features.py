@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from utils.film_features import (DIRECTOR_WEIGHT, FilmFeatures, feature_arrays,
+                                 read_film_features)
+
+
+@pytest.fixture
+def features(film_conn):
+    return FilmFeatures.from_connection(film_conn)
+
+
+def reference_similarities(tconst, dense, directors):
+    """Cosine similarity of every pair of films, with the directors as one-hot columns"""
+    one_hot = np.zeros((len(tconst), directors.max() + 1))
+    for column in directors.T:
+        films = np.flatnonzero(column >= 0)
+        one_hot[films, column[films]] = DIRECTOR_WEIGHT
+    vectors = np.hstack([dense.astype(np.float64), one_hot])
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return vectors @ vectors.T
+
+
+def test_stored_features_match_film_data(film_conn):
+    stored = read_film_features(film_conn)
+    built = feature_arrays(film_conn)
+    for stored_array, built_array in zip(stored, built):
+        assert stored_array.dtype == built_array.dtype
+        np.testing.assert_array_equal(stored_array, built_array)
+
+
+def test_similarities_are_cosine(film_conn, features):
+    tconst, dense, directors = feature_arrays(film_conn)
+    expected = reference_similarities(tconst, dense, directors)
+    rows = np.arange(0, len(tconst), 97)
+    np.testing.assert_allclose(features.similarities(rows), expected[rows], atol=1e-5)
+
+
+def test_similar_is_best_first(features):
+    for tconst in features.tconst[::211].tolist():
+        similar = features.similar(tconst, k=10)
+        assert len(similar) == 10
+        assert tconst not in [neighbor for neighbor, _ in similar]
+        scores = [score for _, score in similar]
+        assert scores == sorted(scores, reverse=True)
+
+        # No film left out scores higher than the last one kept
+        all_scores = features.similarities(features.position[tconst])[0]
+        all_scores[features.position[tconst]] = -np.inf
+        assert np.sort(all_scores)[-10] == pytest.approx(scores[-1])
+
+
+def test_similar_unknown_film(features):
+    assert features.similar('tt9999999') == []
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from utils.film_features import FilmFeatures
+from utils.film_neighbors import (NEIGHBORS, film_neighbors, has_film_neighbors,
+                                  neighbor_arrays, number_tconst, tconst_number)
+
+
+def test_tconst_numbers():
+    assert tconst_number('tt0266697') == 266697
+    assert number_tconst(266697) == 'tt0266697'
+    assert number_tconst(12345678) == 'tt12345678'
+    with pytest.raises(ValueError):
+        tconst_number('nm0000233')
+
+
+def test_neighbor_arrays_match_full_sort():
+    rng = np.random.default_rng(7)
+    films = 600
+    tconst = np.array([f'tt{i:07d}' for i in range(films)])
+    dense = rng.random((films, 12), dtype=np.float32)
+    directors = rng.integers(-1, 40, size=(films, 2)).astype(np.int32)
+    neighbors, similarities = neighbor_arrays(tconst, dense, directors, k=20, workers=1)
+
+    features = FilmFeatures(tconst, dense, directors)
+    for row in range(0, films, 37):
+        expected = features.similarities(row)[0]
+        expected[row] = -np.inf
+        assert row not in neighbors[row]
+        np.testing.assert_allclose(similarities[row], np.sort(expected)[::-1][:20], rtol=1e-6)
+        np.testing.assert_allclose(expected[neighbors[row]], similarities[row], rtol=1e-6)
+
+
+def test_stored_neighbors_round_trip(film_conn):
+    assert has_film_neighbors(film_conn)
+    features = FilmFeatures.from_connection(film_conn)
+    for tconst in features.tconst[::173].tolist():
+        stored = film_neighbors(film_conn, tconst, k=NEIGHBORS)
+        assert len(stored) == NEIGHBORS
+        assert film_neighbors(film_conn, tconst, k=5) == stored[:5]
+
+        scores = [score for _, score in stored]
+        assert scores == sorted(scores, reverse=True)
+        # The similarities are stored as float16
+        expected = features.similar(tconst, k=NEIGHBORS)
+        np.testing.assert_allclose(scores, [score for _, score in expected], atol=1e-3)
+        similarities = features.similarities(features.position[tconst])[0]
+        np.testing.assert_allclose(
+            [similarities[features.position[neighbor]] for neighbor, _ in stored],
+            scores, atol=1e-3)
+
+
+def test_unknown_film_has_no_neighbors(film_conn):
+    assert film_neighbors(film_conn, 'tt9999999') == []
@@ -0,0 +1,51 @@
+from datetime import datetime
+import pandas as pd
+import pytest
+from utils.film_engine import FilmEngine
+from utils.film_queries import (SORT_COLUMNS, compact_results, film_filter_query,
+                                film_page_query, page_key)
+
+# Widest sliders, so the pages run through all synthetic films
+FILTERS = {'selected_years': (1940, datetime.now().year), 'selected_time': (30, 240),
+           'selected_rating': (1.0, 10.0), 'selected_votes': 0, 'genre_tag': 0,
+           'main_genre': 'No preference for any genre...', 'operator': 0,
+           'genre_selection': []}
+
+# Small pages: many page boundaries, and ties on the sort value across them
+PAGE_SIZE = 37
+
+def all_pages(next_page, sort_column):
+    """Follow the keyset pages from the first one until an empty page"""
+    pages, after = [], None
+    while True:
+        page = next_page(after)
+        if page.empty:
+            return pd.concat(pages, ignore_index=True)
+        assert len(page) <= PAGE_SIZE
+        pages.append(page)
+        after = page_key(page, sort_column)
+
+
+@pytest.mark.parametrize('sort_ascending', [False, True])
+@pytest.mark.parametrize('sort_column', SORT_COLUMNS)
+def test_pages_match_full_query(film_conn, sort_column, sort_ascending):
+    engine = FilmEngine.from_connection(film_conn)
+    query, params = film_filter_query(**FILTERS, sort_column=sort_column, top_n=None,
+                                      sort_ascending=sort_ascending,
+                                      genre_bits=engine.genre_bits)
+    expected = compact_results(pd.read_sql_query(query, film_conn, params=params))
+
+    def engine_page(after):
+        return engine.page(**FILTERS, sort_column=sort_column, page_size=PAGE_SIZE,
+                           after=after, sort_ascending=sort_ascending)
+
+    def sqlite_page(after):
+        query, params = film_page_query(**FILTERS, sort_column=sort_column,
+                                        page_size=PAGE_SIZE, after=after,
+                                        sort_ascending=sort_ascending,
+                                        genre_bits=engine.genre_bits)
+        return compact_results(pd.read_sql_query(query, film_conn, params=params))
+
+    for pages in (all_pages(engine_page, sort_column), all_pages(sqlite_page, sort_column)):
+        assert list(pages['tconst']) == list(expected['tconst'])
+        assert pages.astype(object).equals(expected.astype(object))
@@ -0,0 +1,76 @@
+import sqlite3
+import pandas as pd
+import pytest
+from utils.film_search import CANDIDATES, fold, search_films, write_film_search
+
+FILMS = [
+    ('tt0000001', 'Amélie', 'Jean-Pierre Jeunet', None, 750_000),
+    ('tt0000002', 'Kill Bill: Vol. 1', 'Quentin Tarantino', None, 1_100_000),
+    ('tt0000003', 'Pulp Fiction', 'Quentin Tarantino', None, 2_100_000),
+    ('tt0000004', 'Night Train', 'Anna Berg', None, 100_000),
+    ('tt0000005', 'Night Train', 'Ben Berg', None, 10),
+    ('tt0000006', 'Coen', 'Ida Holm', None, 5),
+]
+
+
+@pytest.fixture
+def search_conn():
+    """film_data with a few known films, CANDIDATES+50 films of 'Joel Coen' and
+    unrelated films, and its search tables"""
+    rows = list(FILMS)
+    rows += [(f'tt1{i:06d}', f'Road Movie {i}', 'Joel Coen', 'Ethan Coen', 20)
+             for i in range(CANDIDATES + 50)]
+    rows += [(f'tt2{i:06d}', f'Other Film {i}', 'Someone Else', None, 500) for i in range(1_000)]
+    films = pd.DataFrame(rows, columns=['tconst', 'primaryTitle', 'nmDirector_1',
+                                        'nmDirector_2', 'numVotes'])
+    films['startYear'] = 2000
+    films['averageRating'] = 7.0
+    conn = sqlite3.connect(':memory:')
+    films.to_sql('film_data', conn, index=False)
+    write_film_search(conn)
+    yield conn
+    conn.close()
+
+
+def test_fold():
+    assert fold('Amélie') == 'amelie'
+    assert fold('DÉJÀ VU') == 'deja vu'
+
+
+@pytest.mark.parametrize('text', ['amelie', 'AMÉLIE', 'Amelie'])
+def test_accents_and_case_are_folded(search_conn, text):
+    hits = search_films(search_conn, text)
+    assert hits['primaryTitle'].iloc[0] == 'Amélie'
+    assert not hits['fuzzy'].iloc[0]
+
+
+def test_last_word_is_a_prefix(search_conn):
+    hits = search_films(search_conn, 'kill bi')
+    assert hits['primaryTitle'].iloc[0] == 'Kill Bill: Vol. 1'
+    assert not hits['fuzzy'].iloc[0]
+    # Only the last word is a prefix
+    assert not (~search_films(search_conn, 'kil bill')['fuzzy']).any()
+
+
+def test_typo_falls_back_to_trigrams(search_conn):
+    hits = search_films(search_conn, 'tarantno')
+    assert set(hits['primaryTitle']) == {'Kill Bill: Vol. 1', 'Pulp Fiction'}
+    assert hits['fuzzy'].all()
+
+
+def test_popular_film_wins_equal_text_match(search_conn):
+    hits = search_films(search_conn, 'night train')
+    assert list(hits['tconst']) == ['tt0000004', 'tt0000005']
+
+
+def test_broad_search_finds_obscure_best_match(search_conn):
+    # More than CANDIDATES films directed by a Coen have more votes than the film
+    # titled 'Coen'; its better text score still ranks it first
+    hits = search_films(search_conn, 'coen')
+    assert hits['primaryTitle'].iloc[0] == 'Coen'
+    assert hits['score'].is_monotonic_increasing
+    assert len(hits) == 20
+
+
+def test_no_match(search_conn):
+    assert search_films(search_conn, 'zzzzzz').empty
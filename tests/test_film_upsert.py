@@ -0,0 +1,64 @@
+import sqlite3
+from datetime import datetime
+import pandas as pd
+import pytest
+from utils.film_upsert import HASH_TABLE, upsert_film_data, upsert_summary
+from utils.imdb_pipeline import (MIN_YEAR, MIN_RUNTIME, MAX_RUNTIME, StageTimer,
+                                 load_imdb_files, join_film_data)
+
+
+@pytest.fixture(scope='module')
+def joined_film(imdb_directory):
+    """film_data of the synthetic files, before it is written"""
+    frames = load_imdb_files(imdb_directory, MIN_YEAR, datetime.now().year, MIN_RUNTIME,
+                             MAX_RUNTIME, StageTimer())
+    return join_film_data(frames['title.basics'], frames['title.crew'],
+                          frames['name.basics'], frames['title.ratings'])
+
+
+def previous_build(film):
+    """An older version of film: 20 films not out yet, 15 with other ratings, 5 removed since"""
+    old = film.iloc[20:].copy()
+    old.loc[old.index[:15], 'averageRating'] = (old['averageRating'].iloc[:15] % 9) + 1
+    old.loc[old.index[:15], 'numVotes'] += 1
+    removed = film.iloc[-5:].copy()
+    removed['tconst'] = [f'tt99999{i:02d}' for i in range(len(removed))]
+    return pd.concat([old, removed], ignore_index=True)
+
+
+def table(conn, name, key):
+    return pd.read_sql_query(f"SELECT * FROM {name} ORDER BY {key}", conn)
+
+
+def test_incremental_matches_full_rewrite(joined_film, tmp_path):
+    film, genres = joined_film
+    with sqlite3.connect(tmp_path / 'incremental.db') as incremental, \
+         sqlite3.connect(tmp_path / 'full.db') as full:
+        counts = upsert_film_data(incremental, previous_build(film), genres)
+        assert (counts['mode'], counts['reason']) == ('full', 'no previous build')
+        counts = upsert_film_data(incremental, film, genres)
+        assert counts == {'mode': 'incremental', 'reason': None, 'inserted': 20,
+                          'updated': 15, 'deleted': 5, 'unchanged': len(film) - 35}
+
+        counts = upsert_film_data(full, film, genres, incremental=False)
+        assert (counts['mode'], counts['reason']) == ('full', 'requested')
+        for name, key in (('film_data', 'tconst'), (HASH_TABLE, 'tconst'), ('genre_bits', 'bit')):
+            assert table(incremental, name, key).equals(table(full, name, key)), name
+
+
+def test_unchanged_refresh_writes_nothing(joined_film, tmp_path):
+    film, genres = joined_film
+    with sqlite3.connect(tmp_path / 'film.db') as conn:
+        upsert_film_data(conn, film, genres)
+        counts = upsert_film_data(conn, film, genres)
+    assert counts == {'mode': 'incremental', 'reason': None, 'inserted': 0, 'updated': 0,
+                      'deleted': 0, 'unchanged': len(film)}
+
+
+def test_changed_columns_are_written_in_full(joined_film, tmp_path):
+    film, genres = joined_film
+    with sqlite3.connect(tmp_path / 'film.db') as conn:
+        upsert_film_data(conn, film.drop(columns='nmDirector_2'), genres)
+        counts = upsert_film_data(conn, film, genres)
+    assert (counts['mode'], counts['reason']) == ('full', 'columns changed')
+    assert upsert_summary(counts).endswith("(full write: columns changed)")
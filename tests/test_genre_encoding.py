@@ -0,0 +1,37 @@
+import os
+from datetime import datetime
+import pandas as pd
+from utils.genre_encoding import compare_genre_encoding, encode_genres, encode_genres_legacy
+from utils.imdb_pipeline import MAX_RUNTIME, MIN_RUNTIME, MIN_YEAR
+from utils.imdb_reader import read_title_basics
+
+FILMS = pd.DataFrame({
+    'tconst': ['tt0000001', 'tt0000002', 'tt0000003', 'tt0000004'],
+    'genres': ['Drama', 'Comedy,Romance', 'Action,Crime,Drama', 'Romance,Comedy'],
+})
+
+
+def test_encode_genres():
+    film, genres = encode_genres(FILMS)
+    assert genres == ['Action', 'Comedy', 'Crime', 'Drama', 'Romance']
+    assert film['main_genre'].tolist() == ['Drama', 'Comedy', 'Action', 'Romance']
+    assert pd.isna(film['other_genres'][0])
+    assert film['other_genres'][1:].tolist() == ['Romance', 'Crime, Drama', 'Comedy']
+    assert film['genre_mask'].tolist() == [0b01000, 0b10010, 0b01101, 0b10010]
+    assert film['Comedy'].tolist() == [False, True, False, True]
+    assert 'genres' not in film
+
+
+def test_encode_genres_matches_legacy():
+    film, genres = encode_genres(FILMS)
+    legacy, legacy_genres = encode_genres_legacy(FILMS)
+    assert genres == legacy_genres
+    assert compare_genre_encoding(FILMS)['identical']
+
+
+def test_synthetic_films_match_legacy(imdb_directory):
+    film = read_title_basics(os.path.join(imdb_directory, 'title.basics.tsv.gz'), MIN_YEAR,
+                             datetime.now().year, MIN_RUNTIME, MAX_RUNTIME)
+    comparison = compare_genre_encoding(film)
+    assert comparison['films'] == len(film) > 0
+    assert comparison['identical']
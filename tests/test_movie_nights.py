@@ -0,0 +1,87 @@
+import pytest
+from utils.movie_nights import archive_films, import_movie_nights, read_night_records
+from utils.taste import load_taste_profile, watch_history
+from utils.watch_stats import load_watch_stats, needs_rebuild
+
+CSV_HEADER = "night_on,snack,room,tconst,votes,chosen\n"
+
+
+def write_file(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('rows, line', [
+    ("2024-01-04,Popcorn,Room 1,tt0000001,3,1\n2024-01-11\n", 3),
+    ("2024-01-04,,Room 1,tt0000001\n2024-01-11,,Room 2,tt0000002,lots,0\n", 3),
+    ("04/01/2024,,Room 1,tt0000001,3,1\n", 2),
+])
+def test_malformed_csv_rows_name_their_line(tmp_path, rows, line):
+    path = write_file(tmp_path, 'nights.csv', CSV_HEADER + rows)
+    with pytest.raises(ValueError, match=f"line {line}:"):
+        read_night_records(path)
+
+
+@pytest.mark.parametrize('lines, line', [
+    ('{"night_on": "2024-01-04", "suggestions": []}\n{"snack": "Popcorn"}\n', 2),
+    ('{"night_on": "2024-01-04", "suggestions": ["tt0000001"]}\n', 1),
+    ('[1, 2]\n', 1),
+    ('\n{"night_on": "2024-01-04", "suggestions": [{"room": "Room 1"}]}\n', 2),
+    ('{"night_on": 5}\n', 1),
+])
+def test_malformed_jsonl_lines_name_their_line(tmp_path, lines, line):
+    path = write_file(tmp_path, 'nights.jsonl', lines)
+    with pytest.raises(ValueError, match=f"line {line}:"):
+        read_night_records(path)
+
+
+def test_two_films_chosen_on_one_night(tmp_path):
+    path = write_file(tmp_path, 'nights.csv', CSV_HEADER
+                      + "2024-01-04,,Room 1,tt0000001,3,1\n2024-01-04,,Room 2,tt0000002,2,1\n")
+    with pytest.raises(ValueError, match="More than one film was chosen on 2024-01-04"):
+        read_night_records(path)
+
+
+@pytest.fixture
+def nights_file(tmp_path, film_conn):
+    """Three nights of two rooms: a film of the database chosen on two of them"""
+    first, second, third = [tconst for tconst, in film_conn.execute(
+        "SELECT tconst FROM film_data ORDER BY numVotes DESC LIMIT 3")]
+    return write_file(tmp_path, 'nights.csv', CSV_HEADER
+                      + f"2024-01-04,Popcorn,Room 1,{first},3,yes\n"
+                      + f"2024-01-04,Popcorn,Room 2,{second},1,\n"
+                      + f"2024-01-11,,Room 1,{third},2,x\n"
+                      + f"2024-01-11,,Room 2,tt9999999,2,0\n"
+                      + f"2024-01-18,Nachos,Room 1,{second},0,0\n"), (first, third)
+
+
+def test_import_adds_chosen_films_to_history(archive_conn, film_conn, film_db_path, nights_file):
+    path, (first, third) = nights_file
+    records = read_night_records(path)
+    nights, suggestions, watches, unknown = import_movie_nights(
+        archive_conn, records, film_conn=film_conn, roomies=['Anna', 'Ben'])
+    assert (nights, suggestions, watches, unknown) == (3, 5, 4, [])
+
+    archive = archive_films(archive_conn, film_db_path)
+    assert len(archive) == 5
+    assert archive['primaryTitle'].isna().sum() == 1  # tt9999999 keeps empty details
+
+    assert [(tconst, watched_on) for tconst, _, watched_on in watch_history(archive_conn, 'Anna')] \
+        == [(third, '2024-01-11'), (first, '2024-01-04')]
+    assert load_taste_profile(archive_conn, 'Ben').entries == 2
+
+    stats = load_watch_stats(archive_conn)
+    assert not needs_rebuild(archive_conn)
+    assert stats['roomies'].set_index('name')['films'].to_dict() == {'Anna': 2, 'Ben': 2}
+    assert stats['snacks'][['name', 'snack', 'films']].values.tolist() \
+        == [['Anna', 'Popcorn', 1], ['Ben', 'Popcorn', 1]]
+
+
+def test_import_again_adds_no_history(archive_conn, film_conn, nights_file):
+    records = read_night_records(nights_file[0])
+    import_movie_nights(archive_conn, records, film_conn=film_conn, roomies=['Anna'])
+    assert import_movie_nights(archive_conn, records, film_conn=film_conn,
+                               roomies=['Anna']) == (3, 5, 0, [])
+    assert len(watch_history(archive_conn, 'Anna')) == 2
+    assert archive_conn.execute("SELECT COUNT(*) FROM night_suggestions").fetchone()[0] == 5
@@ -0,0 +1,60 @@
+import random
+import numpy as np
+import pytest
+from utils.random_film import RandomFilm, RandomFilmPicker, alias_table
+
+
+def alias_distribution(prob, alias):
+    """The probability of every slot to be drawn from an alias table"""
+    n = len(prob)
+    distribution = prob / n
+    np.add.at(distribution, alias, (1.0 - prob) / n)
+    return distribution
+
+
+@pytest.mark.parametrize('weights', [
+    [1.0],
+    [1.0, 1.0, 1.0, 1.0],
+    [0.0, 5.0, 1.0, 0.5],
+    [1e6, 1.0, 1.0, 1.0, 1.0, 1.0],
+])
+def test_alias_table_is_exact(weights):
+    prob, alias = alias_table(weights)
+    assert ((prob >= 0) & (prob <= 1 + 1e-12)).all()
+    np.testing.assert_allclose(alias_distribution(prob, alias),
+                               np.array(weights) / np.sum(weights), atol=1e-12)
+
+
+def test_alias_table_of_random_weights():
+    weights = np.random.default_rng(3).lognormal(size=5_000)
+    np.testing.assert_allclose(alias_distribution(*alias_table(weights)),
+                               weights / weights.sum(), rtol=1e-9, atol=1e-15)
+
+
+def test_weighted_picks_follow_weights():
+    weights = np.array([1.0, 2.0, 3.0, 4.0])
+    picker = RandomFilmPicker(np.array([10, 20, 30, 40]), {'numVotes': weights})
+    picker._random = random.Random(5)
+    draws = 40_000
+    picks = [picker.pick_rowid('numVotes') for _ in range(draws)]
+    counts = np.array([picks.count(rowid) for rowid in (10, 20, 30, 40)])
+    expected = draws * weights / weights.sum()
+    # Within about four standard deviations of the binomial counts
+    assert (np.abs(counts - expected) < 4 * np.sqrt(expected)).all()
+
+
+def test_pick_reads_one_film(film_conn):
+    picker = RandomFilmPicker.from_connection(film_conn)
+    assert len(picker) == film_conn.execute("SELECT COUNT(*) FROM film_data").fetchone()[0]
+    for weight in (None, 'numVotes', 'averageRating'):
+        film = picker.pick(film_conn, weight)
+        assert isinstance(film, RandomFilm)
+        assert film_conn.execute("SELECT primaryTitle FROM film_data WHERE tconst = ?",
+                                 (film.tconst,)).fetchone()[0] == film.primaryTitle
+    with pytest.raises(ValueError):
+        picker.pick_rowid('runtimeMinutes')
+
+
+def test_empty_picker():
+    picker = RandomFilmPicker(np.array([], dtype=np.int64), {})
+    assert picker.pick_rowid() is None
@@ -0,0 +1,39 @@
+import os
+import shutil
+import pytest
+import streamlit as st
+from utils.film_db import get_connection_pool, snapshot_token
+from utils.sidebar import _next_random_film
+
+
+@pytest.fixture
+def db_path(film_db_path, tmp_path):
+    """Copy of the synthetic database (so a test can swap in a new snapshot)"""
+    db_path = str(tmp_path / 'film_database.db')
+    shutil.copy(film_db_path, db_path)
+    st.session_state.clear()
+    yield db_path
+    st.session_state.clear()
+    get_connection_pool(db_path).close_all()
+
+
+def test_prefetched_film_is_used_next(db_path):
+    _next_random_film(db_path).result()
+    snapshot, prefetched = st.session_state.random_film_prefetch
+    assert snapshot == snapshot_token(db_path)
+    assert _next_random_film(db_path) is prefetched
+
+
+def test_prefetch_of_older_snapshot_is_dropped(db_path, film_db_path):
+    _next_random_film(db_path).result()
+    _, stale = st.session_state.random_film_prefetch
+    stale.result()
+
+    # Swap in a new snapshot like publish_snapshot does
+    shutil.copy(film_db_path, db_path + '.tmp')
+    os.replace(db_path + '.tmp', db_path)
+
+    future = _next_random_film(db_path)
+    assert future is not stale
+    assert future.result() is not None
+    assert st.session_state.random_film_prefetch[0] == snapshot_token(db_path)
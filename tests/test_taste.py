@@ -0,0 +1,97 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from utils.film_engine import FilmEngine
+from utils.taste import (DIRECTOR_WEIGHT, ERA_WEIGHT, GENRE_WEIGHT, RUNTIME_WEIGHT,
+                         TasteProfile, add_watch, film_facts, load_taste_profile)
+
+PROFILE_SUMS = ('entries', 'liked_weight', 'runtime_sum', 'runtime_sq_sum', 'year_sum',
+                'year_sq_sum')
+
+
+@pytest.fixture
+def engine(film_conn):
+    return FilmEngine.from_connection(film_conn)
+
+
+def watch_films(archive_conn, film_conn, name='Anna', n=25):
+    """Add n films (some twice, some without a rating) to a roomie's history"""
+    tconsts = [tconst for tconst, in film_conn.execute(
+        "SELECT tconst FROM film_data ORDER BY numVotes DESC LIMIT ?", (n,))]
+    profile = None
+    for i, tconst in enumerate(tconsts + tconsts[:3]):
+        profile = add_watch(archive_conn, name, film_facts(film_conn, tconst),
+                            rating=None if i % 4 == 0 else float(1 + i * 7 % 10))
+    return profile
+
+
+def profile_from_history(archive_conn, film_conn, name):
+    """The profile of a roomie computed again from the whole history"""
+    profile = TasteProfile(name)
+    for tconst, rating in archive_conn.execute("SELECT tconst, rating FROM watch_history "
+                                               "WHERE name = ? ORDER BY id", (name,)):
+        profile.add(film_facts(film_conn, tconst), rating)
+    return profile
+
+
+def test_incremental_profile_matches_history(archive_conn, film_conn):
+    in_session = watch_films(archive_conn, film_conn)
+    rebuilt = profile_from_history(archive_conn, film_conn, 'Anna')
+    for profile in (in_session, load_taste_profile(archive_conn, 'Anna')):
+        for field in PROFILE_SUMS:
+            assert getattr(profile, field) == pytest.approx(getattr(rebuilt, field)), field
+        assert profile.genres == pytest.approx(rebuilt.genres)
+        assert profile.directors == pytest.approx(rebuilt.directors)
+        assert profile.watched == rebuilt.watched
+
+
+def reference_scores(profile, films, genre_bits):
+    """Taste score of every film, one film at a time (the definition of scores)"""
+    runtime, era = profile.preferred_runtime(), profile.preferred_era()
+
+    def score(film):
+        genres = [genre for genre, bit in genre_bits.items() if film.genre_mask >> bit & 1]
+        total = GENRE_WEIGHT * sum(profile.genres.get(genre, 0.0) / profile.entries
+                                   for genre in genres) / max(len(genres), 1)
+        total += DIRECTOR_WEIGHT * sum(math.tanh(profile.directors.get(director, 0.0))
+                                       for director in (film.director_1, film.director_2)
+                                       if pd.notna(director))
+        for (mean, spread), value, weight in ((runtime, film.runtimeMinutes, RUNTIME_WEIGHT),
+                                              (era, film.startYear, ERA_WEIGHT)):
+            total += weight * math.exp(-0.5 * ((value - mean) / spread) ** 2)
+        return total
+
+    return films.apply(score, axis=1).to_numpy()
+
+
+def test_ranking_matches_reference(archive_conn, film_conn, engine):
+    profile = watch_films(archive_conn, film_conn)
+    films = pd.read_sql_query("SELECT tconst, genre_mask, director_1, director_2, "
+                              "runtimeMinutes, startYear FROM film_data", film_conn)
+    rows = engine.positions(films['tconst'])
+    expected = reference_scores(profile, films, engine.genre_bits)
+    np.testing.assert_allclose(profile.scores(engine, rows), expected, rtol=1e-9, atol=1e-12)
+
+    # Not watched first, then by score (best first)
+    ranked = profile.rank_rows(engine, rows)
+    by_row = pd.DataFrame({'score': expected,
+                           'watched': films['tconst'].isin(profile.watched).to_numpy()},
+                          index=rows).loc[ranked]
+    watched = by_row['watched'].to_numpy()
+    assert not np.any(watched[:-1] > watched[1:])
+    for group in (by_row[~by_row['watched']], by_row[by_row['watched']]):
+        assert np.all(np.diff(group['score'].to_numpy()) <= 1e-9)
+
+
+def test_watched_films_are_ranked_last(archive_conn, film_conn, engine):
+    profile = watch_films(archive_conn, film_conn, n=5)
+    ranked = engine.films.take(profile.rank_rows(engine, np.arange(len(engine))))
+    assert set(ranked['tconst'].iloc[-5:]) == profile.watched
+
+    # A film watched just now drops from the top of the ranking to the bottom
+    best = ranked['tconst'].iloc[0]
+    profile = add_watch(archive_conn, 'Anna', film_facts(film_conn, best), rating=10.0)
+    reranked = profile.rerank(engine, ranked.reset_index(drop=True))
+    assert best in set(reranked['tconst'].iloc[-6:])
+    assert reranked['tconst'].iloc[0] != best
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+from utils.film_search import fold
+from utils.title_index import TitleIndex
+
+FILMS = pd.DataFrame([
+    ('tt0000001', 'The Matrix', 1999, 'Lana Wachowski', 'Lilly Wachowski', 2_000_000),
+    ('tt0000002', 'Matrix of Leadership', 2010, 'Ann Lee', None, 50),
+    ('tt0000003', 'A Matrix Story', 2015, None, None, 500),
+    ('tt0000004', 'Amélie', 2001, 'Jean-Pierre Jeunet', None, 750_000),
+    ('tt0000005', 'Theory of Everything', 2014, 'James Marsh', None, 450_000),
+    ('tt0000006', 'The Matrix', 1970, 'Bob Smith', None, 10),
+], columns=['tconst', 'primaryTitle', 'startYear', 'nmDirector_1', 'nmDirector_2', 'numVotes'])
+
+
+@pytest.fixture
+def index():
+    return TitleIndex(FILMS)
+
+
+def test_title_found_without_article(index):
+    assert index.complete('matrix') == ['tt0000001', 'tt0000003', 'tt0000002', 'tt0000006']
+    assert index.complete('the matrix') == ['tt0000001', 'tt0000006']
+    # 'the' is only stripped as a whole word
+    assert index.complete('ory') == []
+
+
+def test_prefix_is_folded(index):
+    assert index.complete('  AME') == ['tt0000004']
+    assert index.complete('') == []
+    assert index.complete('the', limit=1) == ['tt0000001']
+
+
+def test_label_tells_same_titles_apart(index):
+    assert index.label('tt0000001') == 'The Matrix (1999) - Lana Wachowski, Lilly Wachowski'
+    assert index.label('tt0000006') == 'The Matrix (1970) - Bob Smith'
+    assert index.label('tt9999999') == 'tt9999999'
+
+
+def test_complete_matches_scan(film_conn):
+    index = TitleIndex.from_connection(film_conn)
+    films = pd.read_sql_query("SELECT tconst, primaryTitle, numVotes FROM film_data", film_conn)
+    keys = films['primaryTitle'].map(lambda title: ' '.join(fold(title).split()))
+    bare = keys.str.replace(r'^(the|a|an) ', '', regex=True)
+    for prefix in ['t', 'th', 'the ', 'a', 'se', 'de', 'lo', 'x', 'zzz']:
+        found = films[keys.str.startswith(prefix) | bare.str.startswith(prefix)]
+        completions = index.complete(prefix, limit=10)
+        # Films with the same number of votes may come in any order
+        assert set(completions) <= set(found['tconst'])
+        votes = [index.votes[index.position[tconst]] for tconst in completions]
+        assert votes == list(found['numVotes'].nlargest(10))
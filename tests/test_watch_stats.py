@@ -0,0 +1,46 @@
+import pandas as pd
+from utils.taste import add_watch, film_facts
+from utils.watch_stats import load_watch_stats, needs_rebuild, rebuild_watch_stats
+
+
+def watch_films(archive_conn, film_conn, n=30):
+    """Add n films to the history of two roomies, with ratings and snacks"""
+    tconsts = [tconst for tconst, in film_conn.execute(
+        "SELECT tconst FROM film_data ORDER BY numVotes DESC LIMIT ?", (n,))]
+    for i, tconst in enumerate(tconsts):
+        add_watch(archive_conn, ('Anna', 'Ben')[i % 2], film_facts(film_conn, tconst),
+                  rating=None if i % 5 == 0 else 1 + i % 10,
+                  snack=(None, 'Popcorn', 'Nachos')[i % 3])
+    return tconsts
+
+
+def assert_same_stats(first, second):
+    for table in first:
+        pd.testing.assert_frame_equal(first[table], second[table], obj=table)
+
+
+def test_incremental_stats_match_rebuild(archive_conn, film_conn):
+    watch_films(archive_conn, film_conn)
+    incremental = load_watch_stats(archive_conn)
+    assert not needs_rebuild(archive_conn)
+    assert incremental['roomies']['films'].sum() == 30
+    assert set(incremental['snacks']['snack']) == {'Popcorn', 'Nachos'}
+
+    assert rebuild_watch_stats(archive_conn, film_conn) == 30
+    assert_same_stats(incremental, load_watch_stats(archive_conn))
+
+
+def test_history_written_without_add_watch_is_rebuilt(archive_conn, film_conn):
+    tconsts = watch_films(archive_conn, film_conn, n=4)
+    with archive_conn:
+        archive_conn.executemany("INSERT INTO watch_history (name, tconst, rating, watched_on) "
+                                 "VALUES (?, ?, ?, '2024-01-04')",
+                                 [('Anna', tconsts[0], 8.0), ('Cleo', 'tt9999999', None)])
+    assert needs_rebuild(archive_conn)
+
+    rebuild_watch_stats(archive_conn, film_conn)
+    assert not needs_rebuild(archive_conn)
+    roomies = load_watch_stats(archive_conn)['roomies'].set_index('name')
+    assert roomies['films'].to_dict() == {'Anna': 3, 'Ben': 2, 'Cleo': 1}
+    # A film that is not in the film database counts without its details
+    assert roomies.loc['Cleo', 'hours'] == 0
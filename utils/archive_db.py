@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+#=====================
+# Archive database
+#=====================
+
+# What the roomies record (watch history, movie nights, ...). Unlike the film
+# database, which is only ever replaced by a new snapshot, this one is written
+# by the app, so it is a separate file.
+ARCHIVE_DB_PATH = "data/archive.db"
+
+_schema_lock = threading.Lock()
+_schema_done = set()
+
+def open_archive(db_path=ARCHIVE_DB_PATH):
+    """Open a writable connection to the archive database"""
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    # Opened as a URI, so read-only databases can be attached to it (file:...?mode=ro)
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}", uri=True,
+                           timeout=10, check_same_thread=False)
+    # Readers do not block the writer (and the other way around)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def ensure_schema(conn, db_path, name, statements):
+    """Run the CREATE ... IF NOT EXISTS statements of a schema once per process"""
+    key = (os.path.abspath(db_path), name)
+    with _schema_lock:
+        if key in _schema_done:
+            return
+        with conn:
+            for statement in statements:
+                conn.execute(statement)
+        _schema_done.add(key)
+
+
+@contextmanager
+def archive_connection(db_path=ARCHIVE_DB_PATH, schemas=()):
+    """
+    Connection to the archive database for one unit of work, with the given
+    schemas ((name, statements) pairs) in place; closed afterwards.
+    """
+    conn = open_archive(db_path)
+    try:
+        for name, statements in schemas:
+            ensure_schema(conn, db_path, name, statements)
+        yield conn
+    finally:
+        conn.close()
@@ -1,6 +1,28 @@
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+import jwt
 import streamlit as st
 import streamlit_authenticator as stauth
 
+logger = logging.getLogger(__name__)
+
+#=====================
+# Auth config
+#=====================
+
+# A verified session skips the login widget (and bcrypt) until its session token
+# expires; then the re-authentication cookie logs it in again
+SESSION_TOKEN_MINUTES = 60
+
+# The auth config of the secrets with its plain-text passwords hashed, a
+# fingerprint of the secrets it was read from, and the key of the session tokens
+AuthConfig = namedtuple('AuthConfig', ['config', 'fingerprint', 'session_key'])
+
 def convert_attrdict_to_dict(attr_dict):
     """Recursively convert st.secrets.AttrDict to a normal dict"""
     if isinstance(attr_dict, st.runtime.secrets.AttrDict):
@@ -10,13 +32,128 @@ def convert_attrdict_to_dict(attr_dict):
     else:
         return attr_dict
 
-def get_authenticator():
-    """Return a configured stauth.Authenticate object"""
+
+@st.cache_resource(max_entries=1)
+def load_auth_config():
+    """Return the AuthConfig of st.secrets (once per process, until the secrets change)"""
     config = convert_attrdict_to_dict(st.secrets["auth_config"])
-    authenticator = stauth.Authenticate(
-        config["credentials"],
-        config["cookie"]["name"],
-        config["cookie"]["key"],
-        config["cookie"]["expiry_days"],
-    )
-    return authenticator
\ No newline at end of file
+    fingerprint = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+    # Plain-text passwords are hashed here once, instead of by every Authenticate
+    for user in config["credentials"]["usernames"].values():
+        if user.get("password") is not None and not stauth.Hasher.is_hash(user["password"]):
+            user["password"] = stauth.Hasher.hash(user["password"])
+
+    session_key = hashlib.sha256(f"session:{config['cookie']['key']}".encode()).hexdigest()
+    return AuthConfig(config, fingerprint, session_key)
+
+
+_watch_lock = threading.Lock()
+_watching = False
+
+def _on_secrets_changed(*args):
+    load_auth_config.clear()
+
+
+def watch_secrets():
+    """Drop the cached auth config whenever the secrets file changes (registered once)"""
+    global _watching
+    with _watch_lock:
+        if not _watching:
+            st.secrets.file_change_listener.connect(_on_secrets_changed, weak=False)
+            _watching = True
+
+#=====================
+# Authenticator
+#=====================
+
+def get_authenticator():
+    """
+    Return the session's stauth.Authenticate object, built once per session (and
+    again when the secrets change) from the cached auth config
+    """
+    watch_secrets()
+    auth = load_auth_config()
+    cached = st.session_state.get('authenticator')
+    if cached is None or cached[0] != auth.fingerprint:
+        # Not shared between sessions: stauth keeps the login and cookie state
+        # of a session in the Authenticate object and its credentials
+        config = auth.config
+        authenticator = stauth.Authenticate(
+            copy.deepcopy(config["credentials"]),
+            config["cookie"]["name"],
+            config["cookie"]["key"],
+            config["cookie"]["expiry_days"],
+            auto_hash=False,
+        )
+        cached = (auth.fingerprint, authenticator)
+        st.session_state.authenticator = cached
+    return cached[1]
+
+#=====================
+# Session tokens
+#=====================
+
+def session_token(auth, username):
+    """Signed token of a verified session: the user and the secrets, valid SESSION_TOKEN_MINUTES"""
+    claims = {'username': username,
+              'secrets': auth.fingerprint,
+              'exp': int(time.time()) + SESSION_TOKEN_MINUTES * 60}
+    return jwt.encode(claims, auth.session_key, algorithm='HS256')
+
+
+def verified_session(auth):
+    """Whether the session was verified before, under the same secrets, and has not expired"""
+    token = st.session_state.get('auth_session_token')
+    if not token or not st.session_state.get('authentication_status'):
+        return False
+    try:
+        claims = jwt.decode(token, auth.session_key, algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return False
+    return (claims.get('username') == st.session_state.get('username')
+            and claims.get('secrets') == auth.fingerprint)
+
+
+def require_login():
+    """
+    Show the login widget until the user is logged in (the rest of the page is
+    stopped), and the logout button in the sidebar. A verified session only checks
+    its session token, so bcrypt only runs at an actual login. The time this takes
+    is logged at debug level.
+    """
+    start = time.perf_counter()
+    authenticator = get_authenticator()
+    auth = load_auth_config()
+
+    if not verified_session(auth):
+        if st.session_state.get('auth_session_token'):
+            # Expired, or the secrets changed: log in again (with the
+            # re-authentication cookie when it is still valid)
+            st.session_state.auth_session_token = None
+            st.session_state.authentication_status = None
+
+        # Show the login widget
+        try:
+            authenticator.login()
+        except Exception as e:
+            st.error(e)
+            st.stop()
+
+        # Check login status
+        auth_status = st.session_state.get('authentication_status')
+
+        if auth_status is False:
+            st.error("Username/password is incorrect")
+            st.stop()
+        elif auth_status is None:
+            st.warning("Please enter your username and password")
+            st.stop()
+
+        st.session_state.auth_session_token = session_token(auth, st.session_state.get('username'))
+
+    logger.debug("Login check took %.1f ms", (time.perf_counter() - start) * 1000)
+
+    # If logged in, show logout in sidebar
+    authenticator.logout(location="sidebar")
+    return authenticator
@@ -0,0 +1,297 @@
+"""
+Benchmark the Film Chooser query paths over a matrix of filter combinations.
+
+Every case runs on every database and engine; latency percentiles, rows returned
+and peak memory are printed and saved as JSON. Run from the root of the
+repository:
+
+    python -m utils.chooser_benchmark --db small=data/film_database.db --output chooser.json
+    python -m utils.chooser_benchmark --generate --compare chooser.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from utils.film_engine import FilmEngine
+from utils.film_queries import film_filter_query, compact_results, PAGE_SIZE, SORT_COLUMNS
+from utils.genres import load_genre_bits
+
+#=====================
+# Filter matrix
+#=====================
+
+TOP_N_VALUES = (100, 250, 500, None)
+
+# The slider defaults of the Film Chooser, and every slider opened up
+FILTER_PROFILES = {
+    'defaults': {'selected_years': (1985, datetime.now().year), 'selected_time': (60, 120),
+                 'selected_rating': (7.0, 10.0), 'selected_votes': 100000},
+    'loose': {'selected_years': (1940, datetime.now().year), 'selected_time': (30, 240),
+              'selected_rating': (1.0, 10.0), 'selected_votes': 0},
+}
+
+NO_GENRE = "No preference for any genre..."
+NO_MAIN_GENRE = "No preference for a main genre..."
+
+GENRE_SELECTIONS = (['Drama'], ['Crime', 'Drama'], ['Crime', 'Drama', 'Thriller'])
+
+def genre_modes():
+    """The genre filters of the Film Chooser: none, main genre only, AND/OR with 1-3 genres"""
+    modes = {
+        'no genre': {'genre_tag': 0, 'main_genre': NO_GENRE, 'operator': 0,
+                     'genre_selection': []},
+        'main genre': {'genre_tag': 2, 'main_genre': 'Drama', 'operator': 0,
+                       'genre_selection': []},
+    }
+    for operator, name in enumerate(('AND', 'OR')):
+        for selection in GENRE_SELECTIONS:
+            modes[f'{name} {len(selection)}'] = {'genre_tag': 1, 'main_genre': NO_MAIN_GENRE,
+                                                 'operator': operator,
+                                                 'genre_selection': selection}
+    return modes
+
+
+def benchmark_cases():
+    """Return every case of the matrix as (labels, film_data_filter arguments)"""
+    cases = []
+    for profile, filters in FILTER_PROFILES.items():
+        for genre_mode, genres in genre_modes().items():
+            for sort_column in SORT_COLUMNS:
+                for top_n in TOP_N_VALUES:
+                    labels = {'profile': profile, 'genres': genre_mode,
+                              'sort_column': sort_column,
+                              'top_n': 'All' if top_n is None else top_n}
+                    arguments = {**filters, **genres, 'sort_column': sort_column,
+                                 'top_n': top_n, 'sort_ascending': False}
+                    cases.append((labels, arguments))
+    return cases
+
+#=====================
+# Engines
+#=====================
+
+def sqlite_engine(conn):
+    """The SQLite query of film_data_filter, read into a compact DataFrame"""
+    bits = load_genre_bits(conn)
+
+    def run(**case):
+        query, params = film_filter_query(**case, genre_bits=bits)
+        return compact_results(pd.read_sql_query(query, conn, params=params))
+    return run
+
+
+def memory_engine(conn):
+    """The in-memory FilmEngine that film_data_filter uses"""
+    engine = FilmEngine.from_connection(conn)
+    return lambda **case: engine.filter(**case)
+
+
+def paged_engine(conn):
+    """The FilmEngine as the Film Chooser uses it: "All" is a counted first page"""
+    engine = FilmEngine.from_connection(conn)
+
+    def run(sort_column, top_n, sort_ascending=False, **filters):
+        if top_n is not None:
+            return engine.filter(**filters, sort_column=sort_column, top_n=top_n,
+                                 sort_ascending=sort_ascending)
+        engine.count(**filters)
+        return engine.page(**filters, sort_column=sort_column, page_size=PAGE_SIZE,
+                           sort_ascending=sort_ascending)
+    return run
+
+
+# Name -> factory(conn) returning run(**case); new query paths are added here
+ENGINES = {
+    'sqlite': sqlite_engine,
+    'engine': memory_engine,
+    'paged': paged_engine,
+}
+
+#=====================
+# Measure
+#=====================
+
+def open_read_only(db_path):
+    """Open the database like the app does (read-only, immutable)"""
+    return sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro&immutable=1", uri=True,
+                           check_same_thread=False)
+
+
+def measure(run, case, repeats):
+    """Time run(**case) repeats times after one warm-up; returns the result row"""
+    result = run(**case)
+
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        run(**case)
+        timings[i] = time.perf_counter() - start
+
+    # A separate traced run, so tracing does not slow down the timed runs
+    tracemalloc.start()
+    run(**case)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000
+    return {'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99,
+            'mean_ms': timings.mean() * 1000, 'rows': len(result),
+            'peak_kib': peak / 1024}
+
+
+def run_benchmark(databases, engines=None, repeats=20, cases=None):
+    """
+    Run every case on every database (name -> path) and engine.
+
+    Returns the report: environment, setup time per database and engine, and one
+    result per case with p50/p95/p99 latency (ms), rows and peak memory (KiB).
+    """
+    engines = list(ENGINES) if engines is None else engines
+    cases = benchmark_cases() if cases is None else cases
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'repeats': repeats,
+        'databases': {},
+        'results': [],
+    }
+
+    for database, db_path in databases.items():
+        conn = open_read_only(db_path)
+        films = conn.execute("SELECT COUNT(*) FROM film_data").fetchone()[0]
+        report['databases'][database] = {'path': db_path, 'films': films, 'setup_seconds': {}}
+        print(f"📀 {database}: {db_path} ({films:,} films)")
+
+        for engine in engines:
+            start = time.perf_counter()
+            run = ENGINES[engine](conn)
+            report['databases'][database]['setup_seconds'][engine] = time.perf_counter() - start
+
+            for labels, case in cases:
+                result = {'database': database, 'engine': engine, **labels,
+                          **measure(run, case, repeats)}
+                report['results'].append(result)
+
+            summary = pd.DataFrame([r for r in report['results']
+                                    if r['database'] == database and r['engine'] == engine])
+            print(f"⏱️ {engine:<8} {len(summary)} cases | median p50 "
+                  f"{summary['p50_ms'].median():.2f} ms | worst p99 "
+                  f"{summary['p99_ms'].max():.2f} ms")
+        conn.close()
+
+    return report
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#=====================
+# Compare
+#=====================
+
+CASE_KEYS = ['database', 'engine', 'profile', 'genres', 'sort_column', 'top_n']
+
+def compare_reports(old, new, threshold=1.25):
+    """
+    Return the cases whose p50 is more than threshold times slower in new than in
+    old, with both timings, slowest first.
+    """
+    old_results = pd.DataFrame(old['results'])
+    new_results = pd.DataFrame(new['results'])
+    for results in (old_results, new_results):
+        results['top_n'] = results['top_n'].astype(str)
+
+    both = new_results.merge(old_results, on=CASE_KEYS, suffixes=('', '_old'))
+    both['slowdown'] = both['p50_ms'] / both['p50_ms_old']
+    regressions = both[both['slowdown'] > threshold].sort_values('slowdown', ascending=False)
+    return regressions[CASE_KEYS + ['p50_ms_old', 'p50_ms', 'slowdown']]
+
+#=====================
+# Command line
+#=====================
+
+def _database_arg(value):
+    name, _, path = value.rpartition('=')
+    return (name or os.path.splitext(os.path.basename(path))[0]), path
+
+
+def generate_databases(directory, sizes):
+    """Build (once) a synthetic database per size (name -> titles) in directory"""
+    from utils.imdb_synthetic import write_synthetic_imdb, write_synthetic_film_database
+
+    databases = {}
+    for name, titles in sizes.items():
+        db_path = os.path.join(directory, f"film_database_{name}.db")
+        if not os.path.exists(db_path):
+            imdb_directory = os.path.join(directory, f"imdb_{name}")
+            write_synthetic_imdb(imdb_directory, titles=titles)
+            write_synthetic_film_database(imdb_directory, db_path, titles=titles)
+        databases[name] = db_path
+    return databases
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.chooser_benchmark",
+        description="Benchmark the Film Chooser query paths.")
+    parser.add_argument("--db", action="append", type=_database_arg, default=[],
+                        metavar="NAME=PATH", help="database to benchmark (repeatable)")
+    parser.add_argument("--generate", action="store_true",
+                        help="benchmark synthetic small (100k titles) and large (2M titles) "
+                             "databases, built once in --work-dir")
+    parser.add_argument("--work-dir", default="synthetic_imdb")
+    parser.add_argument("--engine", action="append", choices=list(ENGINES),
+                        help="engine to benchmark (repeatable, default: all)")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default="chooser_benchmark.json")
+    parser.add_argument("--compare", default=None,
+                        help="earlier JSON report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown (p50) reported as regression (default: 1.25)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    databases = dict(args.db)
+    if args.generate:
+        databases.update(generate_databases(args.work_dir,
+                                            {'small': 100_000, 'large': 2_000_000}))
+    if not databases:
+        databases = {'app': 'data/film_database.db'}
+
+    report = run_benchmark(databases, engines=args.engine, repeats=args.repeats)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Saved {len(report['results'])} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_reports(json.load(f), report, threshold=args.threshold)
+        if len(regressions):
+            print(f"⚠️ {len(regressions)} cases are more than {args.threshold}x slower:")
+            print(regressions.to_string(index=False))
+        else:
+            print("✅ No regressions against " + args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import json
+import math
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.film_db import FILM_DB_PATH, get_connection, snapshot_token
+
+#=========================
+# Facet cube (counts)
+#=========================
+
+FACET_TABLE = 'film_facets'
+FACET_EDGES_TABLE = 'film_facet_edges'
+
+# Every bucket is [edge, next edge). The edges sit on the slider defaults of the
+# Film Chooser (60-120 min, 7.0-10.0, 100,000 votes, 5-year steps up to this
+# year), so the counts there are exact; in between buckets they are estimated.
+# Upper slider values are inclusive, hence 121, 241 and 10.05.
+RUNTIME_EDGES = (0, 30, 45, 60, 75, 90, 105, 121, 150, 180, 210, 241, math.inf)
+RATING_EDGES = (0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.05, math.inf)
+VOTES_EDGES = (0, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 150000, 200000,
+               300000, 500000, math.inf)
+YEAR_STEP = 5
+
+DIMENSIONS = ('startYear', 'runtimeMinutes', 'averageRating', 'numVotes')
+
+FacetCount = namedtuple('FacetCount', ['films', 'low', 'high', 'by_genre'])
+
+def year_edges(min_year, max_year):
+    """5-year buckets from min_year, with an edge right after max_year"""
+    first = min_year - min_year % YEAR_STEP
+    edges = list(range(first, max_year + 1, YEAR_STEP))
+    return tuple(edges) + (max_year + 1, math.inf)
+
+
+def facet_cube_frame(conn, table='film_data'):
+    """
+    Count the films per main genre and bucket of year, runtime, rating and votes.
+
+    Returns the non-empty cells as a DataFrame and the bucket edges per dimension.
+    """
+    films = pd.read_sql_query(f"SELECT main_genre, {', '.join(DIMENSIONS)} FROM {table}", conn)
+    edges = {
+        'startYear': year_edges(int(films['startYear'].min()), int(films['startYear'].max()))
+        if len(films) else year_edges(0, 0),
+        'runtimeMinutes': RUNTIME_EDGES,
+        'averageRating': RATING_EDGES,
+        'numVotes': VOTES_EDGES,
+    }
+
+    cells = pd.DataFrame({'main_genre': films['main_genre']})
+    for dimension in DIMENSIONS:
+        cells[dimension] = np.searchsorted(edges[dimension], films[dimension], side='right') - 1
+    cells = cells.groupby(['main_genre', *DIMENSIONS]).size().rename('films').reset_index()
+    return cells, edges
+
+
+def write_facet_cube(conn, table='film_data'):
+    """Precompute the facet cube of film_data into film_facets (run after every build)"""
+    cells, edges = facet_cube_frame(conn, table)
+    with conn:
+        cells.to_sql(FACET_TABLE, conn, if_exists='replace', index=False)
+        conn.execute(f"DROP TABLE IF EXISTS {FACET_EDGES_TABLE}")
+        conn.execute(f"CREATE TABLE {FACET_EDGES_TABLE} (dimension TEXT PRIMARY KEY, edges TEXT)")
+        conn.executemany(f"INSERT INTO {FACET_EDGES_TABLE} (dimension, edges) VALUES (?, ?)",
+                         [(dimension, json.dumps([e if math.isfinite(e) else None
+                                                  for e in edges[dimension]]))
+                          for dimension in DIMENSIONS])
+    return len(cells)
+
+
+def read_facet_cube(conn):
+    """Return the precomputed cells and edges, or None when the database has none"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if not {FACET_TABLE, FACET_EDGES_TABLE} <= tables:
+        return None
+
+    cells = pd.read_sql_query(f"SELECT * FROM {FACET_TABLE}", conn)
+    edges = {dimension: tuple(math.inf if e is None else e for e in json.loads(text))
+             for dimension, text in conn.execute(f"SELECT dimension, edges FROM {FACET_EDGES_TABLE}")}
+    return cells, edges
+
+
+class FacetCube:
+    """
+    Film counts per main genre x year x runtime x rating x votes bucket, as prefix sums.
+
+    A count for the slider ranges is an inclusion-exclusion over the corners of the
+    range box: a few hundred array lookups, whatever the number of films. Counts are
+    exact when the slider values fall on bucket edges; otherwise the films of the
+    cut buckets are spread evenly (and low/high give the certain bounds).
+    """
+    def __init__(self, cells, edges):
+        self.edges = [np.array(edges[dimension], dtype=np.float64) for dimension in DIMENSIONS]
+        self.genres = sorted(cells['main_genre'].dropna().unique())
+        genre_codes = pd.Categorical(cells['main_genre'], categories=self.genres).codes
+
+        shape = (len(self.genres),) + tuple(len(e) - 1 for e in self.edges)
+        cube = np.zeros(shape, dtype=np.int32)
+        index = (genre_codes, *(cells[dimension].to_numpy() for dimension in DIMENSIONS))
+        keep = genre_codes >= 0
+        np.add.at(cube, tuple(i[keep] for i in index), cells['films'].to_numpy()[keep])
+
+        # prefix[g, y, t, r, v]: films of genre g in the buckets below (y, t, r, v)
+        self.prefix = np.zeros((shape[0],) + tuple(n + 1 for n in shape[1:]), dtype=np.int32)
+        self.prefix[:, 1:, 1:, 1:, 1:] = cube.cumsum(1).cumsum(2).cumsum(3).cumsum(4)
+
+    @classmethod
+    def from_connection(cls, conn, table='film_data'):
+        """Load the precomputed cube, or count it from film_data for older databases"""
+        stored = read_facet_cube(conn)
+        return cls(*(stored if stored is not None else facet_cube_frame(conn, table)))
+
+    def _coordinate(self, dimension, value):
+        """Position of value on the bucket axis (fractional inside a bucket)"""
+        edges = self.edges[dimension]
+        if value <= edges[0]:
+            return 0.0
+        if value >= edges[-1]:
+            return float(len(edges) - 1)
+        bucket = int(np.searchsorted(edges, value, side='right')) - 1
+        width = edges[bucket + 1] - edges[bucket]
+        return bucket + (0.0 if math.isinf(width) else (value - edges[bucket]) / width)
+
+    def _box(self, lows, highs):
+        """Films per genre in the box [lows, highs) of (fractional) bucket coordinates"""
+        indices, weights = [], []
+        for low, high, size in zip(lows, highs, self.prefix.shape[1:]):
+            high = max(high, low)
+            # Linear interpolation of the prefix sums at both (fractional) ends
+            points = []
+            for coordinate, sign in ((high, 1.0), (low, -1.0)):
+                base = math.floor(coordinate)
+                fraction = coordinate - base
+                points += [(min(base, size - 1), sign * (1.0 - fraction)),
+                           (min(base + 1, size - 1), sign * fraction)]
+            indices.append(np.array([p[0] for p in points]))
+            weights.append(np.array([p[1] for p in points]))
+
+        corners = self.prefix[:, indices[0][:, None, None, None], indices[1][:, None, None],
+                              indices[2][:, None], indices[3]]
+        weight = (weights[0][:, None, None, None] * weights[1][:, None, None]
+                  * weights[2][:, None] * weights[3])
+        return corners.reshape(len(corners), -1) @ weight.ravel()
+
+    def count(self, selected_years, selected_time, selected_rating, selected_votes,
+              main_genre=None):
+        """
+        Count the films within the slider ranges (and main genre, if given).
+
+        Returns a FacetCount: the estimate, the certain lower and upper bounds
+        (equal when the count is exact) and the estimate per main genre.
+        """
+        # Inclusive slider ranges as half-open value ranges
+        ranges = [(selected_years[0], selected_years[1] + 1),
+                  (selected_time[0], selected_time[1] + 1),
+                  (selected_rating[0], selected_rating[1] + 0.05),
+                  (selected_votes, math.inf)]
+        lows = [self._coordinate(d, low) for d, (low, _) in enumerate(ranges)]
+        highs = [self._coordinate(d, high) for d, (_, high) in enumerate(ranges)]
+
+        estimate = self._box(lows, highs)
+        inner = self._box([math.ceil(c) for c in lows], [math.floor(c) for c in highs])
+        outer = self._box([math.floor(c) for c in lows], [math.ceil(c) for c in highs])
+
+        by_genre = dict(zip(self.genres, np.rint(estimate).astype(int).tolist()))
+        if main_genre is not None:
+            if main_genre not in by_genre:
+                return FacetCount(0, 0, 0, by_genre)
+            g = self.genres.index(main_genre)
+            estimate, inner, outer = estimate[g:g + 1], inner[g:g + 1], outer[g:g + 1]
+
+        low, high = int(round(inner.sum())), int(round(outer.sum()))
+        films = min(max(int(round(estimate.sum())), low), high)
+        return FacetCount(films, low, high, by_genre)
+
+#=========================
+# Shared (per process)
+#=========================
+
+@st.cache_resource(max_entries=1)
+def load_facet_cube(db_path, snapshot):
+    """Load the facet cube of one database snapshot (kept until the next snapshot)"""
+    return FacetCube.from_connection(get_connection(db_path))
+
+
+def get_facet_cube(db_path=FILM_DB_PATH):
+    """Return the facet cube shared by all sessions"""
+    return load_facet_cube(db_path, snapshot_token(db_path))
@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import threading
+import weakref
+import streamlit as st
+
+#=====================
+# Database settings
+#=====================
+
+FILM_DB_PATH = "data/film_database.db"
+FILM_DATA_VERSION_PATH = "utils/film_data_update.txt"
+
+# Memory-map up to 256 MB of the database and keep a 64 MB page cache per connection
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 64 * 1024
+
+#=====================
+# Data version
+#=====================
+
+_version_lock = threading.Lock()
+_version_cache = {}
+
+def data_version(path=FILM_DATA_VERSION_PATH):
+    """
+    Return the IMDb data version (the date in film_data_update.txt).
+
+    The file is only read again when its modification time changes, so this is
+    cheap enough to call on every rerun.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    with _version_lock:
+        cached = _version_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, "r") as file:
+                cached = (mtime, file.read().strip())
+            _version_cache[path] = cached
+        return cached[1]
+
+
+def snapshot_token(db_path=FILM_DB_PATH):
+    """
+    Return a token of the database file that changes when a new snapshot is swapped in.
+
+    The pipeline replaces the file atomically, so the inode (and the modification
+    time) change; one os.stat per call is cheap enough for every rerun.
+    """
+    stat = os.stat(db_path)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+#============================
+# Read-only connection pool
+#============================
+
+class _Lease:
+    """Thread-local handle that returns its connection to the pool when the thread ends"""
+    def __init__(self, pool, conn, token):
+        self.conn = conn
+        self.token = token
+        weakref.finalize(self, pool._release, conn)
+
+
+class ReadOnlyConnectionPool:
+    """
+    Hands out long-lived read-only SQLite connections, one per thread.
+
+    Streamlit runs every rerun in a script thread. The first query in a thread
+    leases a connection from the pool; later queries in the same thread reuse it.
+    When the thread finishes, the connection goes back to the pool (it is not
+    closed), so the page cache and memory map stay warm for the next rerun.
+
+    When a new database snapshot is swapped in, the pool retires its connections:
+    idle ones are closed, leased ones are closed when they come back, and every
+    thread gets a connection to the new file on its next query.
+    """
+    def __init__(self, db_path=FILM_DB_PATH, immutable=True,
+                 mmap_size=MMAP_SIZE, cache_size_kib=CACHE_SIZE_KIB):
+        self.db_path = os.path.abspath(db_path)
+        self.immutable = immutable
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._idle = []
+        self._all = []
+        self._uses = {}
+        self._leases = 0
+        self._token = None
+        self.reloads = 0
+
+    def _open(self):
+        """Open a new read-only connection with the tuned pragmas"""
+        uri = f"file:{self.db_path}?mode=ro"
+        if self.immutable:
+            # The database file is only ever replaced, never edited in place
+            uri += "&immutable=1"
+
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def _release(self, conn):
+        """Put a connection back in the idle list, or close it when it was retired"""
+        with self._lock:
+            if conn in self._all:
+                self._idle.append(conn)
+            else:
+                conn.close()
+
+    def _retire(self):
+        """Forget all connections to the previous snapshot (and their counters)"""
+        for conn in self._idle:
+            conn.close()
+        self._all.clear()
+        self._idle.clear()
+        self._uses.clear()
+        self._leases = 0
+
+    def connection(self):
+        """Return the connection leased to the current thread"""
+        token = snapshot_token(self.db_path)
+        with self._lock:
+            if token != self._token:
+                if self._token is not None:
+                    self._retire()
+                    self.reloads += 1
+                self._token = token
+
+        lease = getattr(self._local, "lease", None)
+
+        if lease is None or lease.token != token:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    conn = self._open()
+                    self._all.append(conn)
+                    self._uses[conn] = 0
+                self._leases += 1
+            lease = _Lease(self, conn, token)
+            self._local.lease = lease
+
+        with self._lock:
+            # Not counted when another thread retired the connection meanwhile
+            if lease.conn in self._uses:
+                self._uses[lease.conn] += 1
+        return lease.conn
+
+    def stats(self):
+        """Return connection reuse counters of the current snapshot (and the reloads)"""
+        with self._lock:
+            uses = [self._uses[conn] for conn in self._all]
+            return {
+                "db_path": self.db_path,
+                "connections_opened": len(self._all),
+                "connections_idle": len(self._idle),
+                "leases": self._leases,
+                "lease_reuses": self._leases - len(self._all),
+                "queries_served": sum(uses),
+                "uses_per_connection": uses,
+                "snapshot_reloads": self.reloads,
+            }
+
+    def close_all(self):
+        """Close every connection, idle or leased"""
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+            self._idle.clear()
+            self._uses.clear()
+            self._leases = 0
+            self._token = None
+        self._local = threading.local()
+
+#===========================
+# Shared (per process) pool
+#===========================
+
+@st.cache_resource
+def get_connection_pool(db_path=FILM_DB_PATH):
+    """Return the read-only connection pool shared by all sessions"""
+    return ReadOnlyConnectionPool(db_path)
+
+
+def get_connection(db_path=FILM_DB_PATH):
+    """Return a long-lived read-only connection for the current thread"""
+    return get_connection_pool(db_path).connection()
+
+
+def connection_stats(db_path=FILM_DB_PATH):
+    """Return the reuse counters of the shared connection pool"""
+    return get_connection_pool(db_path).stats()
@@ -0,0 +1,273 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.film_db import FILM_DB_PATH, get_connection, snapshot_token
+from utils.film_queries import (film_filter_query, compact_results, RESULT_COLUMNS,
+                                 SORT_COLUMNS)
+from utils.genres import genre_mask, load_genre_bits
+
+#=============================
+# In-memory filter engine
+#=============================
+
+class FilmEngine:
+    """
+    Column-wise copy of film_data that evaluates the Film Chooser filters in memory.
+
+    The filter columns are kept as typed NumPy arrays and filtered with vectorized
+    masks; only the rows that are displayed are taken from the result columns
+    (RESULT_COLUMNS, in compact dtypes).
+    Results are identical to the SQLite query from film_filter_query, including the
+    order of ties (sort column, then tconst).
+    """
+    def __init__(self, films, genre_bits):
+        films = films.reset_index(drop=True)
+        self.films = compact_results(films[list(RESULT_COLUMNS)])
+        self.genre_bits = genre_bits
+
+        self.start_year = self.films['startYear'].to_numpy(dtype=np.int16)
+        self.runtime = self.films['runtimeMinutes'].to_numpy(dtype=np.int16)
+        # Ratings have one decimal, so comparing float32 values with float32 bounds
+        # gives the same answers as SQLite's double comparison
+        self.rating = self.films['averageRating'].to_numpy(dtype=np.float32)
+        self.votes = self.films['numVotes'].to_numpy(dtype=np.int32)
+        self.genre_mask = films['genre_mask'].to_numpy(dtype=np.uint32)
+        # Number of genres of every film (the bits set in its genre_mask)
+        self.genre_count = np.zeros(len(self.films), dtype=np.int8)
+        for bit in genre_bits.values():
+            self.genre_count += ((self.genre_mask >> np.uint32(bit)) & 1).astype(np.int8)
+
+        main_genre = self.films['main_genre'].astype('category')
+        self.main_genre_codes = main_genre.cat.codes.to_numpy(dtype=np.int16)
+        self.main_genre_lookup = {genre: code for code, genre in
+                                  enumerate(main_genre.cat.categories)}
+
+        # Director codes (-1 for none), for the taste profiles of the roomies
+        if 'director_1' in films.columns:
+            directors = pd.Categorical(pd.concat([films['director_1'], films['director_2']]))
+            codes = directors.codes.astype(np.int32)
+            self.director_codes = np.column_stack([codes[:len(films)], codes[len(films):]])
+            self.director_lookup = {director: code for code, director in
+                                    enumerate(directors.categories)}
+        else:
+            self.director_codes = None
+            self.director_lookup = {}
+
+        # Rank of every tconst in text order, used as tie-breaker when sorting
+        tconst = self.films['tconst'].to_numpy(dtype=str)
+        tconst_order = np.argsort(tconst, kind='stable')
+        self.sorted_tconst = tconst[tconst_order]
+        self.tconst_rows = tconst_order
+        # Hash index of tconst -> row, for lookups of many films at once
+        self.tconst_index = pd.Index(tconst)
+        self.tconst_rank = np.empty(len(self.films), dtype=np.int32)
+        self.tconst_rank[tconst_order] = np.arange(len(self.films), dtype=np.int32)
+
+        self.sort_keys = {
+            'averageRating': self.rating,
+            'startYear': self.start_year,
+            'runtimeMinutes': self.runtime,
+            'numVotes': self.votes,
+        }
+
+    @classmethod
+    def from_connection(cls, conn, table='film_data'):
+        """Load the engine from the film database"""
+        columns = ', '.join(RESULT_COLUMNS + ('genre_mask', 'director_1', 'director_2'))
+        films = pd.read_sql_query(f"SELECT {columns} FROM {table}", conn)
+        return cls(films, load_genre_bits(conn))
+
+    def __len__(self):
+        return len(self.films)
+
+    def positions(self, tconsts):
+        """Return the rows of the films tconsts (-1 for films that are not known)"""
+        return self.tconst_index.get_indexer(tconsts)
+
+    def lookup(self, tconsts):
+        """Return the result columns of the films tconsts (in that order, unknown ones left out)"""
+        rows = self.positions(tconsts)
+        return self.films.iloc[rows[rows >= 0]]
+
+    def matching_rows(self,
+                      selected_years,
+                      selected_time,
+                      selected_rating,
+                      selected_votes,
+                      genre_tag,
+                      main_genre,
+                      operator,
+                      genre_selection):
+        """Return the positions of all films that pass the filters"""
+        keep = (
+            (self.start_year >= selected_years[0]) & (self.start_year <= selected_years[1])
+            & (self.runtime >= selected_time[0]) & (self.runtime <= selected_time[1])
+            & (self.rating >= np.float32(selected_rating[0]))
+            & (self.rating <= np.float32(selected_rating[1]))
+            & (self.votes >= selected_votes)
+        )
+
+        if genre_tag == 2:
+            code = self.main_genre_lookup.get(main_genre)
+            if code is None:
+                return np.empty(0, dtype=np.intp)
+            keep &= self.main_genre_codes == code
+
+        if genre_tag != 0 and genre_selection:
+            mask = np.uint32(genre_mask(genre_selection, self.genre_bits))
+            if operator == 0:  # AND: all selected bits set
+                keep &= (self.genre_mask & mask) == mask
+            elif operator == 1:  # OR: any selected bit set
+                keep &= (self.genre_mask & mask) != 0
+
+        return np.flatnonzero(keep)
+
+    def top_rows(self, rows, sort_column, top_n, sort_ascending=False):
+        """Sort rows on sort_column (ties on tconst) and keep the first top_n"""
+        if sort_column not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column: {sort_column}")
+
+        # Sorting ascending on the negated keys gives the descending order
+        sign = 1 if sort_ascending else -1
+        keys = sign * self.sort_keys[sort_column][rows].astype(np.float64)
+
+        if top_n is not None and top_n < len(rows):
+            if top_n <= 0:
+                return rows[:0]
+            # Keep everything up to the top_n-th key, including all its ties
+            kth_key = keys[np.argpartition(keys, top_n - 1)[top_n - 1]]
+            candidates = keys <= kth_key
+            rows, keys = rows[candidates], keys[candidates]
+
+        order = np.lexsort((sign * self.tconst_rank[rows], keys))
+        if top_n is not None:
+            order = order[:top_n]
+        return rows[order]
+
+    def filter(self,
+               selected_years,
+               selected_time,
+               selected_rating,
+               selected_votes,
+               genre_tag,
+               main_genre,
+               operator,
+               genre_selection,
+               sort_column,
+               top_n,
+               sort_ascending=False):
+        """Return the films of the Film Chooser filters as a DataFrame, like film_data_filter"""
+        rows = self.matching_rows(selected_years, selected_time, selected_rating,
+                                  selected_votes, genre_tag, main_genre, operator,
+                                  genre_selection)
+        rows = self.top_rows(rows, sort_column, top_n, sort_ascending)
+        return self.films.take(rows).reset_index(drop=True)
+
+    def count(self,
+              selected_years,
+              selected_time,
+              selected_rating,
+              selected_votes,
+              genre_tag,
+              main_genre,
+              operator,
+              genre_selection):
+        """Return the number of films that pass the filters"""
+        return len(self.matching_rows(selected_years, selected_time, selected_rating,
+                                      selected_votes, genre_tag, main_genre, operator,
+                                      genre_selection))
+
+    def sample(self,
+               selected_years,
+               selected_time,
+               selected_rating,
+               selected_votes,
+               genre_tag,
+               main_genre,
+               operator,
+               genre_selection,
+               n=1):
+        """Return n random films that pass the filters"""
+        rows = self.matching_rows(selected_years, selected_time, selected_rating,
+                                  selected_votes, genre_tag, main_genre, operator,
+                                  genre_selection)
+        rows = np.random.default_rng().choice(rows, size=min(n, len(rows)), replace=False)
+        return self.films.take(rows).reset_index(drop=True)
+
+    def rows_after(self, rows, sort_column, after, sort_ascending=False):
+        """Keep the rows that come after the key (sort value, tconst) in the sort order"""
+        value, tconst = after
+        keys = self.sort_keys[sort_column]
+        # Compare in the dtype of the sort column (a float32 rating is not its float64)
+        value = np.asarray(value).astype(keys.dtype)
+        keys = keys[rows]
+        ranks = self.tconst_rank[rows]
+
+        # Rank of the key's tconst, also when that film is no longer in the database
+        if sort_ascending:
+            rank = np.searchsorted(self.sorted_tconst, tconst, side='right')
+            keep = (keys > value) | ((keys == value) & (ranks >= rank))
+        else:
+            rank = np.searchsorted(self.sorted_tconst, tconst, side='left')
+            keep = (keys < value) | ((keys == value) & (ranks < rank))
+        return rows[keep]
+
+    def page(self,
+             selected_years,
+             selected_time,
+             selected_rating,
+             selected_votes,
+             genre_tag,
+             main_genre,
+             operator,
+             genre_selection,
+             sort_column,
+             page_size,
+             after=None,
+             sort_ascending=False):
+        """Return one page of the filtered films, like film_page_query"""
+        rows = self.matching_rows(selected_years, selected_time, selected_rating,
+                                  selected_votes, genre_tag, main_genre, operator,
+                                  genre_selection)
+        if after is not None:
+            rows = self.rows_after(rows, sort_column, after, sort_ascending)
+        rows = self.top_rows(rows, sort_column, page_size, sort_ascending)
+        return self.films.take(rows).reset_index(drop=True)
+
+#=========================
+# Shared (per process)
+#=========================
+
+@st.cache_resource(max_entries=1)
+def load_film_engine(db_path, snapshot):
+    """Load the engine of one database snapshot (kept until the next snapshot)"""
+    return FilmEngine.from_connection(get_connection(db_path))
+
+
+def get_film_engine(db_path=FILM_DB_PATH):
+    """Return the in-memory filter engine shared by all sessions"""
+    return load_film_engine(db_path, snapshot_token(db_path))
+
+#===================
+# Engine check
+#===================
+
+def check_engine_against_sqlite(conn, engine, cases):
+    """
+    Run every filter case through SQLite and the engine.
+
+    Returns the descriptions of the cases where both results differ; an empty
+    list means the engine gives identical results.
+    """
+    mismatches = []
+    for description, case in cases.items():
+        query, params = film_filter_query(**case, genre_bits=engine.genre_bits)
+        expected = compact_results(pd.read_sql_query(query, conn, params=params))
+        result = engine.filter(**case)
+
+        same_rows = list(expected['tconst']) == list(result['tconst'])
+        same_values = same_rows and expected.astype(object).equals(result.astype(object))
+        if not same_values:
+            mismatches.append(description)
+
+    return mismatches
@@ -0,0 +1,186 @@
+import io
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.film_db import FILM_DB_PATH, get_connection, snapshot_token
+from utils.genres import load_genre_bits
+
+#=========================
+# Film feature vectors
+#=========================
+
+FEATURE_TABLE = 'film_features'
+
+# Weight of every part of a film's vector. The genres are scaled to unit length
+# (a film with five genres does not count five times), main genre and decade are
+# one-hot and year (nearby years within a decade), runtime and rating are z-scores.
+GENRE_WEIGHT = 1.0
+MAIN_GENRE_WEIGHT = 0.5
+DIRECTOR_WEIGHT = 1.0
+DECADE_WEIGHT = 0.5
+YEAR_WEIGHT = 0.3
+RUNTIME_WEIGHT = 0.3
+RATING_WEIGHT = 0.5
+
+def feature_arrays(conn, table='film_data'):
+    """
+    Build the feature arrays of every film of film_data.
+
+    Returns tconst (str), the dense float32 features (genres, main genre, decade,
+    year, runtime, rating) and the director codes (int32, two per film, -1 for none). The
+    directors are one-hot features too, but are kept as codes: thousands of
+    mostly-zero columns would not fit in memory.
+    """
+    bits = load_genre_bits(conn)
+    films = pd.read_sql_query(f"""
+        SELECT tconst, genre_mask, main_genre, director_1, director_2, startYear,
+               runtimeMinutes, averageRating
+        FROM {table}
+        ORDER BY tconst
+    """, conn)
+
+    masks = films['genre_mask'].to_numpy(dtype=np.int64)
+    genres = ((masks[:, None] >> np.arange(len(bits))) & 1).astype(np.float32)
+    genres /= np.maximum(np.sqrt(genres.sum(axis=1, keepdims=True)), 1.0)
+
+    main_genre = pd.get_dummies(films['main_genre']).to_numpy(dtype=np.float32)
+
+    decades = (films['startYear'].to_numpy() // 10) * 10
+    decade_columns = np.unique(decades)
+    decade = (decades[:, None] == decade_columns).astype(np.float32)
+
+    def zscore(column):
+        values = films[column].to_numpy(dtype=np.float64)
+        return ((values - values.mean()) / (values.std() or 1.0)).astype(np.float32)[:, None]
+
+    dense = np.hstack([GENRE_WEIGHT * genres,
+                       MAIN_GENRE_WEIGHT * main_genre,
+                       DECADE_WEIGHT * decade,
+                       YEAR_WEIGHT * zscore('startYear'),
+                       RUNTIME_WEIGHT * zscore('runtimeMinutes'),
+                       RATING_WEIGHT * zscore('averageRating')]).astype(np.float32)
+
+    director_ids = pd.concat([films['director_1'], films['director_2']])
+    codes = pd.Categorical(director_ids).codes.astype(np.int32)
+    directors = np.column_stack([codes[:len(films)], codes[len(films):]])
+
+    return films['tconst'].to_numpy(dtype=str), dense, directors
+
+
+def _blob(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def write_film_features(conn, table='film_data'):
+    """Store the feature arrays of film_data in film_features (run after every build)"""
+    tconst, dense, directors = feature_arrays(conn, table)
+    with conn:
+        conn.execute(f"DROP TABLE IF EXISTS {FEATURE_TABLE}")
+        conn.execute(f"CREATE TABLE {FEATURE_TABLE} (name TEXT PRIMARY KEY, array BLOB NOT NULL)")
+        conn.executemany(f"INSERT INTO {FEATURE_TABLE} (name, array) VALUES (?, ?)",
+                         [('tconst', _blob(tconst)), ('dense', _blob(dense)),
+                          ('directors', _blob(directors))])
+    return dense.shape
+
+
+def read_film_features(conn):
+    """Return the stored (tconst, dense, directors), or None when the database has none"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if FEATURE_TABLE not in tables:
+        return None
+
+    arrays = {name: np.load(io.BytesIO(blob), allow_pickle=False)
+              for name, blob in conn.execute(f"SELECT name, array FROM {FEATURE_TABLE}")}
+    return arrays['tconst'], arrays['dense'], arrays['directors']
+
+#==========================
+# More like this
+#==========================
+
+class FilmFeatures:
+    """
+    Cosine similarity between films on their feature vectors.
+
+    A film against the whole catalogue is one matrix-vector product on the dense
+    features, plus the films that share a director (looked up in the sorted
+    director codes); the top k come from argpartition, so no full sort is needed.
+    """
+    def __init__(self, tconst, dense, directors):
+        self.tconst = tconst
+        self.directors = directors
+        self.position = {t: i for i, t in enumerate(tconst.tolist())}
+
+        director_count = (directors >= 0).sum(axis=1)
+        norms = np.sqrt((dense.astype(np.float64) ** 2).sum(axis=1)
+                        + DIRECTOR_WEIGHT ** 2 * director_count)
+        norms[norms == 0] = 1.0
+        self.norms = norms.astype(np.float32)
+        # Unit-length dense features: their dot products are the dense part of the
+        # cosine similarity right away
+        self.unit = (dense / norms[:, None]).astype(np.float32)
+
+        # Films per director code (a film is listed once per director it has)
+        codes = directors.ravel()
+        order = np.argsort(codes, kind='stable')
+        self._director_codes = codes[order]
+        self._director_films = order // directors.shape[1]
+
+    @classmethod
+    def from_connection(cls, conn, table='film_data'):
+        """Load the stored features, or build them from film_data for older databases"""
+        stored = read_film_features(conn)
+        return cls(*(stored if stored is not None else feature_arrays(conn, table)))
+
+    def __len__(self):
+        return len(self.tconst)
+
+    def similarities(self, rows):
+        """Cosine similarity of the films at rows (positions) with every film"""
+        rows = np.atleast_1d(rows)
+        similarities = self.unit[rows] @ self.unit.T
+
+        # Shared directors: the dot product of the one-hot director columns, for
+        # the films of the same director only
+        for i, row in enumerate(rows):
+            for code in set(self.directors[row].tolist()) - {-1}:
+                low, high = np.searchsorted(self._director_codes, [code, code + 1])
+                films = self._director_films[low:high]
+                similarities[i, films] += DIRECTOR_WEIGHT ** 2 / (self.norms[row] * self.norms[films])
+
+        return similarities
+
+    def top_k(self, similarities, k, exclude=None):
+        """Positions and scores of the k most similar films, best first"""
+        if exclude is not None:
+            similarities = similarities.copy()
+            similarities[exclude] = -np.inf
+        k = min(k, len(similarities) - (exclude is not None))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        best = np.argpartition(-similarities, k - 1)[:k]
+        best = best[np.argsort(-similarities[best], kind='stable')]
+        return best, similarities[best]
+
+    def similar(self, tconst, k=10):
+        """Return the k films most like tconst as a list of (tconst, similarity)"""
+        row = self.position.get(tconst)
+        if row is None:
+            return []
+        best, scores = self.top_k(self.similarities(row)[0], k, exclude=row)
+        return list(zip(self.tconst[best].tolist(), scores.tolist()))
+
+#=========================
+# Shared (per process)
+#=========================
+
+@st.cache_resource(max_entries=1)
+def load_film_features(db_path, snapshot):
+    """Load the film features of one database snapshot (kept until the next snapshot)"""
+    return FilmFeatures.from_connection(get_connection(db_path))
+
+
+def get_film_features(db_path=FILM_DB_PATH):
+    """Return the film features shared by all sessions"""
+    return load_film_features(db_path, snapshot_token(db_path))
@@ -0,0 +1,138 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from utils.film_features import FilmFeatures, read_film_features, feature_arrays
+
+#==========================
+# Film neighbour table
+#==========================
+
+NEIGHBOR_TABLE = 'film_neighbors'
+
+# Most similar films kept per film
+NEIGHBORS = 50
+
+# Films per block a worker scores at once (a block of similarities is
+# BLOCK_SIZE x films float32, about 140 MB for 270k films)
+BLOCK_SIZE = 128
+
+# Films sampled per block to find the similarity threshold of the top k
+SAMPLE_SIZE = 4096
+
+# One row per film: the neighbours as int32 tconst numbers ('tt0266697' ->
+# 266697) and their similarities as float16, best first. 300 bytes per film
+# instead of 50 rows with two tconst texts each.
+def tconst_number(tconst):
+    """'tt0266697' -> 266697"""
+    if not re.fullmatch(r'tt\d+', tconst):
+        raise ValueError(f"Not an IMDb title ID: {tconst}")
+    return int(tconst[2:])
+
+
+def number_tconst(number):
+    """266697 -> 'tt0266697' (IMDb pads title IDs to at least 7 digits)"""
+    return f"tt{number:07d}"
+
+#================================
+# Build (split over processes)
+#================================
+
+_features = None
+
+def _start_worker(tconst, dense, directors):
+    global _features
+    _features = FilmFeatures(tconst, dense, directors)
+
+
+def _neighbor_block(start, stop, k):
+    """Top k neighbours (positions, similarities) of the films start:stop"""
+    rows = np.arange(start, stop)
+    similarities = _features.similarities(rows)
+    similarities[np.arange(len(rows)), rows] = -np.inf
+
+    # The k-th best similarity within a sample of the films is at most the k-th
+    # best overall, so every top k film is at or above it: only those few
+    # candidates are sorted, instead of every film
+    stride = max(1, similarities.shape[1] // SAMPLE_SIZE)
+    sample = similarities[:, ::stride]
+    if sample.shape[1] > k:
+        threshold = np.partition(sample, sample.shape[1] - k, axis=1)[:, -k]
+    else:
+        threshold = np.full(len(rows), -np.inf, dtype=similarities.dtype)
+
+    best = np.empty((len(rows), k), dtype=np.int64)
+    for i, row_threshold in enumerate(threshold):
+        candidates = np.flatnonzero(similarities[i] >= row_threshold)
+        order = np.argsort(-similarities[i, candidates], kind='stable')[:k]
+        best[i] = candidates[order]
+    return start, best, np.take_along_axis(similarities, best, axis=1)
+
+
+def neighbor_arrays(tconst, dense, directors, k=NEIGHBORS, workers=None):
+    """
+    Return the top k neighbours (positions) and their similarities of every film.
+
+    The catalogue is split into blocks that worker processes score against the
+    whole catalogue; every worker gets the feature arrays once.
+    """
+    films = len(tconst)
+    k = min(k, films - 1)
+    neighbors = np.zeros((films, max(k, 0)), dtype=np.int64)
+    similarities = np.zeros((films, max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return neighbors, similarities
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(tconst, dense, directors)) as pool:
+        futures = [pool.submit(_neighbor_block, start, min(start + BLOCK_SIZE, films), k)
+                   for start in range(0, films, BLOCK_SIZE)]
+        for future in futures:
+            start, best, scores = future.result()
+            neighbors[start:start + len(best)] = best
+            similarities[start:start + len(best)] = scores
+    return neighbors, similarities
+
+
+def write_film_neighbors(conn, k=NEIGHBORS, workers=None, table='film_data'):
+    """Precompute the neighbours of every film into film_neighbors (run after the features)"""
+    stored = read_film_features(conn)
+    tconst, dense, directors = stored if stored is not None else feature_arrays(conn, table)
+    neighbors, similarities = neighbor_arrays(tconst, dense, directors, k=k, workers=workers)
+
+    numbers = np.array([tconst_number(t) for t in tconst.tolist()], dtype=np.int32)
+    rows = ((t, numbers[best].tobytes(), scores.astype(np.float16).tobytes())
+            for t, best, scores in zip(tconst.tolist(), neighbors, similarities))
+    with conn:
+        conn.execute(f"DROP TABLE IF EXISTS {NEIGHBOR_TABLE}")
+        conn.execute(f"""
+            CREATE TABLE {NEIGHBOR_TABLE} (
+                tconst TEXT PRIMARY KEY,
+                neighbors BLOB NOT NULL,
+                similarities BLOB NOT NULL
+            ) WITHOUT ROWID
+        """)
+        conn.executemany(f"INSERT INTO {NEIGHBOR_TABLE} VALUES (?, ?, ?)", rows)
+    return len(tconst)
+
+#=================
+# Lookup
+#=================
+
+def has_film_neighbors(conn):
+    """Whether the database has the neighbour table (databases built before have not)"""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                       (NEIGHBOR_TABLE,)).fetchone()
+    return row is not None
+
+
+def film_neighbors(conn, tconst, k=10):
+    """Return the k films most like tconst as a list of (tconst, similarity), one lookup"""
+    row = conn.execute(f"SELECT neighbors, similarities FROM {NEIGHBOR_TABLE} WHERE tconst = ?",
+                       (tconst,)).fetchone()
+    if row is None:
+        return []
+    numbers = np.frombuffer(row[0], dtype=np.int32)[:k]
+    scores = np.frombuffer(row[1], dtype=np.float16)[:k]
+    return [(number_tconst(n), s) for n, s in zip(numbers.tolist(), scores.astype(float).tolist())]
@@ -0,0 +1,196 @@
+import numpy as np
+from utils.genres import genre_mask
+
+#=========================
+# Film Chooser queries
+#=========================
+
+# Columns the Film Chooser is allowed to sort on
+SORT_COLUMNS = ('averageRating', 'startYear', 'runtimeMinutes', 'numVotes')
+
+# Columns the Film Chooser shows (no genre flags, director IDs or names), and the
+# compact dtypes they are loaded with
+RESULT_COLUMNS = ('tconst', 'primaryTitle', 'startYear', 'runtimeMinutes', 'main_genre',
+                  'other_genres', 'averageRating', 'numVotes')
+RESULT_DTYPES = {
+    'startYear': 'int16',
+    'runtimeMinutes': 'int16',
+    'averageRating': 'float32',
+    'numVotes': 'int32',
+    'main_genre': 'category',
+    'other_genres': 'category',
+}
+
+def compact_results(frame):
+    """Return frame with the compact dtypes of the result columns it has"""
+    return frame.astype({column: dtype for column, dtype in RESULT_DTYPES.items()
+                         if column in frame.columns})
+
+
+def _select(columns):
+    return "SELECT " + ("*" if columns is None else ", ".join(columns)) + " FROM film_data"
+
+
+def film_where(selected_years,
+               selected_time,
+               selected_rating,
+               selected_votes,
+               genre_tag,
+               main_genre,
+               operator,
+               genre_selection,
+               genre_bits=None):
+    """
+    Return the WHERE clause and parameters for the Film Chooser filters.
+
+    genre_bits is the genre -> bit lookup of the database; it is needed as soon
+    as genres are selected.
+    """
+    where = """
+        WHERE
+            startYear BETWEEN ? AND ?
+            AND runtimeMinutes BETWEEN ? AND ?
+            AND averageRating BETWEEN ? AND ?
+            AND numVotes >= ?
+    """
+    params = [
+        selected_years[0], selected_years[1],
+        selected_time[0], selected_time[1],
+        selected_rating[0], selected_rating[1],
+        selected_votes
+    ]
+
+    # Optional genre filters
+    if genre_tag == 2:
+        where += " AND main_genre = ?"
+        params.append(main_genre)
+
+    if genre_tag != 0 and genre_selection:
+        if genre_bits is None:
+            raise ValueError("genre_bits is required to filter on genres")
+        mask = genre_mask(genre_selection, genre_bits)
+
+        if operator == 0:  # AND: all selected bits set
+            where += " AND (genre_mask & ?) = ?"
+            params += [mask, mask]
+        elif operator == 1:  # OR: any selected bit set
+            where += " AND (genre_mask & ?) != 0"
+            params.append(mask)
+
+    return where, params
+
+
+def film_filter_query(selected_years,
+                      selected_time,
+                      selected_rating,
+                      selected_votes,
+                      genre_tag,
+                      main_genre,
+                      operator,
+                      genre_selection,
+                      sort_column,
+                      top_n,
+                      sort_ascending=False,
+                      genre_bits=None,
+                      columns=RESULT_COLUMNS):
+    """
+    Return the SQL query and parameters for the Film Chooser filters.
+
+    Only the result columns are selected; columns=None selects every column.
+    """
+    if sort_column not in SORT_COLUMNS:
+        raise ValueError(f"Unknown sort column: {sort_column}")
+
+    where, params = film_where(selected_years, selected_time, selected_rating,
+                               selected_votes, genre_tag, main_genre, operator,
+                               genre_selection, genre_bits)
+    query = _select(columns) + where
+
+    # Add ORDER BY (ties broken on tconst, so the order is deterministic) and LIMIT
+    order = "ASC" if sort_ascending else "DESC"
+    query += f" ORDER BY {sort_column} {order}, tconst {order}"
+
+    if top_n is not None:
+        query += " LIMIT ?"
+        params.append(top_n)
+
+    return query, params
+
+#=========================
+# Paginated results
+#=========================
+
+# Films per page of the "All" tier list
+PAGE_SIZE = 100
+
+def film_count_query(selected_years,
+                     selected_time,
+                     selected_rating,
+                     selected_votes,
+                     genre_tag,
+                     main_genre,
+                     operator,
+                     genre_selection,
+                     genre_bits=None):
+    """Return the SQL query and parameters that count the films of the filters"""
+    where, params = film_where(selected_years, selected_time, selected_rating,
+                               selected_votes, genre_tag, main_genre, operator,
+                               genre_selection, genre_bits)
+    return "SELECT COUNT(*) FROM film_data" + where, params
+
+
+def film_page_query(selected_years,
+                    selected_time,
+                    selected_rating,
+                    selected_votes,
+                    genre_tag,
+                    main_genre,
+                    operator,
+                    genre_selection,
+                    sort_column,
+                    page_size,
+                    after=None,
+                    sort_ascending=False,
+                    genre_bits=None,
+                    columns=RESULT_COLUMNS):
+    """
+    Return the SQL query and parameters for one page of the filtered films.
+
+    Keyset pagination: after is the (sort value, tconst) of the last film of the
+    previous page (None for the first page). The page starts right after that key,
+    so every page costs the same, however deep it is.
+    """
+    if sort_column not in SORT_COLUMNS:
+        raise ValueError(f"Unknown sort column: {sort_column}")
+
+    where, params = film_where(selected_years, selected_time, selected_rating,
+                               selected_votes, genre_tag, main_genre, operator,
+                               genre_selection, genre_bits)
+    query = _select(columns) + where
+
+    order = "ASC" if sort_ascending else "DESC"
+    if after is not None:
+        # (sort value, tconst) past the key; the plain range on the sort column
+        # lets SQLite start the index scan at the key
+        value, tconst = after
+        bound, beyond = (">=", ">") if sort_ascending else ("<=", "<")
+        query += (f" AND {sort_column} {bound} ?"
+                  f" AND ({sort_column} {beyond} ? OR tconst {beyond} ?)")
+        params += [value, value, tconst]
+
+    query += f" ORDER BY {sort_column} {order}, tconst {order} LIMIT ?"
+    params.append(page_size)
+
+    return query, params
+
+
+def page_key(page, sort_column):
+    """Return the key (sort value, tconst) of the last film on a page, as Python values"""
+    value = page[sort_column].iloc[-1]
+    if isinstance(value, np.floating):
+        # The shortest repr of a float32 rating (7.1, not 7.099999904632568), so it
+        # equals the REAL value stored in SQLite
+        value = float(str(value))
+    elif isinstance(value, np.generic):
+        value = value.item()
+    return (value, str(page['tconst'].iloc[-1]))
@@ -0,0 +1,121 @@
+from datetime import datetime
+from utils.film_queries import film_filter_query, SORT_COLUMNS
+from utils.genres import load_genre_bits
+
+#==================
+# Film indexes
+#==================
+
+# One composite index per sort column of the Film Chooser. The sort column comes
+# first, so ORDER BY ... LIMIT walks the index in order and stops early; the other
+# filter columns and the genre mask follow, so every predicate is checked on the
+# index entry before the table row is read.
+FILM_INDEXES = {
+    'idx_film_rating': ('averageRating', 'numVotes', 'startYear', 'runtimeMinutes',
+                        'genre_mask'),
+    'idx_film_year': ('startYear', 'averageRating', 'numVotes', 'runtimeMinutes',
+                      'genre_mask'),
+    'idx_film_runtime': ('runtimeMinutes', 'averageRating', 'numVotes', 'startYear',
+                         'genre_mask'),
+    'idx_film_votes': ('numVotes', 'averageRating', 'startYear', 'runtimeMinutes',
+                       'genre_mask'),
+    # Equality on the main genre, then the default sort column
+    'idx_film_main_genre': ('main_genre', 'averageRating', 'numVotes', 'startYear',
+                            'runtimeMinutes', 'genre_mask'),
+}
+
+# Unique key of every film, for lookups and incremental updates by tconst
+TCONST_INDEX = 'idx_film_tconst'
+
+def index_columns(conn, name):
+    """Return the columns of an index, or None when the index does not exist"""
+    rows = conn.execute(f"PRAGMA index_info({name})").fetchall()
+    return tuple(row[2] for row in sorted(rows)) or None
+
+
+def create_film_indexes(conn, table='film_data'):
+    """
+    Create the Film Chooser indexes and the tconst index on film_data, and refresh
+    the planner statistics. Indexes that already exist with the right columns are
+    kept, so an incrementally updated database is not rewritten.
+    """
+    indexes = {TCONST_INDEX: ('tconst',), **FILM_INDEXES}
+    for name, columns in indexes.items():
+        if index_columns(conn, name) == columns:
+            continue
+        unique = 'UNIQUE ' if name == TCONST_INDEX else ''
+        column_list = ', '.join(columns)
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.execute(f"CREATE {unique}INDEX {name} ON {table} ({column_list})")
+
+    conn.execute("ANALYZE")
+    conn.commit()
+
+#========================
+# Query plan checks
+#========================
+
+def explain_query_plan(conn, query, params=()):
+    """Return the detail lines of EXPLAIN QUERY PLAN for a query"""
+    rows = conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def chooser_plan_cases():
+    """Return representative Film Chooser filter combinations, keyed by a description"""
+    defaults = {
+        'selected_years': (1985, datetime.now().year),
+        'selected_time': (60, 120),
+        'selected_rating': (7.0, 10.0),
+        'selected_votes': 100000,
+        'genre_tag': 0,
+        'main_genre': 'No preference for any genre...',
+        'operator': 0,
+        'genre_selection': [],
+        'top_n': 100,
+    }
+
+    cases = {}
+    for sort_column in SORT_COLUMNS:
+        cases[f'defaults, sort on {sort_column}'] = {**defaults, 'sort_column': sort_column}
+        cases[f'all rows, sort on {sort_column}'] = {**defaults, 'sort_column': sort_column,
+                                                     'top_n': None}
+
+    cases['main genre'] = {**defaults, 'sort_column': 'averageRating', 'genre_tag': 2,
+                           'main_genre': 'Drama'}
+    cases['main genre with AND genres'] = {**cases['main genre'],
+                                           'genre_selection': ['Crime', 'Thriller']}
+    cases['OR genres'] = {**defaults, 'sort_column': 'averageRating', 'genre_tag': 1,
+                          'main_genre': 'No preference for a main genre...',
+                          'operator': 1, 'genre_selection': ['Comedy', 'Romance']}
+    cases['loose filters'] = {**defaults, 'sort_column': 'numVotes',
+                              'selected_years': (1940, datetime.now().year),
+                              'selected_time': (30, 240),
+                              'selected_rating': (1.0, 10.0),
+                              'selected_votes': 0}
+    return cases
+
+
+def check_chooser_query_plans(conn, table='film_data'):
+    """
+    Run EXPLAIN QUERY PLAN for the Film Chooser queries.
+
+    Returns a dict with the plan of every query that reads the table without one of
+    the FILM_INDEXES; an empty dict means all queries use the indexes.
+    """
+    bits = load_genre_bits(conn)
+
+    failures = {}
+    for description, case in chooser_plan_cases().items():
+        query, params = film_filter_query(**case, genre_bits=bits)
+        plan = explain_query_plan(conn, query, params)
+
+        table_steps = [step for step in plan if table in step]
+        uses_index = table_steps and all(
+            any(f"INDEX {name}" in step for name in FILM_INDEXES)
+            for step in table_steps
+        )
+        if not uses_index:
+            failures[description] = plan
+
+    return failures
@@ -0,0 +1,151 @@
+import math
+import re
+import unicodedata
+import pandas as pd
+
+#=========================
+# Film search index
+#=========================
+
+# Words (accents and case folded away, prefix indexes for typing) and trigrams of
+# the title and the director names. The trigram text is folded in Python, as the
+# trigram tokenizer of older SQLite versions keeps accents.
+SEARCH_TABLE = 'film_search'
+TRIGRAM_TABLE = 'film_search_trigram'
+
+# bm25 weights of the title and directors columns
+TITLE_WEIGHT = 2.0
+DIRECTOR_WEIGHT = 1.0
+
+# Rank = bm25 (more negative is better) - VOTES_WEIGHT * log10(1 + numVotes), so
+# a popular film wins from an obscure film with about the same text score
+VOTES_WEIGHT = 0.5
+
+# The films are stored most voted first. The films ranked are the CANDIDATES most
+# voted matches and the CANDIDATES best bm25 matches, so a broad search ('the',
+# a common surname) still finds an obscure film whose title is the best match.
+CANDIDATES = 250
+
+# Trigram matches are added when the words find fewer films than this
+FUZZY_BELOW = 5
+
+SEARCH_COLUMNS = ('tconst', 'primaryTitle', 'startYear', 'nmDirector_1', 'nmDirector_2',
+                  'averageRating', 'numVotes')
+
+def fold(text):
+    """Lower case text without accents ('Amélie' -> 'amelie')"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def write_film_search(conn, table='film_data'):
+    """Build the search tables of film_data (run after every build); returns the films"""
+    films = pd.read_sql_query(f"""
+        SELECT tconst, primaryTitle, nmDirector_1, nmDirector_2, numVotes FROM {table}
+        ORDER BY numVotes DESC, tconst
+    """, conn)
+    directors = (films['nmDirector_1'].fillna('') + ' '
+                 + films['nmDirector_2'].fillna('')).str.strip()
+    popularity = [VOTES_WEIGHT * math.log10(1 + votes) for votes in films['numVotes'].fillna(0)]
+
+    with conn:
+        for name in (SEARCH_TABLE, TRIGRAM_TABLE):
+            conn.execute(f"DROP TABLE IF EXISTS {name}")
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+                primaryTitle, directors, tconst UNINDEXED, popularity UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')
+        """)
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE {TRIGRAM_TABLE} USING fts5(
+                primaryTitle, directors, tconst UNINDEXED, popularity UNINDEXED,
+                tokenize = 'trigram')
+        """)
+        conn.executemany(f"INSERT INTO {SEARCH_TABLE} VALUES (?, ?, ?, ?)",
+                         zip(films['primaryTitle'], directors, films['tconst'], popularity))
+        conn.executemany(f"INSERT INTO {TRIGRAM_TABLE} VALUES (?, ?, ?, ?)",
+                         zip(films['primaryTitle'].map(fold), directors.map(fold),
+                             films['tconst'], popularity))
+        for name in (SEARCH_TABLE, TRIGRAM_TABLE):
+            conn.execute(f"INSERT INTO {name}({name}) VALUES ('optimize')")
+    return len(films)
+
+
+def has_film_search(conn):
+    """Whether the database has the search tables (databases built before have not)"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return {SEARCH_TABLE, TRIGRAM_TABLE} <= tables
+
+#=====================
+# Search
+#=====================
+
+def _words(text):
+    return re.findall(r'\w+', fold(text))
+
+
+def word_query(text):
+    """FTS5 query: every word must match, the last one as a prefix (still typing)"""
+    words = _words(text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+
+
+def trigram_query(text):
+    """FTS5 query matching any trigram of the words (typos still share most of them)"""
+    trigrams = {word[i:i + 3] for word in _words(text) for i in range(len(word) - 2)}
+    if not trigrams:
+        return None
+    return ' OR '.join(f'"{trigram}"' for trigram in sorted(trigrams))
+
+
+def _ranked(conn, search_table, match, limit, table):
+    columns = ', '.join(f'f.{column}' for column in SEARCH_COLUMNS)
+    bm25 = f"bm25({search_table}, {TITLE_WEIGHT}, {DIRECTOR_WEIGHT})"
+    query = f"""
+        WITH candidates AS (
+            SELECT * FROM (SELECT tconst, {bm25} AS text_score, popularity
+                           FROM {search_table} WHERE {search_table} MATCH ?
+                           ORDER BY rowid LIMIT {CANDIDATES})
+            UNION
+            SELECT * FROM (SELECT tconst, {bm25} AS text_score, popularity
+                           FROM {search_table} WHERE {search_table} MATCH ?
+                           ORDER BY text_score LIMIT {CANDIDATES})
+        ), hits AS (
+            SELECT tconst, text_score - popularity AS score
+            FROM candidates ORDER BY score, tconst LIMIT ?
+        )
+        SELECT {columns}, hits.score
+        FROM hits JOIN {table} AS f ON f.tconst = hits.tconst
+        ORDER BY hits.score, hits.tconst
+    """
+    return pd.read_sql_query(query, conn, params=(match, match, limit))
+
+
+def search_films(conn, text, limit=20, table='film_data'):
+    """
+    Search the titles and director names of film_data.
+
+    Words match accent and case insensitive, the last word as a prefix. When that
+    finds fewer than FUZZY_BELOW films, trigram matches fill up the list, so typos
+    still find the film ('tarantno'). Films are ranked on bm25 and their number of votes.
+    Returns the SEARCH_COLUMNS of the films, best match first, with a fuzzy flag.
+    """
+    results = []
+    match = word_query(text)
+    if match is not None:
+        words = _ranked(conn, SEARCH_TABLE, match, limit, table)
+        results.append(words.assign(fuzzy=False))
+
+    found = len(results[0]) if results else 0
+    match = trigram_query(text)
+    if found < min(FUZZY_BELOW, limit) and match is not None:
+        trigrams = _ranked(conn, TRIGRAM_TABLE, match, limit + found, table)
+        if results:
+            trigrams = trigrams[~trigrams['tconst'].isin(results[0]['tconst'])]
+        results.append(trigrams.head(limit - found).assign(fuzzy=True))
+
+    if not results:
+        return pd.DataFrame(columns=[*SEARCH_COLUMNS, 'score', 'fuzzy'])
+    return pd.concat(results, ignore_index=True)
@@ -0,0 +1,148 @@
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+import pandas as pd
+
+#============================
+# Versioned DB snapshots
+#============================
+
+VERSION_TABLE = 'film_data_version'
+
+def start_snapshot(db_path, incremental=True):
+    """
+    Return the path of a new snapshot file next to db_path to build into.
+
+    For incremental builds the snapshot starts as a copy of the current database;
+    the live file itself is never written.
+    """
+    stamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    snapshot = f"{db_path}.{stamp}.tmp"
+    if os.path.exists(snapshot):
+        os.remove(snapshot)
+    if incremental and os.path.exists(db_path):
+        shutil.copy2(db_path, snapshot)
+    return snapshot
+
+
+def write_version(conn, version):
+    """Store the data version in the database (one row)"""
+    conn.execute(f"DROP TABLE IF EXISTS {VERSION_TABLE}")
+    conn.execute(f"CREATE TABLE {VERSION_TABLE} (version TEXT NOT NULL, built_at TEXT NOT NULL)")
+    conn.execute(f"INSERT INTO {VERSION_TABLE} (version, built_at) VALUES (?, ?)",
+                 (version, datetime.now().isoformat(timespec='seconds')))
+    conn.commit()
+
+
+def read_version(conn):
+    """Return the data version stored in the database, or None"""
+    try:
+        row = conn.execute(f"SELECT version FROM {VERSION_TABLE}").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def reference_test(conn, tconst, reference, table='film_data_legacy'):
+    """Return True when the film tconst in the database equals the reference DataFrame"""
+    df_target = pd.read_sql_query(f"SELECT * FROM {table} WHERE tconst = ?", conn,
+                                  params=(tconst,))
+    df_target = df_target.sort_index(axis=1).reset_index(drop=True)
+    return df_target.equals(reference)
+
+
+# The films the notebook checks before publishing (The Matrix, The Big Lebowski
+# and Kill Bill tests). Ratings and votes change with every IMDb refresh, so the
+# expected ones are read from title.ratings (reference_ratings).
+REFERENCE_FILMS = {
+    'tt0133093': {'titleType': 'movie', 'primaryTitle': 'The Matrix', 'startYear': 1999,
+                  'runtimeMinutes': 136, 'main_genre': 'Action', 'other_genres': 'Sci-Fi',
+                  'genres': ('Action', 'Sci-Fi')},
+    'tt0118715': {'titleType': 'movie', 'primaryTitle': 'The Big Lebowski', 'startYear': 1998,
+                  'runtimeMinutes': 117, 'main_genre': 'Comedy', 'other_genres': 'Crime',
+                  'genres': ('Comedy', 'Crime'),
+                  'director_1': 'nm0001054', 'director_2': 'nm0001053',
+                  'nmDirector_1': 'Joel Coen', 'nmDirector_2': 'Ethan Coen'},
+    'tt0266697': {'titleType': 'movie', 'primaryTitle': 'Kill Bill: Vol. 1', 'startYear': 2003,
+                  'runtimeMinutes': 111, 'main_genre': 'Action', 'other_genres': 'Crime, Thriller',
+                  'genres': ('Action', 'Crime', 'Thriller'),
+                  'director_1': 'nm0000233', 'director_2': None,
+                  'nmDirector_1': 'Quentin Tarantino', 'nmDirector_2': None},
+}
+
+# Films whose rating and votes are checked too (as in the notebook)
+RATED_REFERENCE_FILMS = ('tt0118715', 'tt0266697')
+
+
+def reference_ratings(ratings):
+    """Return {tconst: (averageRating, numVotes)} of the rated reference films in title.ratings"""
+    rated = ratings[ratings['tconst'].isin(RATED_REFERENCE_FILMS)]
+    return {tconst: (float(rating), int(votes)) for tconst, rating, votes in
+            zip(rated['tconst'], rated['averageRating'], rated['numVotes'])}
+
+
+def check_reference_films(conn, ratings, table='film_data_legacy'):
+    """
+    Compare the reference films in the database with REFERENCE_FILMS (every genre
+    column of the snapshot included) and ratings (reference_ratings).
+
+    Returns {tconst: description of what differs}; empty when all films match.
+    """
+    genres = [genre for genre, in conn.execute("SELECT genre FROM genre_bits ORDER BY bit")]
+    failures = {}
+    for tconst, reference in REFERENCE_FILMS.items():
+        df_target = pd.read_sql_query(f"SELECT * FROM {table} WHERE tconst = ?", conn,
+                                      params=(tconst,))
+        if df_target.empty:
+            failures[tconst] = "missing"
+            continue
+        row = df_target.iloc[0]
+
+        expected = {column: value for column, value in reference.items() if column != 'genres'}
+        expected.update({genre: int(genre in reference['genres']) for genre in genres})
+        if tconst in RATED_REFERENCE_FILMS:
+            if tconst not in ratings:
+                failures[tconst] = "no rating in title.ratings"
+                continue
+            expected['averageRating'], expected['numVotes'] = ratings[tconst]
+
+        differences = [f"{column}: {row.get(column)!r} != {value!r}"
+                       for column, value in expected.items()
+                       if not (row.get(column) == value or (value is None and pd.isna(row.get(column))))]
+        if differences:
+            failures[tconst] = ', '.join(differences)
+    return failures
+
+
+def _atomic_write_text(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def publish_snapshot(snapshot, db_path, version, version_path=None):
+    """
+    Swap a checked snapshot in as the live database.
+
+    The version is stored in the snapshot and the snapshot is vacuumed, flushed to
+    disk and then renamed over db_path in one atomic step, so a running app sees
+    either the old or the new database, never a half-written file. The version text
+    file follows.
+    """
+    conn = sqlite3.connect(snapshot)
+    write_version(conn, version)
+    # Reclaim the pages freed by the update and by the derived tables that are
+    # rebuilt, so the file does not grow with every refresh
+    conn.execute("VACUUM")
+    conn.close()
+
+    with open(snapshot, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(snapshot, db_path)
+
+    if version_path is not None:
+        _atomic_write_text(version_path, version)
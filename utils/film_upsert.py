@@ -0,0 +1,115 @@
+import pandas as pd
+from utils.film_schema import TCONST_INDEX
+from utils.genres import add_genre_mask, create_genre_tables, write_film_data
+
+#===========================
+# Incremental film update
+#===========================
+
+HASH_TABLE = 'film_data_hashes'
+
+def row_hashes(film_sql):
+    """Return a content hash (int64) of every row, indexed by tconst"""
+    hashes = pd.util.hash_pandas_object(film_sql, index=False).to_numpy().view('int64')
+    return pd.Series(hashes, index=film_sql['tconst'].to_numpy())
+
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _sql_rows(frame):
+    """Return the rows of frame as Python values, with NaN as NULL"""
+    values = frame.astype(object).where(frame.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+def _write_hashes(conn, hashes):
+    conn.execute(f"DROP TABLE IF EXISTS {HASH_TABLE}")
+    conn.execute(f"CREATE TABLE {HASH_TABLE} (tconst TEXT PRIMARY KEY, row_hash INTEGER NOT NULL)")
+    conn.executemany(f"INSERT INTO {HASH_TABLE} (tconst, row_hash) VALUES (?, ?)",
+                     zip(hashes.index.tolist(), hashes.tolist()))
+
+
+def upsert_film_data(conn, film, genres, table='film_data', incremental=True):
+    """
+    Bring film_data in line with film by applying only the differences.
+
+    Rows are matched on tconst and compared on a per-row content hash (kept in
+    film_data_hashes). Inserts, deletes and updates are applied in one transaction.
+    With incremental=False, without a previous build, or when the columns changed,
+    the table is written in full. Returns the counts of what changed, with the
+    mode ('incremental' or 'full') and the reason of a full write.
+    """
+    if 'genre_mask' not in film.columns:
+        film = add_genre_mask(film, genres)
+    film_sql = film.drop(columns=list(genres)).reset_index(drop=True)
+    new_hashes = row_hashes(film_sql)
+
+    columns = list(film_sql.columns)
+    previous_columns = _table_columns(conn, table)
+    if not incremental:
+        reason = 'requested'
+    elif not previous_columns or _table_columns(conn, HASH_TABLE) != ['tconst', 'row_hash']:
+        reason = 'no previous build'
+    elif previous_columns != columns:
+        reason = 'columns changed'
+    else:
+        reason = None
+
+    if reason is not None:
+        write_film_data(conn, film, genres, table=table)
+        with conn:
+            _write_hashes(conn, new_hashes)
+        return {'mode': 'full', 'reason': reason, 'inserted': len(film_sql), 'updated': 0,
+                'deleted': 0, 'unchanged': 0}
+
+    old_hashes = pd.read_sql_query(f"SELECT tconst, row_hash FROM {HASH_TABLE}", conn)
+    old_hashes = pd.Series(old_hashes['row_hash'].to_numpy(), index=old_hashes['tconst'].to_numpy())
+
+    inserted = new_hashes.index.difference(old_hashes.index)
+    deleted = old_hashes.index.difference(new_hashes.index)
+    common = new_hashes.index.intersection(old_hashes.index)
+    changed = common[new_hashes[common].to_numpy() != old_hashes[common].to_numpy()]
+
+    by_tconst = film_sql.set_index('tconst', drop=False)
+    column_list = ', '.join(f'"{c}"' for c in columns)
+    placeholders = ', '.join('?' for _ in columns)
+    assignments = ', '.join(f'"{c}" = ?' for c in columns if c != 'tconst')
+
+    with conn:
+        # Updates and deletes look rows up by tconst
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {TCONST_INDEX} ON {table} (tconst)")
+
+        conn.executemany(f"DELETE FROM {table} WHERE tconst = ?",
+                         ((tconst,) for tconst in deleted))
+        conn.executemany(f"DELETE FROM {HASH_TABLE} WHERE tconst = ?",
+                         ((tconst,) for tconst in deleted))
+
+        conn.executemany(f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})",
+                         _sql_rows(by_tconst.loc[inserted, columns]))
+
+        update_columns = [c for c in columns if c != 'tconst'] + ['tconst']
+        conn.executemany(f"UPDATE {table} SET {assignments} WHERE tconst = ?",
+                         _sql_rows(by_tconst.loc[changed, update_columns]))
+
+        written = new_hashes.loc[inserted.append(changed)]
+        conn.executemany(f"INSERT OR REPLACE INTO {HASH_TABLE} (tconst, row_hash) VALUES (?, ?)",
+                         zip(written.index.tolist(), written.tolist()))
+
+    # Tiny tables, always rewritten (the genre bits may have changed)
+    create_genre_tables(conn, genres, table=table)
+
+    return {'mode': 'incremental', 'reason': None, 'inserted': len(inserted),
+            'updated': len(changed), 'deleted': len(deleted),
+            'unchanged': len(common) - len(changed)}
+
+
+def upsert_summary(counts):
+    """One line on what upsert_film_data did, with the reason of a full write"""
+    summary = (f"{counts['mode'].capitalize()} update: {counts['inserted']} inserted, "
+               f"{counts['updated']} updated, {counts['deleted']} deleted, "
+               f"{counts['unchanged']} unchanged.")
+    if counts['reason'] is not None:
+        summary += f" (full write: {counts['reason']})"
+    return summary
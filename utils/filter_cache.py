@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+import streamlit as st
+
+#=========================
+# Filter result cache
+#=========================
+
+def filter_cache_key(selected_years,
+                     selected_time,
+                     selected_rating,
+                     selected_votes,
+                     genre_tag,
+                     main_genre,
+                     operator,
+                     genre_selection,
+                     sort_column,
+                     top_n,
+                     sort_ascending=False):
+    """
+    Return the canonical form of a Film Chooser filter state.
+
+    Filter states that select the same films map to the same key: the genre
+    selection is sorted, and the main genre, genres and operator are only part of
+    the key when they are actually applied.
+    """
+    genres_applied = genre_tag != 0 and bool(genre_selection)
+    return (
+        (int(selected_years[0]), int(selected_years[1])),
+        (int(selected_time[0]), int(selected_time[1])),
+        (round(float(selected_rating[0]), 1), round(float(selected_rating[1]), 1)),
+        int(selected_votes),
+        main_genre if genre_tag == 2 else None,
+        tuple(sorted(set(genre_selection))) if genres_applied else (),
+        operator if genres_applied else None,
+        sort_column,
+        "ASC" if sort_ascending else "DESC",
+        top_n,
+    )
+
+
+class FilterResultCache:
+    """
+    Bounded LRU cache of filter results, shared by all sessions.
+
+    Every entry belongs to a data version; when the version changes the whole
+    cache is dropped. Cached results are shared, so callers must not modify them.
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, version, compute):
+        """Return the cached result for key, or compute and store it"""
+        with self._lock:
+            if version != self.version:
+                if self.version is not None:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.version = version
+
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        # Compute outside the lock, so other sessions are not blocked
+        result = compute()
+
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+#=========================
+# Shared (per process)
+#=========================
+
+@st.cache_resource
+def get_filter_cache(maxsize=128):
+    """Return the filter result cache shared by all sessions"""
+    return FilterResultCache(maxsize)
@@ -0,0 +1,97 @@
+import time
+import numpy as np
+import pandas as pd
+from utils.genres import genre_bits
+
+#=========================
+# Genre encoding
+#=========================
+
+# IMDb lists at most three genres per title
+GENRES_PER_FILM = 3
+
+def encode_genres(film, genres_per_film=GENRES_PER_FILM):
+    """
+    Replace the comma separated genres column of film with its encoded features.
+
+    One vectorized pass builds main_genre (first genre), the boolean genre columns
+    (alphabetical), other_genres (second and third genre, ', ' separated) and the
+    genre_mask bitmask. Returns the new DataFrame and the ordered genre columns.
+    """
+    split = film['genres'].str.split(pat=",", expand=True)
+    split = split.reindex(columns=range(genres_per_film))
+
+    # All genres that occur, in alphabetical order (the order of pd.get_dummies)
+    present = pd.unique(split.to_numpy().ravel())
+    genres = sorted(g for g in present if isinstance(g, str) and g != 'None')
+    bits = genre_bits(genres)
+
+    # OR the bit of every listed genre into the mask
+    mask = np.zeros(len(film), dtype=np.int64)
+    for position in range(genres_per_film):
+        codes = pd.Categorical(split[position], categories=genres).codes.astype(np.int64)
+        listed = codes >= 0
+        mask[listed] |= np.left_shift(1, codes[listed])
+
+    second, third = split[1], split[2]
+    other_genres = second.where(third.isna(), second + ', ' + third)
+
+    encoded = {'main_genre': split[0]}
+    encoded.update({genre: (mask >> bit) & 1 == 1 for genre, bit in bits.items()})
+    encoded['other_genres'] = other_genres
+    encoded['genre_mask'] = mask
+
+    film = pd.concat([film.drop(columns='genres'),
+                      pd.DataFrame(encoded, index=film.index)], axis=1)
+    return film, genres
+
+
+def encode_genres_legacy(film):
+    """The original notebook steps (stack/get_dummies and a row-wise apply), for comparison"""
+    genres_split = film['genres'].str.split(pat=",", expand=True)
+    genres_split.columns = [f'genre_{i+1}' for i in range(genres_split.shape[1])]
+    film = pd.concat([film, genres_split], axis=1)
+
+    stacked = film[['genre_1', 'genre_2', 'genre_3']].stack()
+    dummies = pd.get_dummies(stacked).groupby(level=0).max()
+    dummies = dummies.drop(columns='None', errors='ignore')
+    film = pd.concat([film, dummies], axis=1)
+
+    film = film.rename(columns={"genre_1": "main_genre"})
+    film['other_genres'] = film.apply(
+        lambda row: ', '.join(
+            str(val) for val in [row['genre_2'], row['genre_3']] if pd.notnull(val)
+        ) if pd.notnull(row['genre_2']) or pd.notnull(row['genre_3']) else None,
+        axis=1
+    )
+
+    film = film.drop(columns=['genres', 'genre_2', 'genre_3'])
+    return film, list(dummies.columns)
+
+
+def compare_genre_encoding(film):
+    """
+    Time the legacy and the vectorized genre encoding on the same films.
+
+    Returns a dict with both timings (seconds), the speed-up and whether the
+    vectorized result equals the legacy one (apart from the extra genre_mask).
+    """
+    start = time.perf_counter()
+    legacy, _ = encode_genres_legacy(film)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized, _ = encode_genres(film)
+    vectorized_seconds = time.perf_counter() - start
+
+    vectorized = vectorized.drop(columns='genre_mask')
+    same = (list(legacy.columns) == list(vectorized.columns)
+            and legacy.astype(object).equals(vectorized.astype(object)))
+
+    return {
+        'films': len(film),
+        'legacy_seconds': legacy_seconds,
+        'vectorized_seconds': vectorized_seconds,
+        'speedup': legacy_seconds / vectorized_seconds if vectorized_seconds else float('inf'),
+        'identical': same,
+    }
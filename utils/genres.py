@@ -0,0 +1,79 @@
+#==================
+# Genre bitmask
+#==================
+
+# Every film stores its genres as one integer: bit i is set when the film has
+# genre i of the genre_bits lookup table. 31 bits keep the mask a positive 32-bit int.
+MAX_GENRES = 31
+
+LEGACY_VIEW = 'film_data_legacy'
+
+def genre_bits(genres):
+    """Return the genre -> bit lookup for an ordered list of genres"""
+    genres = list(genres)
+    if len(genres) > MAX_GENRES:
+        raise ValueError(f"At most {MAX_GENRES} genres fit in the genre mask, got {len(genres)}")
+    return {genre: bit for bit, genre in enumerate(genres)}
+
+
+def genre_mask(selection, bits):
+    """Return the bitmask of a selection of genres"""
+    mask = 0
+    for genre in selection:
+        mask |= 1 << bits[genre]
+    return mask
+
+
+def add_genre_mask(film, genres):
+    """Return film with a genre_mask column computed from its boolean genre columns"""
+    film = film.copy()
+    mask = 0
+    for bit, genre in enumerate(genres):
+        mask = mask + film[genre].astype('int64') * (1 << bit)
+    film['genre_mask'] = mask
+    return film
+
+#============================
+# Genre tables in SQLite
+#============================
+
+def load_genre_bits(conn):
+    """Return the genre -> bit lookup stored in the database, ordered by bit"""
+    rows = conn.execute("SELECT genre, bit FROM genre_bits ORDER BY bit").fetchall()
+    return {genre: bit for genre, bit in rows}
+
+
+def create_genre_tables(conn, genres, table='film_data'):
+    """
+    Write the genre_bits lookup table and the film_data_legacy compatibility view.
+
+    The view has the original film_data layout: the boolean genre columns are
+    unpacked from genre_mask and placed right after main_genre.
+    """
+    bits = genre_bits(genres)
+
+    conn.execute("DROP TABLE IF EXISTS genre_bits")
+    conn.execute("CREATE TABLE genre_bits (genre TEXT PRIMARY KEY, bit INTEGER NOT NULL UNIQUE)")
+    conn.executemany("INSERT INTO genre_bits (genre, bit) VALUES (?, ?)", bits.items())
+
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    select_list = []
+    for column in columns:
+        if column == 'genre_mask':
+            continue
+        select_list.append(f'"{column}"')
+        if column == 'main_genre':
+            select_list += [f'(genre_mask >> {bit}) & 1 AS "{genre}"' for genre, bit in bits.items()]
+
+    conn.execute(f"DROP VIEW IF EXISTS {LEGACY_VIEW}")
+    conn.execute(f"CREATE VIEW {LEGACY_VIEW} AS SELECT {', '.join(select_list)} FROM {table}")
+    conn.commit()
+
+
+def write_film_data(conn, film, genres, table='film_data'):
+    """Write film to SQLite with a genre_mask column instead of the boolean genre columns"""
+    if 'genre_mask' not in film.columns:
+        film = add_genre_mask(film, genres)
+    film_sql = film.drop(columns=list(genres))
+    film_sql.to_sql(table, conn, if_exists='replace', index=False)
+    create_genre_tables(conn, genres, table=table)
@@ -0,0 +1,343 @@
+"""
+Build the film database from the IMDb datasets, headless.
+
+The four IMDb files are downloaded, parsed and pre-filtered at the same time in a
+process pool (the workers only send back the rows of the films), joined into
+film_data and published as a new database snapshot.
+Run from the root of the repository:
+
+    python -m utils.imdb_pipeline --directory imdb_data
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from multiprocessing import Manager
+import numpy as np
+import pandas as pd
+from utils.facets import write_facet_cube
+from utils.film_db import FILM_DB_PATH, FILM_DATA_VERSION_PATH
+from utils.film_features import write_film_features
+from utils.film_neighbors import write_film_neighbors, NEIGHBORS
+from utils.film_search import write_film_search
+from utils.film_engine import FilmEngine, check_engine_against_sqlite
+from utils.film_schema import create_film_indexes, check_chooser_query_plans, chooser_plan_cases
+from utils.film_snapshot import (start_snapshot, publish_snapshot, check_reference_films,
+                                 reference_ratings)
+from utils.film_upsert import upsert_film_data, upsert_summary
+from utils.genre_encoding import encode_genres
+from utils.imdb_reader import (download_imdb_file, read_title_basics, read_title_crew,
+                               read_name_basics, read_title_ratings)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Defaults of the notebook parameters
+MIN_YEAR = 1940
+MIN_RUNTIME = 45
+MAX_RUNTIME = 300
+
+IMDB_FILES = ('title.basics', 'title.crew', 'name.basics', 'title.ratings')
+
+# Files that are cut down to the films in their worker (by the key column) before
+# they are sent back, and the file whose rows give the keys
+FILM_FILTERED_FILES = {'title.crew': ('tconst', 'title.basics'),
+                       'name.basics': ('nconst', 'title.crew')}
+
+#=====================
+# Timings and memory
+#=====================
+
+def peak_memory_mib(children=False):
+    """Return the peak resident memory (MiB) of this process or of its children"""
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+class StageTimer:
+    """Records the wall time and the peak memory after every pipeline stage"""
+    def __init__(self):
+        self.stages = []
+
+    def record(self, name, seconds, peak_mib):
+        self.stages.append((name, seconds, peak_mib))
+        peak = f"{peak_mib:,.0f} MiB" if peak_mib is not None else "n/a"
+        print(f"⏱️ {name:<36} {seconds:8.2f} s | peak memory {peak}")
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        yield
+        self.record(name, time.perf_counter() - start, peak_memory_mib())
+
+    def report(self, total_seconds):
+        """Print the total wall time and the peak memory of the main process and the workers"""
+        main, workers = peak_memory_mib(), peak_memory_mib(children=True)
+        main = f"{main:,.0f} MiB" if main is not None else "n/a"
+        workers = f"{workers:,.0f} MiB" if workers else "n/a"
+        print(f"✅ Pipeline finished in {total_seconds:.2f} s | peak memory: main process "
+              f"{main}, largest worker {workers}")
+
+#=====================
+# Parse (in parallel)
+#=====================
+
+def load_imdb_file(file_name, directory, min_year, max_year, min_runtime, max_runtime,
+                   keys=None):
+    """
+    Download (if needed) and parse one IMDb file with its pre-filter.
+
+    Runs in a worker process. For the FILM_FILTERED_FILES, the worker then waits
+    for the keys of the films (a list from the keys queue) and only sends those
+    rows back. Returns (file_name, frame, seconds of parsing, peak memory of the
+    worker in MiB).
+    """
+    start = time.perf_counter()
+    gz_file = download_imdb_file(file_name, directory)
+
+    if file_name == 'title.basics':
+        frame = read_title_basics(gz_file, min_year, max_year, min_runtime, max_runtime)
+    elif file_name == 'title.crew':
+        frame = read_title_crew(gz_file)
+    elif file_name == 'name.basics':
+        frame = read_name_basics(gz_file)
+    elif file_name == 'title.ratings':
+        frame = read_title_ratings(gz_file)
+    else:
+        raise ValueError(f"Unknown IMDb file: {file_name}")
+    seconds = time.perf_counter() - start
+
+    if keys is not None:
+        wanted = keys.get()
+        if wanted is None:  # the pipeline failed
+            return file_name, None, seconds, peak_memory_mib()
+        key = FILM_FILTERED_FILES[file_name][0]
+        frame = frame[frame[key].isin(wanted)].reset_index(drop=True)
+
+    return file_name, frame, seconds, peak_memory_mib()
+
+
+def film_keys(file_name, frame):
+    """The keys in frame (a parsed IMDb file) that the films need from file_name"""
+    if file_name == 'title.crew':
+        return frame['tconst'].tolist()
+    return pd.concat([frame['director_1'], frame['director_2']]).dropna().unique().tolist()
+
+
+def load_imdb_files(directory, min_year, max_year, min_runtime, max_runtime, timer,
+                    workers=len(IMDB_FILES)):
+    """
+    Parse the four IMDb files at the same time and return them by file name.
+
+    title.crew and name.basics are parsed in full in their workers, but only the
+    rows of the films are sent back: the crew of the title.basics films, then the
+    names of their directors. So the main process never holds the whole files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    frames = {}
+    with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as pool:
+        queues = {file_name: manager.Queue() for file_name in FILM_FILTERED_FILES}
+        # title.basics first: with fewer workers than files, the workers that wait
+        # for keys only start after the files that give them
+        futures = [pool.submit(load_imdb_file, file_name, directory, min_year, max_year,
+                               min_runtime, max_runtime, queues.get(file_name))
+                   for file_name in IMDB_FILES]
+        try:
+            for future in futures:
+                file_name, frame, seconds, peak_mib = future.result()
+                frames[file_name] = frame
+                timer.record(f"parse {file_name} ({len(frame):,} rows)", seconds, peak_mib)
+                for filtered, (_, source) in FILM_FILTERED_FILES.items():
+                    if source == file_name:
+                        queues[filtered].put(film_keys(filtered, frame))
+        except BaseException:
+            # Workers that still wait for their keys stop without them
+            for queue in queues.values():
+                queue.put(None)
+            raise
+    return frames
+
+#=====================
+# Join
+#=====================
+
+def join_film_data(film, crew, names, ratings):
+    """
+    Join the pre-filtered IMDb frames into film_data, like the notebook does.
+
+    Returns the films (with boolean genre columns and genre_mask) and the ordered
+    genre columns.
+    """
+    film = film.astype({'startYear': 'int', 'runtimeMinutes': 'int'})
+    film, genres = encode_genres(film)
+    film = film.reset_index(drop=True)
+
+    film = film.merge(crew, how='left', on='tconst')
+
+    director_names = names.set_index('nconst')['primaryName']
+    film['nmDirector_1'] = film['director_1'].map(director_names)
+    film['nmDirector_2'] = film['director_2'].map(director_names)
+
+    # Films without a rating are dropped
+    film = film.merge(ratings, how='inner', on='tconst')
+    film = film.astype({'numVotes': 'int'})
+
+    film = film.replace({None: np.nan}).reset_index(drop=True)
+    return film, genres
+
+#=====================
+# Write and publish
+#=====================
+
+def check_snapshot(conn, reference_ratings=None):
+    """
+    Run the checks of the notebook on a snapshot: the Film Chooser query plans,
+    the reference films (when reference_ratings is given) and the engine against
+    SQLite. Raises RuntimeError at the first check that fails.
+    """
+    plan_failures = check_chooser_query_plans(conn)
+    if plan_failures:
+        for description, plan in plan_failures.items():
+            print(f"❌ {description}: {plan}")
+        raise RuntimeError("Film Chooser queries do not use the indexes!")
+    print("✅ Query plan test passed: every Film Chooser query uses an index.")
+
+    if reference_ratings is not None:
+        reference_failures = check_reference_films(conn, reference_ratings)
+        if reference_failures:
+            for tconst, description in reference_failures.items():
+                print(f"❌ {tconst}: {description}")
+            raise RuntimeError("Reference films are inconsistent with the reference!")
+        print("✅ Reference tests passed: The Matrix, The Big Lebowski and Kill Bill.")
+
+    engine_mismatches = check_engine_against_sqlite(conn, FilmEngine.from_connection(conn),
+                                                    chooser_plan_cases())
+    if engine_mismatches:
+        print(f"❌ Different results for: {engine_mismatches}")
+        raise RuntimeError("Film Chooser engine is inconsistent with SQLite!")
+    print("✅ Engine test passed: engine results are identical to SQLite.")
+
+
+def write_film_database(film, genres, db_path, version, version_path, timer,
+                        incremental=True, neighbors=NEIGHBORS, neighbor_workers=None,
+                        reference_ratings=None):
+    """
+    Build a snapshot with film and everything derived from it (indexes, facet
+    cube, search tables, feature vectors, neighbour table), check it and publish
+    it as db_path. The snapshot is checked before the derived tables are built
+    (reference_ratings: see check_snapshot) and removed when any stage fails.
+    """
+    snapshot = start_snapshot(db_path, incremental=incremental)
+    try:
+        conn = sqlite3.connect(snapshot)
+        try:
+            with timer.stage("write film_data"):
+                counts = upsert_film_data(conn, film, genres, incremental=incremental)
+            if incremental and counts['mode'] == 'full':
+                print(f"⚠️ WARNING: film_data was written in full ({counts['reason']}).")
+            print(f"✅ {upsert_summary(counts)}")
+
+            with timer.stage("indexes"):
+                create_film_indexes(conn)
+
+            with timer.stage("checks"):
+                check_snapshot(conn, reference_ratings)
+
+            with timer.stage("facet counts"):
+                cells = write_facet_cube(conn)
+            print(f"✅ Facet cube: {cells:,} cells.")
+
+            with timer.stage("search index"):
+                write_film_search(conn)
+
+            with timer.stage("feature vectors"):
+                films, features = write_film_features(conn)
+            print(f"✅ Feature vectors: {films:,} films x {features} features.")
+
+            with timer.stage("neighbours"):
+                write_film_neighbors(conn, k=neighbors, workers=neighbor_workers)
+            print(f"✅ Neighbour table: top {neighbors} similar films per film.")
+        finally:
+            conn.close()
+    except BaseException:
+        # Never leave a half-built snapshot behind
+        if os.path.exists(snapshot):
+            os.remove(snapshot)
+        raise
+
+    with timer.stage("publish"):
+        publish_snapshot(snapshot, db_path, version, version_path=version_path)
+    print(f"✅ Published film data version {version} to {db_path}.")
+
+#=====================
+# Command line
+#=====================
+
+def parse_args(argv=None):
+    now = datetime.now()
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.imdb_pipeline",
+        description="Build film_database.db from the IMDb datasets.")
+    parser.add_argument("--directory", default=".",
+                        help="where the .tsv.gz files are downloaded to (default: .)")
+    parser.add_argument("--db", default=FILM_DB_PATH,
+                        help=f"database to publish (default: {FILM_DB_PATH})")
+    parser.add_argument("--version-file", default=FILM_DATA_VERSION_PATH,
+                        help=f"data version text file (default: {FILM_DATA_VERSION_PATH})")
+    parser.add_argument("--version", default=f"{now.day} {now:%B %Y}",
+                        help="data version shown in the app (default: today)")
+    parser.add_argument("--min-year", type=int, default=MIN_YEAR)
+    parser.add_argument("--max-year", type=int, default=now.year)
+    parser.add_argument("--min-runtime", type=int, default=MIN_RUNTIME)
+    parser.add_argument("--max-runtime", type=int, default=MAX_RUNTIME)
+    parser.add_argument("--workers", type=int, default=len(IMDB_FILES),
+                        help="worker processes for parsing (default: one per file)")
+    parser.add_argument("--neighbors", type=int, default=NEIGHBORS,
+                        help=f"similar films stored per film (default: {NEIGHBORS})")
+    parser.add_argument("--neighbor-workers", type=int, default=None,
+                        help="worker processes for the neighbour table (default: one per CPU)")
+    parser.add_argument("--full", action="store_true",
+                        help="rewrite film_data instead of an incremental update")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="parse and join only, do not write the database")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    timer = StageTimer()
+    start = time.perf_counter()
+
+    frames = load_imdb_files(args.directory, args.min_year, args.max_year,
+                             args.min_runtime, args.max_runtime, timer,
+                             workers=args.workers)
+
+    # Expected rating and votes of the reference films, before the join
+    ratings = reference_ratings(frames['title.ratings'])
+
+    with timer.stage("join"):
+        film, genres = join_film_data(frames.pop('title.basics'), frames.pop('title.crew'),
+                                      frames.pop('name.basics'), frames.pop('title.ratings'))
+    print(f"✅ Joined {len(film):,} films with {len(genres)} genres.")
+
+    if not args.dry_run:
+        write_film_database(film, genres, args.db, args.version, args.version_file, timer,
+                            incremental=not args.full, neighbors=args.neighbors,
+                            neighbor_workers=args.neighbor_workers,
+                            reference_ratings=ratings)
+
+    timer.report(time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
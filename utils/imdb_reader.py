@@ -0,0 +1,138 @@
+import gzip
+import os
+import urllib.request
+import pandas as pd
+
+#=====================
+# IMDb dataset files
+#=====================
+
+IMDB_BASE_URL = "https://datasets.imdbws.com/"
+
+# Rows parsed per chunk; peak memory of a read is about one chunk plus the kept rows
+CHUNKSIZE = 250_000
+
+def download_imdb_file(file_name, directory="."):
+    """
+    Download an IMDb dataset (e.g. 'title.basics') from https://datasets.imdbws.com/
+    unless it is already there, and return the path of the .tsv.gz file.
+    """
+    gz_file = os.path.join(directory, f"{file_name}.tsv.gz")
+
+    if not os.path.exists(gz_file):
+        print(f"📥 Downloading {file_name}.tsv.gz...")
+        urllib.request.urlretrieve(IMDB_BASE_URL + f"{file_name}.tsv.gz", gz_file)
+    else:
+        print(f"✅ {file_name}.tsv.gz already exists, skipping download.")
+
+    return gz_file
+
+
+def read_imdb_file(gz_file, usecols=None, dtype=None, chunk_filter=None, chunksize=CHUNKSIZE):
+    """
+    Stream a .tsv.gz IMDb file in chunks and return the kept rows as one DataFrame.
+
+    chunk_filter(chunk) returns the part of a chunk to keep; it runs on every chunk
+    as soon as it is parsed, so rows that are thrown away never pile up in memory.
+    """
+    kept = []
+    with gzip.open(gz_file, 'rt', encoding='utf-8') as f:
+        reader = pd.read_csv(f, sep='\t', usecols=usecols, dtype=dtype, na_values='\\N',
+                             chunksize=chunksize)
+        for chunk in reader:
+            if chunk_filter is not None:
+                chunk = chunk_filter(chunk)
+            if len(chunk):
+                kept.append(chunk)
+
+    if not kept:
+        return pd.DataFrame(columns=usecols)
+
+    return pd.concat(kept, ignore_index=True)
+
+#=====================
+# title.basics
+#=====================
+
+TITLE_BASICS_COLUMNS = ['tconst', 'titleType', 'primaryTitle', 'startYear', 'runtimeMinutes',
+                        'genres']
+
+def title_basics_filter(min_year, max_year, min_runtime, max_runtime):
+    """
+    Return the chunk filter of title.basics: movies with a year between min_year and
+    max_year, a runtime between min_runtime and max_runtime and at least one genre.
+    Years and runtimes come out as int16.
+    """
+    def keep_films(chunk):
+        chunk = chunk[(chunk['titleType'] == 'movie') & chunk['genres'].notna()]
+
+        # Malformed values become NaN and are dropped with the missing ones
+        start_year = pd.to_numeric(chunk['startYear'], errors='coerce')
+        runtime = pd.to_numeric(chunk['runtimeMinutes'], errors='coerce')
+        keep = (start_year.between(min_year, max_year)
+                & runtime.between(min_runtime, max_runtime))
+
+        chunk = chunk[keep].copy()
+        chunk['titleType'] = chunk['titleType'].astype(str)
+        chunk['startYear'] = start_year[keep].astype('int16')
+        chunk['runtimeMinutes'] = runtime[keep].astype('int16')
+        return chunk
+
+    return keep_films
+
+
+def read_title_basics(gz_file, min_year, max_year, min_runtime, max_runtime,
+                      chunksize=CHUNKSIZE):
+    """Stream title.basics and return only the films that pass the pipeline filters"""
+    # Parse the low-cardinality type column as a category; the rest stays text until filtered
+    dtype = {'tconst': str, 'titleType': 'category', 'primaryTitle': str,
+             'startYear': str, 'runtimeMinutes': str, 'genres': str}
+    return read_imdb_file(gz_file, usecols=TITLE_BASICS_COLUMNS, dtype=dtype,
+                          chunk_filter=title_basics_filter(min_year, max_year,
+                                                           min_runtime, max_runtime),
+                          chunksize=chunksize)
+
+#=====================
+# title.crew
+#=====================
+
+# Directors kept per film (director_1 and director_2)
+DIRECTORS_PER_FILM = 2
+
+def title_crew_filter(chunk):
+    """Keep titles (tt...) with a director and split directors into director_1 and director_2"""
+    chunk = chunk[chunk['tconst'].str.startswith('tt') & chunk['directors'].notna()]
+    directors = chunk['directors'].str.split(pat=",", n=DIRECTORS_PER_FILM, expand=True)
+    directors = directors.reindex(columns=range(DIRECTORS_PER_FILM))
+    return pd.DataFrame({
+        'tconst': chunk['tconst'],
+        'director_1': directors[0],
+        'director_2': directors[1],
+    })
+
+
+def read_title_crew(gz_file, chunksize=CHUNKSIZE):
+    """Stream title.crew and return tconst with the first two directors"""
+    return read_imdb_file(gz_file, usecols=['tconst', 'directors'], dtype=str,
+                          chunk_filter=title_crew_filter, chunksize=chunksize)
+
+#=====================
+# name.basics
+#=====================
+
+def read_name_basics(gz_file, chunksize=CHUNKSIZE):
+    """Stream name.basics and return only nconst and primaryName"""
+    return read_imdb_file(gz_file, usecols=['nconst', 'primaryName'], dtype=str,
+                          chunksize=chunksize)
+
+#=====================
+# title.ratings
+#=====================
+
+def read_title_ratings(gz_file, chunksize=CHUNKSIZE):
+    """Stream title.ratings and return the rated titles"""
+    dtype = {'tconst': str, 'averageRating': 'float64', 'numVotes': 'Int64'}
+    return read_imdb_file(gz_file, usecols=['tconst', 'averageRating', 'numVotes'],
+                          dtype=dtype,
+                          chunk_filter=lambda chunk: chunk.dropna(),
+                          chunksize=chunksize)
@@ -0,0 +1,285 @@
+"""
+Write synthetic IMDb datasets for offline tests and benchmarks.
+
+The files have the layout of https://datasets.imdbws.com/ (title.basics,
+title.crew, name.basics and title.ratings as .tsv.gz) with IMDb-like
+distributions, and are reproducible for a given seed. Run from the root of the
+repository:
+
+    python -m utils.imdb_synthetic --titles 1000000 --directory synthetic_imdb --db /tmp/film_database.db
+"""
+import argparse
+import gzip
+import os
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+#=====================
+# Distributions
+#=====================
+
+# Share of every title type (IMDb: mostly episodes, about 7% movies)
+TITLE_TYPES = {
+    'tvEpisode': 0.70, 'short': 0.09, 'movie': 0.07, 'video': 0.03, 'tvSeries': 0.03,
+    'tvMovie': 0.015, 'tvMiniSeries': 0.006, 'tvSpecial': 0.005, 'videoGame': 0.004,
+}
+
+# Relative frequency of every genre (alphabetical, like IMDb lists them)
+GENRE_WEIGHTS = {
+    'Action': 0.10, 'Adult': 0.02, 'Adventure': 0.05, 'Animation': 0.03,
+    'Biography': 0.04, 'Comedy': 0.25, 'Crime': 0.09, 'Documentary': 0.15,
+    'Drama': 0.45, 'Family': 0.05, 'Fantasy': 0.04, 'Film-Noir': 0.003,
+    'Game-Show': 0.002, 'History': 0.04, 'Horror': 0.08, 'Music': 0.04,
+    'Musical': 0.02, 'Mystery': 0.05, 'News': 0.01, 'Reality-TV': 0.005,
+    'Romance': 0.10, 'Sci-Fi': 0.03, 'Sport': 0.02, 'Talk-Show': 0.003,
+    'Thriller': 0.10, 'War': 0.03, 'Western': 0.02,
+}
+
+# Chance of 1, 2 or 3 genres
+GENRE_COUNTS = (0.50, 0.25, 0.25)
+
+# Chance of 0, 1, 2 or 3 directors
+DIRECTOR_COUNTS = (0.15, 0.75, 0.07, 0.03)
+
+TITLE_ADJECTIVES = np.array([
+    'Last', 'Dark', 'Silent', 'Lost', 'Broken', 'Golden', 'Hidden', 'Final', 'Wild',
+    'Eternal', 'Little', 'Secret', 'Red', 'Blue', 'Bitter', 'Sweet', 'Crazy', 'Perfect',
+    'Fabuleux', 'Étrange', 'Última', 'Schöne', 'Dernière', 'Pequeño'])
+TITLE_NOUNS = np.array([
+    'Night', 'City', 'River', 'Dream', 'Road', 'Heart', 'House', 'Shadow', 'Kingdom',
+    'Summer', 'Stranger', 'Mirror', 'Garden', 'Storm', 'Journey', 'Promise', 'Game',
+    'Island', 'Café', 'Amélie', 'Señor', 'Mädchen', 'Déjà Vu', 'Fiancée', 'Noël'])
+FIRST_NAMES = np.array([
+    'John', 'Mary', 'Akira', 'Agnès', 'Pedro', 'Sofia', 'Ingmar', 'Wong', 'Céline',
+    'Jean-Luc', 'Hayao', 'Greta', 'Spike', 'Chloé', 'Bong', 'Zoë', 'Andrei', 'Lynne',
+    'Federico', 'Satyajit', 'Ana', 'Joel', 'Kathryn', 'José'])
+LAST_NAMES = np.array([
+    'Smith', 'Kurosawa', 'Varda', 'Almodóvar', 'Bergman', 'Kar-wai', 'Godard',
+    'Miyazaki', 'Gerwig', 'Lee', 'Zhao', 'Joon-ho', 'Tarkovsky', 'Ramsay', 'Fellini',
+    'Ray', 'Müller', 'Coen', 'Bigelow', 'Núñez', 'Sciamma', 'Campion', 'Östlund'])
+
+def _ids(prefix, numbers):
+    """IMDb identifiers (tt0000001, nm0000001, ...) for an array of numbers"""
+    return prefix + pd.Series(numbers).astype(str).str.zfill(7)
+
+
+def _words(rng, words, n):
+    return pd.Series(rng.choice(words, size=n))
+
+#=====================
+# Titles
+#=====================
+
+def _genres(rng, n):
+    """Comma separated genres (1 to 3, weighted, alphabetical) or None"""
+    names = np.array(list(GENRE_WEIGHTS) + [''])
+    weights = np.array(list(GENRE_WEIGHTS.values()))
+
+    # Weighted sampling without replacement: the top keys of log(w) + Gumbel noise
+    keys = np.log(weights) + rng.gumbel(size=(n, len(weights)))
+    picks = np.argsort(-keys, axis=1)[:, :len(GENRE_COUNTS)]
+    counts = rng.choice(len(GENRE_COUNTS), size=n, p=GENRE_COUNTS) + 1
+    picks[np.arange(len(GENRE_COUNTS)) >= counts[:, None]] = len(weights)
+    picks.sort(axis=1)
+
+    first, second, third = (pd.Series(names[picks[:, i]]) for i in range(3))
+    genres = first + np.where(second != '', ',' + second, '') + np.where(third != '', ',' + third, '')
+    return genres.where(rng.random(n) >= 0.05)
+
+
+def _title_chunk(rng, first_id, n):
+    """One chunk of title.basics rows, and which of them are movies"""
+    this_year = datetime.now().year
+    tconst = _ids('tt', np.arange(first_id, first_id + n))
+
+    title_type = rng.choice(list(TITLE_TYPES), size=n,
+                            p=np.array(list(TITLE_TYPES.values())) / sum(TITLE_TYPES.values()))
+    movie = title_type == 'movie'
+
+    # Titles: "Noun", "The Adjective Noun" or "Noun of the Noun", some with a sequel number
+    nouns, adjectives, others = (_words(rng, TITLE_NOUNS, n), _words(rng, TITLE_ADJECTIVES, n),
+                                 _words(rng, TITLE_NOUNS, n))
+    pattern = rng.integers(0, 3, size=n)
+    title = nouns.where(pattern == 0, 'The ' + adjectives + ' ' + nouns)
+    title = title.where(pattern != 2, nouns + ' of the ' + others)
+    title = title.where(rng.random(n) >= 0.03, title + ' II')
+
+    # Most titles are recent; a few are announced for the coming years
+    start_year = this_year - np.floor(rng.exponential(18, size=n)).astype(np.int64)
+    start_year = np.where(rng.random(n) < 0.005, this_year + rng.integers(1, 4, size=n),
+                          np.maximum(start_year, 1894))
+    start_year = pd.Series(start_year).where(rng.random(n) >= 0.08)
+
+    median_runtime = np.select([movie, title_type == 'short', title_type == 'tvEpisode'],
+                               [92, 12, 30], 60)
+    spread = np.where(movie, 0.25, 0.5)
+    runtime = np.clip(np.round(median_runtime * np.exp(rng.normal(0, spread))), 1, 1000)
+    runtime = pd.Series(runtime.astype(np.int64)).where(rng.random(n) >= np.where(movie, 0.2, 0.35))
+
+    basics = pd.DataFrame({
+        'tconst': tconst,
+        'titleType': title_type,
+        'primaryTitle': title,
+        'originalTitle': title,
+        'isAdult': 0,
+        'startYear': start_year.astype('Int64'),
+        'endYear': pd.Series(pd.NA, index=range(n), dtype='Int64'),
+        'runtimeMinutes': runtime.astype('Int64'),
+        'genres': _genres(rng, n),
+    })
+    basics.loc[basics['genres'].str.contains('Adult', na=False), 'isAdult'] = 1
+    return basics, movie
+
+
+def _crew_chunk(rng, tconst, directors):
+    """title.crew rows: directors drawn from the first names, prolific ones more often"""
+    n = len(tconst)
+    counts = rng.choice(len(DIRECTOR_COUNTS), size=n, p=DIRECTOR_COUNTS)
+    columns = []
+    for position in range(1, len(DIRECTOR_COUNTS)):
+        number = np.floor(directors * rng.random(n) ** 2.5).astype(np.int64) + 1
+        director = _ids('nm', number)
+        columns.append(director.where(counts >= position))
+
+    crew = columns[0]
+    for director in columns[1:]:
+        crew = crew.where(director.isna(), crew + ',' + director)
+    return pd.DataFrame({'tconst': tconst, 'directors': crew,
+                         'writers': pd.Series(None, index=crew.index, dtype=object)})
+
+
+def _ratings_chunk(rng, tconst, movie):
+    """title.ratings rows: about half of the movies and an eighth of the rest are rated"""
+    n = len(tconst)
+    rated = rng.random(n) < np.where(movie, 0.45, 0.12)
+
+    rating = np.clip(rng.normal(np.where(movie, 6.1, 7.0), 1.2), 1.0, 10.0).round(1)
+    # Heavy tailed votes: a median of ~150 for movies, a few with millions
+    votes = np.exp(rng.normal(np.where(movie, 5.0, 3.0), np.where(movie, 2.6, 1.8)))
+    votes = np.clip(np.floor(votes), 5, 3_000_000).astype(np.int64)
+
+    return pd.DataFrame({'tconst': tconst, 'averageRating': rating,
+                         'numVotes': votes})[rated]
+
+#=====================
+# Names
+#=====================
+
+def _name_chunk(rng, first_id, n):
+    """One chunk of name.basics rows"""
+    nconst = _ids('nm', np.arange(first_id, first_id + n))
+    name = _words(rng, FIRST_NAMES, n) + ' ' + _words(rng, LAST_NAMES, n)
+    # Make names unique enough to tell directors apart
+    name = name.where(rng.random(n) >= 0.5, name + ' ' + pd.Series(rng.integers(2, 99, n)).astype(str))
+    birth_year = pd.Series(rng.integers(1880, 2005, size=n)).where(rng.random(n) >= 0.6)
+    return pd.DataFrame({
+        'nconst': nconst,
+        'primaryName': name,
+        'birthYear': birth_year.astype('Int64'),
+        'deathYear': pd.Series(pd.NA, index=range(n), dtype='Int64'),
+        'primaryProfession': np.where(rng.random(n) < 0.3, 'director,writer', 'actor'),
+        'knownForTitles': pd.Series(None, index=range(n), dtype=object),
+    })
+
+#=====================
+# Writer
+#=====================
+
+def _write_chunk(f, frame, header):
+    frame.to_csv(f, sep='\t', index=False, header=header, na_rep='\\N')
+
+
+def write_synthetic_imdb(directory, titles=100_000, names=None, seed=42, chunksize=250_000):
+    """
+    Write the four synthetic IMDb .tsv.gz files to directory.
+
+    names defaults to the number of titles; directors are drawn from the first
+    quarter of the names. Rows are generated and written in chunks, so memory
+    stays flat up to 10M titles. Returns the paths by file name.
+    """
+    names = titles if names is None else names
+    directors = max(names // 4, 1)
+    os.makedirs(directory, exist_ok=True)
+    paths = {file_name: os.path.join(directory, f"{file_name}.tsv.gz")
+             for file_name in ('title.basics', 'title.crew', 'name.basics', 'title.ratings')}
+
+    files = {file_name: gzip.open(path, 'wt', encoding='utf-8', compresslevel=5)
+             for file_name, path in paths.items()}
+    try:
+        for chunk, first in enumerate(range(0, titles, chunksize)):
+            rng = np.random.default_rng([seed, 0, chunk])
+            n = min(chunksize, titles - first)
+            basics, movie = _title_chunk(rng, first + 1, n)
+            _write_chunk(files['title.basics'], basics, header=chunk == 0)
+            _write_chunk(files['title.crew'], _crew_chunk(rng, basics['tconst'], directors),
+                         header=chunk == 0)
+            _write_chunk(files['title.ratings'], _ratings_chunk(rng, basics['tconst'], movie),
+                         header=chunk == 0)
+
+        for chunk, first in enumerate(range(0, names, chunksize)):
+            rng = np.random.default_rng([seed, 1, chunk])
+            _write_chunk(files['name.basics'],
+                         _name_chunk(rng, first + 1, min(chunksize, names - first)),
+                         header=chunk == 0)
+    finally:
+        for f in files.values():
+            f.close()
+
+    return paths
+
+
+def write_synthetic_film_database(directory, db_path, titles=100_000, workers=None):
+    """Run the ingestion pipeline on the synthetic files and publish db_path"""
+    # Imported here: the file generator itself only needs NumPy and pandas
+    from utils.imdb_pipeline import (IMDB_FILES, MIN_YEAR, MIN_RUNTIME, MAX_RUNTIME,
+                                     StageTimer, load_imdb_files, join_film_data,
+                                     write_film_database)
+
+    timer = StageTimer()
+    frames = load_imdb_files(directory, MIN_YEAR, datetime.now().year, MIN_RUNTIME,
+                             MAX_RUNTIME, timer, workers=workers or len(IMDB_FILES))
+    film, genres = join_film_data(frames['title.basics'], frames['title.crew'],
+                                  frames['name.basics'], frames['title.ratings'])
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    write_film_database(film, genres, db_path, f"synthetic ({titles:,} titles)", None, timer,
+                        incremental=False)
+    return len(film)
+
+#=====================
+# Command line
+#=====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.imdb_synthetic",
+        description="Write synthetic IMDb datasets (and optionally a film database).")
+    parser.add_argument("--titles", type=int, default=100_000,
+                        help="number of titles, e.g. 10000 to 10000000 (default: 100000)")
+    parser.add_argument("--names", type=int, default=None,
+                        help="number of names (default: as many as titles)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--directory", default="synthetic_imdb",
+                        help="where the .tsv.gz files are written (default: synthetic_imdb)")
+    parser.add_argument("--db", default=None,
+                        help="also build a ready film_database.db at this path")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    paths = write_synthetic_imdb(args.directory, titles=args.titles, names=args.names,
+                                 seed=args.seed)
+    for file_name, path in paths.items():
+        print(f"✅ {file_name}.tsv.gz: {os.path.getsize(path) / 1024 ** 2:,.1f} MiB")
+    print(f"⏱️ Generated {args.titles:,} titles in {time.perf_counter() - start:.2f} s")
+
+    if args.db:
+        films = write_synthetic_film_database(args.directory, args.db, titles=args.titles)
+        print(f"✅ Built {args.db} with {films:,} films.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import time
+from datetime import date
+from urllib.parse import quote
+import pandas as pd
+from utils.archive_db import ARCHIVE_DB_PATH, archive_connection
+from utils.film_db import FILM_DB_PATH
+from utils.taste import TASTE_SCHEMA, film_facts, write_watch
+
+#=========================
+# Movie nights (archive)
+#=========================
+
+# Every movie night, and the film every room suggested for it with the votes it
+# got (the film that was watched is the chosen one). tconst is the film_data
+# key of the film database, which is a separate (read-only) file: it is
+# attached for the archive view, so there is no foreign key to it.
+NIGHTS_SCHEMA = ('movie_nights', (
+    """
+    CREATE TABLE IF NOT EXISTS movie_nights (
+        id INTEGER PRIMARY KEY,
+        night_on TEXT NOT NULL UNIQUE,
+        snack TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS night_suggestions (
+        night_id INTEGER NOT NULL REFERENCES movie_nights (id) ON DELETE CASCADE,
+        room TEXT NOT NULL,
+        tconst TEXT NOT NULL,
+        votes INTEGER NOT NULL DEFAULT 0,
+        chosen INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (night_id, room)
+    ) WITHOUT ROWID
+    """,
+    # Nights a film was suggested for, and the suggestions of a room
+    "CREATE INDEX IF NOT EXISTS idx_night_suggestions_tconst ON night_suggestions (tconst)",
+    "CREATE INDEX IF NOT EXISTS idx_night_suggestions_room ON night_suggestions (room, night_id)",
+    # At most one film is watched per night
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_night_suggestions_chosen "
+    "ON night_suggestions (night_id) WHERE chosen",
+))
+
+# Film columns of the archive view (from film_data of the film database)
+ARCHIVE_FILM_COLUMNS = ['primaryTitle', 'startYear', 'runtimeMinutes', 'main_genre',
+                        'nmDirector_1', 'nmDirector_2', 'averageRating', 'numVotes']
+
+# Columns of a CSV import: one row per suggestion, the night columns repeated
+CSV_COLUMNS = ['night_on', 'snack', 'room', 'tconst', 'votes', 'chosen']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x'}
+
+#=====================
+# Reading records
+#=====================
+
+def _night_record(night_on, snack, suggestions):
+    """Validated night record: {'night_on', 'snack', 'suggestions': [(room, tconst, votes, chosen)]}"""
+    night_on = date.fromisoformat(str(night_on).strip()).isoformat()
+    rooms = [room for room, *_ in suggestions]
+    if len(set(rooms)) != len(rooms):
+        raise ValueError(f"A room suggested more than one film on {night_on}")
+    if sum(chosen for *_, chosen in suggestions) > 1:
+        raise ValueError(f"More than one film was chosen on {night_on}")
+    return {'night_on': night_on, 'snack': snack or None, 'suggestions': suggestions}
+
+
+def _suggestion(room, tconst, votes, chosen):
+    room, tconst = str(room or '').strip(), str(tconst or '').strip()
+    if not room or not tconst:
+        raise ValueError("A suggestion needs a room and a tconst")
+    if isinstance(chosen, str):
+        chosen = chosen.strip().lower() in TRUE_VALUES
+    return (room, tconst, int(votes or 0), int(bool(chosen)))
+
+
+def read_night_records(path):
+    """
+    Read movie nights from a .csv (CSV_COLUMNS, one row per suggestion) or a
+    .jsonl file (one night per line: night_on, snack and a list of suggestions
+    with room, tconst, votes and chosen)
+    """
+    nights = {}
+    if path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as file:
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    night = json.loads(line)
+                    if not isinstance(night, dict):
+                        raise ValueError("A line must be a JSON object (one night)")
+                    suggestions = [_suggestion(s['room'], s['tconst'], s.get('votes'),
+                                               s.get('chosen', False))
+                                   for s in night.get('suggestions', [])]
+                    record = _night_record(night['night_on'], night.get('snack'), suggestions)
+                except KeyError as e:
+                    raise ValueError(f"{path}, line {line_number}: missing {e}") from e
+                except (TypeError, AttributeError, ValueError) as e:
+                    raise ValueError(f"{path}, line {line_number}: {e}") from e
+                nights[record['night_on']] = record
+    elif path.endswith('.csv'):
+        grouped = {}
+        with open(path, newline='', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            missing = set(CSV_COLUMNS) - set(reader.fieldnames or [])
+            if missing:
+                raise ValueError(f"{path} is missing the columns {sorted(missing)}")
+            for row in reader:
+                # Fields missing from a short row are None
+                try:
+                    night_on = date.fromisoformat((row.get('night_on') or '').strip()).isoformat()
+                    suggestion = _suggestion(row.get('room'), row.get('tconst'),
+                                             row.get('votes'), row.get('chosen') or '')
+                except (TypeError, ValueError) as e:
+                    raise ValueError(f"{path}, line {reader.line_num}: {e}") from e
+                night = grouped.setdefault(night_on, {'snack': None, 'suggestions': []})
+                night['snack'] = night['snack'] or (row.get('snack') or '').strip() or None
+                night['suggestions'].append(suggestion)
+        for night_on, night in grouped.items():
+            try:
+                record = _night_record(night_on, night['snack'], night['suggestions'])
+            except ValueError as e:
+                raise ValueError(f"{path}: {e}") from e
+            nights[record['night_on']] = record
+    else:
+        raise ValueError(f"Unknown movie night file type (not .csv or .jsonl): {path}")
+    return list(nights.values())
+
+#=====================
+# Import
+#=====================
+
+def unknown_films(film_conn, tconsts, table='film_data', chunk_size=500):
+    """Return the tconsts that are not in the film database"""
+    tconsts = sorted(set(tconsts))
+    known = set()
+    for start in range(0, len(tconsts), chunk_size):
+        chunk = tconsts[start:start + chunk_size]
+        rows = film_conn.execute(f"SELECT tconst FROM {table} "
+                                 f"WHERE tconst IN ({', '.join('?' * len(chunk))})", chunk)
+        known.update(tconst for tconst, in rows)
+    return [tconst for tconst in tconsts if tconst not in known]
+
+
+def _watch_chosen_films(conn, records, film_conn, roomies):
+    """
+    Add the chosen film of every night to the history of the roomies, through
+    write_watch (taste profile and watch stats), with the snack of the night.
+    Entries that are already in the history (a night imported again) are skipped.
+    Returns the number of entries added and the nights whose film is unknown.
+    """
+    facts, added, unknown = {}, 0, []
+    for night in records:
+        chosen = [tconst for _, tconst, _, is_chosen in night['suggestions'] if is_chosen]
+        if not chosen:
+            continue
+        if chosen[0] not in facts:
+            facts[chosen[0]] = film_facts(film_conn, chosen[0])
+        if facts[chosen[0]] is None:
+            unknown.append(night['night_on'])
+            continue
+        for roomie in roomies:
+            known = conn.execute("SELECT 1 FROM watch_history "
+                                 "WHERE name = ? AND watched_on = ? AND tconst = ?",
+                                 (roomie, night['night_on'], chosen[0])).fetchone()
+            if known is None:
+                write_watch(conn, roomie, facts[chosen[0]],
+                            watched_on=date.fromisoformat(night['night_on']),
+                            snack=night['snack'])
+                added += 1
+    return added, unknown
+
+
+def import_movie_nights(conn, records, film_conn=None, roomies=()):
+    """
+    Write movie night records (read_night_records) in one transaction. A night
+    that is already in the archive gets the snack and suggestions of its record.
+    With a film_conn, the chosen films also go into the watch history of the
+    roomies (see _watch_chosen_films), in the same transaction.
+    Returns the number of nights, suggestions and history entries written, and
+    the nights whose chosen film is not in the film database.
+    """
+    # A night in more than one record: the last one counts
+    records = list({night['night_on']: night for night in records}.values())
+    with conn:
+        conn.executemany("""
+            INSERT INTO movie_nights (night_on, snack) VALUES (?, ?)
+            ON CONFLICT (night_on) DO UPDATE SET snack = excluded.snack
+        """, [(night['night_on'], night['snack']) for night in records])
+
+        # Ids of the nights, also those that were there already
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS imported_nights (night_on TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM imported_nights")
+        conn.executemany("INSERT OR IGNORE INTO imported_nights VALUES (?)",
+                         [(night['night_on'],) for night in records])
+        night_ids = dict(conn.execute("""
+            SELECT n.night_on, n.id
+            FROM imported_nights i JOIN movie_nights n ON n.night_on = i.night_on
+        """))
+
+        conn.execute("""
+            DELETE FROM night_suggestions
+            WHERE night_id IN (SELECT n.id FROM imported_nights i
+                               JOIN movie_nights n ON n.night_on = i.night_on)
+        """)
+        suggestions = [(night_ids[night['night_on']], *suggestion)
+                       for night in records for suggestion in night['suggestions']]
+        conn.executemany("INSERT INTO night_suggestions (night_id, room, tconst, votes, chosen) "
+                         "VALUES (?, ?, ?, ?, ?)", suggestions)
+        conn.execute("DELETE FROM imported_nights")
+
+        watches, unknown = 0, []
+        if film_conn is not None and roomies:
+            watches, unknown = _watch_chosen_films(conn, records, film_conn, roomies)
+    return len(night_ids), len(suggestions), watches, unknown
+
+
+def add_movie_night(conn, night_on, suggestions, snack=None, film_conn=None, roomies=()):
+    """Add (or replace) one movie night; suggestions: (room, tconst, votes, chosen)"""
+    record = _night_record(night_on.isoformat() if isinstance(night_on, date) else night_on,
+                           snack, [_suggestion(*suggestion) for suggestion in suggestions])
+    return import_movie_nights(conn, [record], film_conn=film_conn, roomies=roomies)
+
+#=====================
+# Archive view
+#=====================
+
+def attach_film_database(conn, film_db_path=FILM_DB_PATH, alias='film'):
+    """
+    Attach the film database read-only to an archive connection (once). Like the
+    connection pool, it is opened immutable: a snapshot is only ever replaced.
+    """
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if alias not in attached:
+        conn.execute("ATTACH DATABASE ? AS " + alias,
+                     (f"file:{quote(os.path.abspath(film_db_path))}?mode=ro&immutable=1",))
+
+
+def movie_night_dates(conn):
+    """Return the dates of all movie nights, newest first"""
+    return [night_on for night_on, in
+            conn.execute("SELECT night_on FROM movie_nights ORDER BY night_on DESC")]
+
+
+def archive_films(conn, film_db_path=FILM_DB_PATH, night_on=None):
+    """
+    Return the suggestions of all movie nights (or of one night) with the IMDb
+    details of their films, in one query against the attached film database.
+    Films that are no longer in the film database keep empty details.
+    """
+    attach_film_database(conn, film_db_path)
+    film_columns = ', '.join(f'f."{column}"' for column in ARCHIVE_FILM_COLUMNS)
+    where = "WHERE n.night_on = ?" if night_on is not None else ""
+    return pd.read_sql_query(f"""
+        SELECT n.night_on, n.snack, s.room, s.votes, s.chosen, s.tconst, {film_columns}
+        FROM movie_nights n
+        JOIN night_suggestions s ON s.night_id = n.id
+        LEFT JOIN film.film_data f ON f.tconst = s.tconst
+        {where}
+        ORDER BY n.night_on DESC, s.chosen DESC, s.votes DESC, s.room
+    """, conn, params=() if night_on is None else (night_on,))
+
+#=====================
+# Command line
+#=====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.movie_nights",
+        description="Import historical movie nights into the archive database.")
+    parser.add_argument("files", nargs="+", help=".csv or .jsonl files of movie nights")
+    parser.add_argument("--archive", default=ARCHIVE_DB_PATH,
+                        help=f"archive database (default: {ARCHIVE_DB_PATH})")
+    parser.add_argument("--db", default=FILM_DB_PATH,
+                        help=f"film database to check the films against (default: {FILM_DB_PATH})")
+    parser.add_argument("--roomies", nargs="+", default=[], metavar="NAME",
+                        help="roomies (their login names) who watched the chosen film of every "
+                             "night: it is added to their watch history and stats")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+
+    records = [record for path in args.files for record in read_night_records(path)]
+
+    film_conn = sqlite3.connect(f"file:{quote(os.path.abspath(args.db))}?mode=ro", uri=True)
+    try:
+        with archive_connection(args.archive, schemas=[NIGHTS_SCHEMA, TASTE_SCHEMA]) as conn:
+            attach_film_database(conn, args.db)
+            missing = unknown_films(conn, [suggestion[1] for night in records
+                                           for suggestion in night['suggestions']],
+                                    table='film.film_data')
+            nights, suggestions, watches, unknown = import_movie_nights(
+                conn, records, film_conn=film_conn, roomies=args.roomies)
+    finally:
+        film_conn.close()
+
+    if missing:
+        print(f"⚠️ WARNING: {len(missing):,} films are not in the film database "
+              f"(e.g. {', '.join(missing[:5])}); they are imported without IMDb details.")
+    if unknown:
+        print(f"⚠️ WARNING: the film of {len(unknown):,} nights is not in the film database "
+              f"(e.g. {', '.join(unknown[:5])}); it is not added to the watch history.")
+    if not args.roomies:
+        print("⚠️ WARNING: no --roomies given; the chosen films are not added to the "
+              "watch history, so they do not show on the Movie Stats page.")
+    print(f"✅ Imported {nights:,} movie nights with {suggestions:,} suggestions "
+          f"and {watches:,} watch history entries in {time.perf_counter() - start:.2f} s.")
+
+
+if __name__ == "__main__":
+    main()
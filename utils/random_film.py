@@ -0,0 +1,117 @@
+import random
+from collections import namedtuple
+import numpy as np
+import streamlit as st
+from utils.film_db import FILM_DB_PATH, get_connection, snapshot_token
+
+#=====================
+# Random film picker
+#=====================
+
+RandomFilm = namedtuple('RandomFilm', ['tconst', 'primaryTitle', 'startYear',
+                                       'runtimeMinutes', 'averageRating', 'numVotes'])
+
+# Columns a pick can be weighted on (None is a uniform pick)
+WEIGHT_COLUMNS = (None, 'numVotes', 'averageRating')
+
+def alias_table(weights):
+    """
+    Build Walker's alias table for weights (Vose's method).
+
+    Returns (prob, alias): draw a uniform slot i, keep i with probability prob[i],
+    otherwise take alias[i]. Every draw costs O(1), whatever the number of films.
+    """
+    n = len(weights)
+    scaled = (np.asarray(weights, dtype=np.float64) * n / np.sum(weights)).tolist()
+    alias = list(range(n))
+
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        alias[less] = more
+        scaled[more] -= 1.0 - scaled[less]
+        (small if scaled[more] < 1.0 else large).append(more)
+
+    # Whatever is left is (up to rounding) exactly 1
+    for i in small + large:
+        scaled[i] = 1.0
+
+    return np.array(scaled, dtype=np.float64), np.array(alias, dtype=np.int64)
+
+
+class RandomFilmPicker:
+    """
+    Picks a random film in constant time.
+
+    The rowids of film_data are loaded once; a pick draws one rowid and reads that
+    single row, instead of sorting the whole table with ORDER BY RANDOM().
+    """
+    def __init__(self, rowids, weights):
+        self.rowids = rowids
+        self.weights = weights
+        self._alias_tables = {}
+        self._random = random.Random()
+
+    @classmethod
+    def from_connection(cls, conn, table='film_data'):
+        """Load the rowids and the weight columns from the film database"""
+        rows = conn.execute(f"SELECT rowid, numVotes, averageRating FROM {table}").fetchall()
+        rowids = np.array([row[0] for row in rows], dtype=np.int64)
+        weights = {
+            'numVotes': np.array([row[1] for row in rows], dtype=np.float64),
+            'averageRating': np.array([row[2] for row in rows], dtype=np.float64),
+        }
+        return cls(rowids, weights)
+
+    def __len__(self):
+        return len(self.rowids)
+
+    def pick_rowid(self, weight=None):
+        """Return the rowid of a random film, optionally weighted on a column"""
+        if weight not in WEIGHT_COLUMNS:
+            raise ValueError(f"Unknown weight column: {weight}")
+        if len(self.rowids) == 0:
+            return None
+
+        slot = self._random.randrange(len(self.rowids))
+        if weight is not None:
+            if weight not in self._alias_tables:
+                self._alias_tables[weight] = alias_table(self.weights[weight])
+            prob, alias = self._alias_tables[weight]
+            if self._random.random() >= prob[slot]:
+                slot = alias[slot]
+
+        return int(self.rowids[slot])
+
+    def pick(self, conn, weight=None, table='film_data'):
+        """Return a random film as a RandomFilm, or None when there are no films"""
+        rowid = self.pick_rowid(weight)
+        if rowid is None:
+            return None
+
+        columns = ', '.join(RandomFilm._fields)
+        row = conn.execute(f"SELECT {columns} FROM {table} WHERE rowid = ?", (rowid,)).fetchone()
+        if row is None:
+            # The database was swapped for a new snapshot after the rowids were loaded
+            return None
+        return RandomFilm(*row)
+
+#=========================
+# Shared (per process)
+#=========================
+
+@st.cache_resource(max_entries=1)
+def load_random_film_picker(db_path, snapshot):
+    """Load the picker of one database snapshot (kept until the next snapshot)"""
+    return RandomFilmPicker.from_connection(get_connection(db_path))
+
+
+def get_random_film_picker(db_path=FILM_DB_PATH):
+    """Return the random film picker shared by all sessions"""
+    return load_random_film_picker(db_path, snapshot_token(db_path))
+
+
+def random_film(weight=None, db_path=FILM_DB_PATH):
+    """Return a random film (RandomFilm) from the film database"""
+    return get_random_film_picker(db_path).pick(get_connection(db_path), weight)
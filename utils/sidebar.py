@@ -0,0 +1,135 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from utils.film_db import FILM_DB_PATH, get_connection_pool, snapshot_token
+from utils.random_film import get_random_film_picker
+
+#================================
+# Random film generator sidebar
+#================================
+
+# List of funny texts
+FUNNY_TEXTS = [
+    "Reading your aura...",
+    "Taming a monkey...",
+    "Brewing some coffee...",
+    "Counting stars...",
+    "Feeding the unicorns...",
+    "Polishing the pixels...",
+    "Summoning good vibes...",
+    "Tickling the code...",
+    "Charging the flux capacitor...",
+    "Aligning the planets...",
+    "Petting the cat...",
+    "Warming up the servers...",
+    "Finding Waldo...",
+    "Herding cats...",
+    "Sharpening pencils...",
+    "Calibrating the matrix...",
+    "Baking cookies...",
+    "Inflating balloons...",
+    "Painting rainbows...",
+    "Hacking the mainframe...",
+    "Teleporting data...",
+    "Tickling the electrons...",
+    "Spinning up the hamster wheel...",
+    "Inflating the internet...",
+    "Waking up the servers...",
+    "Unleashing the magic...",
+    "Mixing the potions...",
+    "Charging the crystals...",
+    "Consulting the oracle...",
+    "Tuning the algorithms...",
+    "Rebooting the matrix...",
+    "Casting spells...",
+    "Brewing the potion...",
+    "Hunting for Easter eggs...",
+    "Rewiring the circuits...",
+    "Synchronizing the clocks...",
+    "Lubricating the gears...",
+    "Recalibrating the sensors...",
+    "Recharging the batteries...",
+    "Assembling the pixels..."
+]
+
+# Number of progress bar updates per reveal (each update is one websocket message)
+PROGRESS_STEPS = 10
+
+@st.cache_resource
+def get_pick_executor():
+    """Return the background thread pool that picks random films"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="random-film")
+
+
+def _submit_pick(db_path=FILM_DB_PATH):
+    """Start picking a random film in the background; returns (snapshot, future)"""
+    # Resolve the shared resources here, in the script thread
+    snapshot = snapshot_token(db_path)
+    picker = get_random_film_picker(db_path)
+    pool = get_connection_pool(db_path)
+    return snapshot, get_pick_executor().submit(lambda: picker.pick(pool.connection()))
+
+
+def _next_random_film(db_path=FILM_DB_PATH):
+    """Return the future of the prefetched film and prefetch the one after it"""
+    prefetch = st.session_state.get("random_film_prefetch")
+    if prefetch is None or prefetch[0] != snapshot_token(db_path):
+        # Picked from an older snapshot: its rowid may be another film (or none) now
+        prefetch = _submit_pick(db_path)
+    st.session_state.random_film_prefetch = _submit_pick(db_path)
+    return prefetch[1]
+
+
+def random_film_sidebar():
+    """Show the Random Film Generator in the sidebar"""
+    st.sidebar.title("Random Film Generator")
+
+    st.sidebar.write("""Can't decide what to watch? Let our Random Film Generator
+                     choose for you! Click the button and let faith decide!
+                     Enjoy your movie night! 🍿🎥""")
+
+    instant = st.sidebar.toggle("⚡ Instant mode", key="random_film_instant",
+                                help="Skip the suspense and show the film right away.")
+
+    if not st.sidebar.button("Random film!"):
+        return
+
+    # The film is picked in the background while the animation plays
+    future = _next_random_film()
+
+    if not instant:
+        # Randomly choose a funny text
+        progress_text = random.choice(FUNNY_TEXTS)
+
+        # Create a progress bar
+        my_bar = st.sidebar.progress(0, text=progress_text)
+
+        # Randomly choose a duration between 0.1 and 1.5 seconds
+        duration = random.uniform(0.1, 1.5)
+        sleep_time = duration / PROGRESS_STEPS
+
+        for step in range(1, PROGRESS_STEPS + 1):
+            time.sleep(sleep_time)
+            my_bar.progress(step * 100 // PROGRESS_STEPS, text=progress_text)
+
+        time.sleep(0.5)
+        my_bar.empty()
+
+    random_movie = future.result()
+    if random_movie is None:
+        st.sidebar.error("No films found in the film database!")
+        return
+
+    st.sidebar.write(f'''
+                     Maybe you'd like to watch **{random_movie.primaryTitle}**?
+
+                     **Rating: {random_movie.averageRating} |
+                     Duration: {random_movie.runtimeMinutes} min.** |
+                     **Year: {random_movie.startYear}**
+                     ''')
+
+    # Define IMDb URL
+    random_url = f'https://www.imdb.com/title/{random_movie.tconst}/'
+
+    st.sidebar.link_button('Visit IMDb page!', random_url)
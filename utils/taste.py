@@ -0,0 +1,287 @@
+import math
+from collections import namedtuple
+from datetime import date
+import numpy as np
+from utils.genres import load_genre_bits
+from utils.watch_stats import STATS_SCHEMA, record_watch
+
+#=========================
+# Watch history (archive)
+#=========================
+
+# Per roomie (st.session_state["name"]): what was watched, with an optional
+# rating of 1-10, and the taste profile that is kept up to date with it. The
+# watch stats (STATS_SCHEMA) are written with every entry, so they come along.
+TASTE_SCHEMA = ('taste', (
+    """
+    CREATE TABLE IF NOT EXISTS watch_history (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        tconst TEXT NOT NULL,
+        rating REAL,
+        watched_on TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_watch_history_name ON watch_history (name, watched_on)",
+    """
+    CREATE TABLE IF NOT EXISTS taste_profiles (
+        name TEXT PRIMARY KEY,
+        entries INTEGER NOT NULL,
+        liked_weight REAL NOT NULL,
+        runtime_sum REAL NOT NULL,
+        runtime_sq_sum REAL NOT NULL,
+        year_sum REAL NOT NULL,
+        year_sq_sum REAL NOT NULL
+    )
+    """,
+    # Genres by name: the genre bits of the film database change between snapshots
+    """
+    CREATE TABLE IF NOT EXISTS taste_genres (
+        name TEXT NOT NULL,
+        genre TEXT NOT NULL,
+        weight REAL NOT NULL,
+        PRIMARY KEY (name, genre)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS taste_directors (
+        name TEXT NOT NULL,
+        director TEXT NOT NULL,
+        affinity REAL NOT NULL,
+        PRIMARY KEY (name, director)
+    ) WITHOUT ROWID
+    """,
+    *STATS_SCHEMA[1],
+))
+
+# The film facts a history entry needs, read from film_data when it is added
+# (genres: the names of the genre_mask bits)
+FILM_FACT_COLUMNS = ['tconst', 'genre_mask', 'director_1', 'director_2',
+                     'runtimeMinutes', 'startYear']
+FilmFacts = namedtuple('FilmFacts', FILM_FACT_COLUMNS + ['genres'])
+
+def film_facts(film_conn, tconst, table='film_data'):
+    """Return the FilmFacts of tconst from the film database, or None"""
+    row = film_conn.execute(f"SELECT {', '.join(FILM_FACT_COLUMNS)} FROM {table} "
+                            "WHERE tconst = ?", (tconst,)).fetchone()
+    if row is None:
+        return None
+    genres = tuple(genre for genre, bit in load_genre_bits(film_conn).items()
+                   if row[1] >> bit & 1)
+    return FilmFacts(*row, genres)
+
+
+def liking(rating):
+    """How much a roomie liked a film, -1 to 1 (a film watched but not rated: 0.5)"""
+    if rating is None:
+        return 0.5
+    return (min(max(rating, 1.0), 10.0) - 5.5) / 4.5
+
+#=====================
+# Taste profile
+#=====================
+
+# Weight of every part of the taste score of a film
+GENRE_WEIGHT = 1.0
+DIRECTOR_WEIGHT = 0.5
+RUNTIME_WEIGHT = 0.3
+ERA_WEIGHT = 0.3
+
+# Spread of the preferred runtime and era until there is enough history
+DEFAULT_RUNTIME_SPREAD = 20.0
+DEFAULT_ERA_SPREAD = 10.0
+
+
+class TasteProfile:
+    """
+    A roomie's taste: the summed liking per genre and per director, and the
+    runtime and year of the films liked (as sums, so their mean and spread can be
+    updated one entry at a time). The films already watched are ranked last.
+    """
+    def __init__(self, name, entries=0, liked_weight=0.0, runtime_sum=0.0,
+                 runtime_sq_sum=0.0, year_sum=0.0, year_sq_sum=0.0, genres=None,
+                 directors=None, watched=None):
+        self.name = name
+        self.entries = entries
+        self.genres = {} if genres is None else genres
+        self.liked_weight = liked_weight
+        self.runtime_sum = runtime_sum
+        self.runtime_sq_sum = runtime_sq_sum
+        self.year_sum = year_sum
+        self.year_sq_sum = year_sq_sum
+        self.directors = {} if directors is None else directors
+        self.watched = set() if watched is None else watched
+
+    def add(self, film, rating=None):
+        """Update the profile with one watched film (FilmFacts)"""
+        weight = liking(rating)
+        self.entries += 1
+        self.watched.add(film.tconst)
+
+        for genre in film.genres:
+            self.genres[genre] = self.genres.get(genre, 0.0) + weight
+
+        for director in (film.director_1, film.director_2):
+            if director:
+                self.directors[director] = self.directors.get(director, 0.0) + weight
+
+        # Runtime and era of the films that were liked
+        liked = max(weight, 0.0)
+        self.liked_weight += liked
+        self.runtime_sum += liked * film.runtimeMinutes
+        self.runtime_sq_sum += liked * film.runtimeMinutes ** 2
+        self.year_sum += liked * film.startYear
+        self.year_sq_sum += liked * film.startYear ** 2
+
+    def _preferred(self, total, sq_total, default_spread):
+        mean = total / self.liked_weight
+        spread = math.sqrt(max(sq_total / self.liked_weight - mean ** 2, 0.0))
+        return mean, max(spread, default_spread)
+
+    def preferred_runtime(self):
+        """Mean and spread of the runtime of the films liked, or None"""
+        if self.liked_weight == 0:
+            return None
+        return self._preferred(self.runtime_sum, self.runtime_sq_sum, DEFAULT_RUNTIME_SPREAD)
+
+    def preferred_era(self):
+        """Mean and spread of the year of the films liked, or None"""
+        if self.liked_weight == 0:
+            return None
+        return self._preferred(self.year_sum, self.year_sq_sum, DEFAULT_ERA_SPREAD)
+
+    def scores(self, engine, rows):
+        """Taste score of the films at rows (FilmEngine positions), in one vectorized pass"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.entries == 0 or len(rows) == 0:
+            return np.zeros(len(rows))
+
+        # Genres: the mean liking of the film's genres (one pass per genre the
+        # roomie has an opinion on, at its bit in the current snapshot)
+        masks = engine.genre_mask[rows]
+        score = np.zeros(len(rows))
+        for genre, weight in self.genres.items():
+            bit = engine.genre_bits.get(genre)
+            if bit is not None and weight:
+                score += (weight / self.entries) * ((masks >> bit) & 1)
+        score *= GENRE_WEIGHT / np.maximum(engine.genre_count[rows], 1)
+
+        # Directors: tanh of the summed liking, as one lookup per director code
+        if self.directors and engine.director_codes is not None:
+            affinity = np.zeros(len(engine.director_lookup) + 1)
+            for director, weight in self.directors.items():
+                code = engine.director_lookup.get(director)
+                if code is not None:
+                    affinity[code] = math.tanh(weight)
+            # Code -1 (no director) reads the last slot, which stays 0
+            score += DIRECTOR_WEIGHT * affinity[engine.director_codes[rows]].sum(axis=1)
+
+        # Runtime and era: closeness to what was liked
+        for preferred, values, weight in ((self.preferred_runtime(), engine.runtime, RUNTIME_WEIGHT),
+                                          (self.preferred_era(), engine.start_year, ERA_WEIGHT)):
+            if preferred is not None:
+                mean, spread = preferred
+                z = (values[rows] - mean) / spread
+                score += weight * np.exp(-0.5 * z ** 2)
+
+        return score
+
+    def watched_rows(self, engine, rows):
+        """Whether the roomie already watched the films at rows"""
+        watched = engine.positions(sorted(self.watched))
+        return np.isin(rows, watched[watched >= 0])
+
+    def _order(self, engine, rows):
+        # Films not watched yet first, then by score (lexsort is stable: ties
+        # keep their order)
+        return np.lexsort((-self.scores(engine, rows), self.watched_rows(engine, rows)))
+
+    def rank_rows(self, engine, rows):
+        """Order FilmEngine rows by taste score, best first and the watched films last"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows[self._order(engine, rows)]
+
+    def rerank(self, engine, results):
+        """Return results (with tconst) ordered like rank_rows"""
+        if self.entries == 0 or results.empty:
+            return results
+        rows = engine.positions(results['tconst'])
+        return results.take(self._order(engine, rows)).reset_index(drop=True)
+
+#=========================
+# Store and update
+#=========================
+
+# Functions called with (conn, watch_id, name, film, rating, snack) for every film
+# added to the history, in the transaction that adds it (see on_watch_added). The
+# watch stats are always kept up to date, whoever calls add_watch.
+WATCH_HOOKS = [record_watch]
+
+def on_watch_added(hook):
+    """Register hook to run with every added history entry (usable as a decorator)"""
+    if hook not in WATCH_HOOKS:
+        WATCH_HOOKS.append(hook)
+    return hook
+
+
+def load_taste_profile(conn, name):
+    """Return the stored TasteProfile of a roomie (empty when there is no history)"""
+    row = conn.execute("""
+        SELECT entries, liked_weight, runtime_sum, runtime_sq_sum, year_sum, year_sq_sum
+        FROM taste_profiles WHERE name = ?
+    """, (name,)).fetchone()
+    if row is None:
+        return TasteProfile(name)
+
+    genres = dict(conn.execute("SELECT genre, weight FROM taste_genres WHERE name = ?",
+                               (name,)).fetchall())
+    directors = dict(conn.execute("SELECT director, affinity FROM taste_directors WHERE name = ?",
+                                  (name,)).fetchall())
+    watched = {tconst for tconst, in conn.execute("SELECT DISTINCT tconst FROM watch_history "
+                                                   "WHERE name = ?", (name,))}
+    return TasteProfile(name, *row, genres=genres, directors=directors, watched=watched)
+
+
+def add_watch(conn, name, film, rating=None, watched_on=None, snack=None):
+    """
+    Add a watched film (FilmFacts) to a roomie's history and update the taste
+    profile with it, in one transaction that also runs the WATCH_HOOKS.
+    Returns the updated TasteProfile.
+    """
+    with conn:
+        return write_watch(conn, name, film, rating, watched_on, snack)
+
+
+def write_watch(conn, name, film, rating=None, watched_on=None, snack=None):
+    """Like add_watch, inside a transaction of the caller (e.g. a bulk import)"""
+    watched_on = (watched_on or date.today()).isoformat()
+    snack = snack.strip() if snack else None
+    profile = load_taste_profile(conn, name)
+    profile.add(film, rating)
+
+    watch_id = conn.execute("INSERT INTO watch_history (name, tconst, rating, watched_on) "
+                            "VALUES (?, ?, ?, ?)",
+                            (name, film.tconst, rating, watched_on)).lastrowid
+    for hook in WATCH_HOOKS:
+        hook(conn, watch_id, name, film, rating, snack)
+    conn.execute("""
+        INSERT OR REPLACE INTO taste_profiles
+            (name, entries, liked_weight, runtime_sum, runtime_sq_sum, year_sum,
+             year_sq_sum)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (name, profile.entries, profile.liked_weight, profile.runtime_sum,
+          profile.runtime_sq_sum, profile.year_sum, profile.year_sq_sum))
+    conn.executemany("INSERT OR REPLACE INTO taste_genres (name, genre, weight) "
+                     "VALUES (?, ?, ?)",
+                     [(name, genre, profile.genres[genre]) for genre in film.genres])
+    conn.executemany("INSERT OR REPLACE INTO taste_directors (name, director, affinity) "
+                     "VALUES (?, ?, ?)",
+                     [(name, director, profile.directors[director])
+                      for director in (film.director_1, film.director_2) if director])
+    return profile
+
+
+def watch_history(conn, name):
+    """Return a roomie's history as (tconst, rating, watched_on) rows, newest first"""
+    return conn.execute("SELECT tconst, rating, watched_on FROM watch_history "
+                        "WHERE name = ? ORDER BY watched_on DESC, id DESC", (name,)).fetchall()
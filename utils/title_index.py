@@ -0,0 +1,108 @@
+from bisect import bisect_left
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.film_db import FILM_DB_PATH, get_connection, snapshot_token
+from utils.film_search import fold
+
+#=======================
+# Title autocomplete
+#=======================
+
+# Leading articles a title can also be found without ('matrix' finds 'The Matrix')
+ARTICLES = ('the ', 'a ', 'an ')
+
+# Prefixes matching more keys than this keep their completions (a one-letter
+# prefix is most of the catalogue); the completions of all one-letter prefixes
+# are made when the index is built
+BROAD_PREFIX = 2000
+
+class TitleIndex:
+    """
+    Every film title of the catalogue, normalized and sorted, for prefix lookups.
+
+    A prefix is two bisects on the sorted keys, whatever the number of films; each
+    key points to its film (tconst, title, year, directors, votes). The most voted
+    films of the range are picked with a partial sort.
+    """
+    def __init__(self, films):
+        self.tconst = films['tconst'].to_numpy(dtype=object)
+        self.title = films['primaryTitle'].to_numpy(dtype=object)
+        self.year = films['startYear'].to_numpy()
+        self.votes = films['numVotes'].to_numpy()
+        directors = (films['nmDirector_1'].fillna('') + ', '
+                     + films['nmDirector_2'].fillna('')).str.strip(', ')
+        self.directors = directors.to_numpy(dtype=object)
+        self.position = {tconst: i for i, tconst in enumerate(self.tconst)}
+
+        entries = []
+        for i, title in enumerate(self.title):
+            key = ' '.join(fold(title).split())
+            entries.append((key, i))
+            for article in ARTICLES:
+                if key.startswith(article):
+                    entries.append((key[len(article):], i))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.films = np.array([i for _, i in entries], dtype=np.int64)
+        self.key_votes = self.votes[self.films]
+
+        self._broad = {}
+        for letter in sorted({key[:1] for key in self.keys}):
+            self.complete(letter)
+
+    @classmethod
+    def from_connection(cls, conn, table='film_data'):
+        """Load the titles, years, directors and votes from the film database"""
+        films = pd.read_sql_query(f"""
+            SELECT tconst, primaryTitle, startYear, nmDirector_1, nmDirector_2, numVotes
+            FROM {table}
+        """, conn)
+        return cls(films)
+
+    def complete(self, prefix, limit=20):
+        """Return the tconst of the (at most limit) most voted films starting with prefix"""
+        key = ' '.join(fold(prefix).split())
+        if not key:
+            return []
+        if (key, limit) in self._broad:
+            return self._broad[key, limit]
+
+        low = bisect_left(self.keys, key)
+        high = bisect_left(self.keys, key + '\uffff', low)
+
+        # A film has at most two keys (with and without its article), so the 2 x limit
+        # most voted keys hold the limit most voted films
+        entries = np.arange(low, high)
+        if len(entries) > 2 * limit:
+            votes = self.key_votes[low:high]
+            entries = low + np.argpartition(-votes, 2 * limit - 1)[:2 * limit]
+        films = np.unique(self.films[entries])
+        films = films[np.argsort(-self.votes[films], kind='stable')][:limit]
+        completions = self.tconst[films].tolist()
+
+        if high - low > BROAD_PREFIX:
+            self._broad[key, limit] = completions
+        return completions
+
+    def label(self, tconst):
+        """Title (year) - director(s), so films with the same title can be told apart"""
+        i = self.position.get(tconst)
+        if i is None:
+            return tconst
+        label = f"{self.title[i]} ({self.year[i]})"
+        return f"{label} - {self.directors[i]}" if self.directors[i] else label
+
+#=========================
+# Shared (per process)
+#=========================
+
+@st.cache_resource(max_entries=1)
+def load_title_index(db_path, snapshot):
+    """Build the title index of one database snapshot (kept until the next snapshot)"""
+    return TitleIndex.from_connection(get_connection(db_path))
+
+
+def get_title_index(db_path=FILM_DB_PATH):
+    """Return the title index shared by all sessions"""
+    return load_title_index(db_path, snapshot_token(db_path))
@@ -0,0 +1,185 @@
+import pandas as pd
+
+#==========================
+# Watch stats (archive)
+#==========================
+
+# Summary tables of the Movie Stats page, per roomie. They are updated with
+# every film added to the watch history (in the same transaction: record_watch
+# is one of the WATCH_HOOKS of utils.taste), so the page reads a few small
+# tables instead of grouping the whole history.
+STATS_SCHEMA = ('watch_stats', (
+    # Snack of the night of a history entry (optional)
+    """
+    CREATE TABLE IF NOT EXISTS watch_snacks (
+        watch_id INTEGER PRIMARY KEY REFERENCES watch_history (id) ON DELETE CASCADE,
+        snack TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stats_roomies (
+        name TEXT PRIMARY KEY,
+        films INTEGER NOT NULL,
+        rated INTEGER NOT NULL,
+        rating_sum REAL NOT NULL,
+        runtime_sum INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stats_genres (
+        name TEXT NOT NULL,
+        genre TEXT NOT NULL,
+        films INTEGER NOT NULL,
+        rated INTEGER NOT NULL,
+        rating_sum REAL NOT NULL,
+        PRIMARY KEY (name, genre)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stats_decades (
+        name TEXT NOT NULL,
+        decade INTEGER NOT NULL,
+        films INTEGER NOT NULL,
+        rated INTEGER NOT NULL,
+        rating_sum REAL NOT NULL,
+        PRIMARY KEY (name, decade)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stats_snacks (
+        name TEXT NOT NULL,
+        snack TEXT NOT NULL,
+        films INTEGER NOT NULL,
+        PRIMARY KEY (name, snack)
+    ) WITHOUT ROWID
+    """,
+))
+
+STATS_TABLES = ('stats_roomies', 'stats_genres', 'stats_decades', 'stats_snacks')
+
+#=====================
+# Incremental update
+#=====================
+
+def count_watch(conn, name, film, rating=None, snack=None):
+    """
+    Add one watched film (FilmFacts) to the summary tables of a roomie. Run it in
+    the transaction that adds the history entry.
+    """
+    rated = int(rating is not None)
+    rating = rating if rating is not None else 0.0
+    conn.execute("""
+        INSERT INTO stats_roomies (name, films, rated, rating_sum, runtime_sum)
+        VALUES (?, 1, ?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET
+            films = films + 1,
+            rated = rated + excluded.rated,
+            rating_sum = rating_sum + excluded.rating_sum,
+            runtime_sum = runtime_sum + excluded.runtime_sum
+    """, (name, rated, rating, film.runtimeMinutes or 0))
+    conn.executemany("""
+        INSERT INTO stats_genres (name, genre, films, rated, rating_sum)
+        VALUES (?, ?, 1, ?, ?)
+        ON CONFLICT (name, genre) DO UPDATE SET
+            films = films + 1,
+            rated = rated + excluded.rated,
+            rating_sum = rating_sum + excluded.rating_sum
+    """, [(name, genre, rated, rating) for genre in film.genres])
+    if film.startYear:
+        conn.execute("""
+            INSERT INTO stats_decades (name, decade, films, rated, rating_sum)
+            VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT (name, decade) DO UPDATE SET
+                films = films + 1,
+                rated = rated + excluded.rated,
+                rating_sum = rating_sum + excluded.rating_sum
+        """, (name, film.startYear // 10 * 10, rated, rating))
+    if snack:
+        conn.execute("""
+            INSERT INTO stats_snacks (name, snack, films) VALUES (?, ?, 1)
+            ON CONFLICT (name, snack) DO UPDATE SET films = films + 1
+        """, (name, snack))
+
+
+def record_watch(conn, watch_id, name, film, rating=None, snack=None):
+    """
+    Store the snack of a new history entry and count it in the summary tables
+    (one of the WATCH_HOOKS of utils.taste, run with every add_watch)
+    """
+    if snack:
+        conn.execute("INSERT INTO watch_snacks (watch_id, snack) VALUES (?, ?)",
+                     (watch_id, snack))
+    count_watch(conn, name, film, rating, snack)
+
+
+def needs_rebuild(conn):
+    """
+    Whether the stats do not count every history entry (history recorded before
+    the stats, or written without add_watch)
+    """
+    row = conn.execute("SELECT (SELECT COUNT(*) FROM watch_history) "
+                       "!= (SELECT COALESCE(SUM(films), 0) FROM stats_roomies)").fetchone()
+    return bool(row[0])
+
+
+def rebuild_watch_stats(conn, film_conn):
+    """
+    Recompute the summary tables from the whole watch history (one transaction).
+    Films that are no longer in the film database count without their details.
+    """
+    # Imported here: utils.taste runs record_watch with every watched film
+    from utils.taste import FilmFacts, film_facts
+
+    history = conn.execute("""
+        SELECT h.name, h.tconst, h.rating, s.snack
+        FROM watch_history h LEFT JOIN watch_snacks s ON s.watch_id = h.id
+        ORDER BY h.id
+    """).fetchall()
+    facts = {}
+    with conn:
+        for table in STATS_TABLES:
+            conn.execute(f"DELETE FROM {table}")
+        for name, tconst, rating, snack in history:
+            if tconst not in facts:
+                facts[tconst] = (film_facts(film_conn, tconst)
+                                 or FilmFacts(tconst, 0, None, None, None, None, ()))
+            count_watch(conn, name, facts[tconst], rating, snack)
+    return len(history)
+
+#=================
+# Dashboard reads
+#=================
+
+def load_watch_stats(conn):
+    """
+    Return the summary tables as DataFrames: 'roomies' (films, average rating,
+    hours watched), 'genres', 'decades', 'snacks' and each roomie's 'favourites'
+    """
+    def read(query):
+        return pd.read_sql_query(query, conn)
+
+    return {
+        'roomies': read("""
+            SELECT name, films, rating_sum / NULLIF(rated, 0) AS avg_rating,
+                   runtime_sum / 60.0 AS hours
+            FROM stats_roomies ORDER BY films DESC, name
+        """),
+        'genres': read("""
+            SELECT name, genre, films, rating_sum / NULLIF(rated, 0) AS avg_rating
+            FROM stats_genres ORDER BY name, films DESC, genre
+        """),
+        'decades': read("""
+            SELECT name, decade, films, rating_sum / NULLIF(rated, 0) AS avg_rating
+            FROM stats_decades ORDER BY name, decade
+        """),
+        'snacks': read("SELECT name, snack, films FROM stats_snacks ORDER BY name, films DESC, snack"),
+        # Most watched genre and snack of every roomie (ties: alphabetical)
+        'favourites': read("""
+            SELECT r.name,
+                   (SELECT genre FROM stats_genres g WHERE g.name = r.name
+                    ORDER BY films DESC, genre LIMIT 1) AS genre,
+                   (SELECT snack FROM stats_snacks s WHERE s.name = r.name
+                    ORDER BY films DESC, snack LIMIT 1) AS snack
+            FROM stats_roomies r ORDER BY r.name
+        """),
+    }